@@ -0,0 +1,217 @@
+# admission.py - Admission control and fair queuing for video generations
+import math
+import threading
+import time
+from collections import deque
+
+
+class AdmissionRejected(Exception):
+    """No capacity for a generation right now - retry after `retry_after` seconds"""
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdmissionTicket:
+    """A (possibly still queued) claim on a generation slot"""
+    def __init__(self, client_id, background=False):
+        self.client_id = client_id
+        self.background = background
+        self.granted = False
+        self.enqueued_at = time.time()
+        self.granted_at = None
+
+
+class AdmissionController:
+    """Caps concurrent generations based on outstanding Higgsfield work.
+
+    A generation is admitted while there are free generation slots and the number of
+    outstanding API jobs is below its cap. Everything else waits in per-client
+    queues that are served round-robin, so one heavy client cannot starve others.
+    When the queues are full the caller gets AdmissionRejected with a Retry-After
+    computed from the estimated drain time.
+
+    Background work (batch items) waits in its own unbounded FIFO, with a long
+    timeout of its own, and only gets slots no queued interactive request can use, at most
+    max_active_background at a time. Its slots count as active generations, so
+    drain estimates and load signals see it.
+    """
+
+    def __init__(self, max_active=4, max_outstanding_jobs=8, max_queue=16, max_queued_per_client=2,
+                 max_active_per_client=2, queue_timeout=120, default_request_seconds=90, default_job_seconds=30,
+                 max_active_background=None):
+        self.max_active = max_active
+        self.max_outstanding_jobs = max_outstanding_jobs
+        self.max_queue = max_queue
+        self.max_queued_per_client = max_queued_per_client
+        self.max_active_per_client = max_active_per_client
+        self.queue_timeout = queue_timeout
+
+        self.cond = threading.Condition()
+        self.active = 0
+        self.active_by_client = {}
+        self.outstanding_jobs = 0
+        self.queues = {}           # client_id -> deque of waiting tickets
+        self.round_robin = deque()  # client_ids with waiting tickets, in service order
+        self.background = deque()   # waiting background tickets, served after interactive ones
+        self.active_background = 0
+        # Leave at least one slot for interactive requests by default
+        self.max_active_background = max_active_background if max_active_background is not None else max(1, max_active - 1)
+
+        # Smoothed durations feed the drain-time estimate
+        self.request_seconds = default_request_seconds
+        self.job_seconds = default_job_seconds
+        # Callable returning {'request': seconds, 'job': seconds} from the timing history (values may be None);
+        # preferred over the smoothed values, which start from defaults after every restart
+        self.duration_provider = None
+
+    # API job tracking - registered as a HiggsfieldClient listener
+
+    def on_api_event(self, event, info):
+        with self.cond:
+            if event == 'job_started':
+                self.outstanding_jobs += 1
+            elif event == 'job_finished':
+                self.outstanding_jobs = max(0, self.outstanding_jobs - 1)
+                self.job_seconds = 0.8 * self.job_seconds + 0.2 * info.get('seconds', self.job_seconds)
+                self._dispatch()
+
+    # Admission
+
+    def queued_count(self):
+        return sum(len(q) for q in self.queues.values())
+
+    def _has_capacity(self):
+        return self.active < self.max_active and self.outstanding_jobs < self.max_outstanding_jobs
+
+    def _grant(self, ticket):
+        ticket.granted = True
+        ticket.granted_at = time.time()
+        self.active += 1
+        self.active_by_client[ticket.client_id] = self.active_by_client.get(ticket.client_id, 0) + 1
+        if ticket.background:
+            self.active_background += 1
+
+    def _dispatch(self):
+        """Hand free slots to waiting clients, one ticket per client per round"""
+        granted = False
+        skipped = 0
+        while self.round_robin and self._has_capacity() and skipped < len(self.round_robin):
+            client_id = self.round_robin.popleft()
+            queue = self.queues[client_id]
+            if self.active_by_client.get(client_id, 0) >= self.max_active_per_client:
+                self.round_robin.append(client_id)
+                skipped += 1
+                continue
+            skipped = 0
+            self._grant(queue.popleft())
+            granted = True
+            if queue:
+                self.round_robin.append(client_id)
+            else:
+                del self.queues[client_id]
+        # Whatever capacity is left, no waiting interactive request can use right now
+        while self.background and self._has_capacity() and self.active_background < self.max_active_background:
+            self._grant(self.background.popleft())
+            granted = True
+        if granted:
+            self.cond.notify_all()
+
+    def _durations(self):
+        """Typical (request, job) seconds - from the timing history when it has them"""
+        durations = self.duration_provider() if self.duration_provider else {}
+        return durations.get('request') or self.request_seconds, durations.get('job') or self.job_seconds
+
+    def estimate_drain_seconds(self, extra_requests=0):
+        """Estimated time until a newly queued request would be admitted"""
+        request_seconds, job_seconds = self._durations()
+        with self.cond:
+            waiting = self.queued_count() + extra_requests
+            request_drain = (waiting + max(0, self.active - self.max_active + 1)) * request_seconds / self.max_active
+            job_drain = max(0, self.outstanding_jobs - self.max_outstanding_jobs + 1) * job_seconds / self.max_outstanding_jobs
+            return max(request_drain, job_drain)
+
+    def _reject(self, message):
+        retry_after = max(1, int(math.ceil(self.estimate_drain_seconds(extra_requests=1))))
+        return AdmissionRejected(message, retry_after)
+
+    def admit_background(self, client_id, timeout=None):
+        """Wait for a slot interactive requests leave free. Raises AdmissionRejected after timeout seconds."""
+        with self.cond:
+            ticket = AdmissionTicket(client_id, background=True)
+            self.background.append(ticket)
+            self._dispatch()
+            deadline = ticket.enqueued_at + timeout if timeout is not None else None
+            while not ticket.granted:
+                remaining = deadline - time.time() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    self.background.remove(ticket)
+                    raise self._reject("Timed out waiting for a background generation slot")
+                self.cond.wait(remaining)
+            return ticket
+
+    def admit(self, client_id):
+        """Wait for a generation slot. Raises AdmissionRejected when overloaded."""
+        with self.cond:
+            ticket = AdmissionTicket(client_id)
+            if not self.queues and self._has_capacity() and \
+                    self.active_by_client.get(client_id, 0) < self.max_active_per_client:
+                self._grant(ticket)
+                return ticket
+
+            if self.queued_count() >= self.max_queue:
+                raise self._reject("Server is at capacity - too many queued generations")
+            client_queue = self.queues.get(client_id)
+            if client_queue is not None and len(client_queue) >= self.max_queued_per_client:
+                raise self._reject("Too many queued generations for this client")
+
+            if client_queue is None:
+                client_queue = self.queues[client_id] = deque()
+                self.round_robin.append(client_id)
+            client_queue.append(ticket)
+            self._dispatch()
+
+            deadline = ticket.enqueued_at + self.queue_timeout
+            while not ticket.granted:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    client_queue.remove(ticket)
+                    if not client_queue:
+                        del self.queues[client_id]
+                        self.round_robin.remove(client_id)
+                    raise self._reject("Timed out waiting for a generation slot")
+                self.cond.wait(remaining)
+            return ticket
+
+    def release(self, ticket):
+        """Give back a slot once its generation has finished"""
+        if not ticket.granted:
+            return
+        with self.cond:
+            ticket.granted = False
+            self.active -= 1
+            remaining = self.active_by_client.get(ticket.client_id, 1) - 1
+            if remaining:
+                self.active_by_client[ticket.client_id] = remaining
+            else:
+                self.active_by_client.pop(ticket.client_id, None)
+            if ticket.background:
+                self.active_background -= 1
+            self.request_seconds = 0.8 * self.request_seconds + 0.2 * (time.time() - ticket.granted_at)
+            self._dispatch()
+
+    def stats(self):
+        """Current load, for health checks"""
+        with self.cond:
+            stats = {
+                'active_generations': self.active,
+                'queued_generations': self.queued_count(),
+                'queued_clients': len(self.queues),
+                'active_background': self.active_background,
+                'queued_background': len(self.background),
+                'outstanding_jobs': self.outstanding_jobs,
+                'max_active': self.max_active,
+                'max_outstanding_jobs': self.max_outstanding_jobs
+            }
+        stats['estimated_drain_seconds'] = round(self.estimate_drain_seconds(), 1)
+        return stats
@@ -0,0 +1,62 @@
+# analysis_store.py - Hand /analyze-music results over to /generate-video
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+
+class AnalysisTokenStore:
+    """Short-lived tokens for a spooled upload and its analysis.
+
+    /analyze-music keeps the audio and analysis here, so /generate-video can take the
+    token instead of a second upload and a second librosa pass. Entries expire after
+    the TTL and the store is bounded; expired or evicted uploads are released.
+    """
+
+    def __init__(self, ttl=600, max_entries=256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self._entries = OrderedDict()  # token -> (expires_at, upload, analysis)
+
+    def _purge_locked(self):
+        """Drop expired entries and the oldest ones beyond the size bound"""
+        now = time.time()
+        released = []
+        for token in list(self._entries):
+            expires_at, upload, _ = self._entries[token]
+            if expires_at > now and len(self._entries) <= self.max_entries:
+                break  # Oldest first - the rest are newer
+            del self._entries[token]
+            released.append(upload)
+        return released
+
+    def issue(self, upload, analysis):
+        """Keep an upload and its analysis and return the token for them"""
+        token = str(uuid.uuid4())
+        with self.lock:
+            self._entries[token] = (time.time() + self.ttl, upload, analysis)
+            released = self._purge_locked()
+        for expired_upload in released:
+            expired_upload.release()
+        return token
+
+    def take(self, token):
+        """Claim a token: returns (upload, analysis) or None. The caller now owns the upload."""
+        with self.lock:
+            released = self._purge_locked()
+            entry = self._entries.pop(token, None)
+        for expired_upload in released:
+            expired_upload.release()
+        if entry is None:
+            return None
+        _, upload, analysis = entry
+        return upload, dict(analysis)
+
+    def purge_expired(self):
+        """Release everything past its TTL"""
+        with self.lock:
+            released = self._purge_locked()
+        for expired_upload in released:
+            expired_upload.release()
+        return len(released)
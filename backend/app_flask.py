@@ -1,33 +1,119 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, request, jsonify, send_file, g
 import os
+import time
 import uuid
 import json
-from werkzeug.utils import secure_filename
+import threading
+from werkzeug.exceptions import RequestEntityTooLarge
 from music_analyzer import MusicAnalyzer
-from video_generator import VideoGenerator
+from video_generator import VideoGenerator, QUALITY_TIERS
 from config import Config
+from admission import AdmissionController, AdmissionRejected
+from analysis_store import AnalysisTokenStore
+from batch import BatchRunner
+from credit_manager import InsufficientBudget
+from metrics import REGISTRY, HTTP_REQUEST_SECONDS
+from logs import get_logger
+import tracing
+from upload_spool import SpoolingRequest, UploadRejected, ChunkedUploadStore, purge_stale_spool_files
+
+log = get_logger('app_flask')
 
 app = Flask(__name__)
+# Stream multipart file parts straight into the upload spool
+app.request_class = SpoolingRequest
 
 # Custom CORS middleware
 @app.after_request
 def after_request(response):
     response.headers.add('Access-Control-Allow-Origin', '*')
-    response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
+    response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization,X-Client-Id,Content-Range,Range')
+    response.headers.add('Access-Control-Expose-Headers', 'Retry-After,Content-Range,Accept-Ranges,Content-Length,ETag')
     response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
     return response
 
+@app.teardown_request
+def discard_unfinished_uploads(error=None):
+    # Every file part is spooled to disk while the body is parsed - error paths and
+    # parts under other field names would otherwise stay in the upload folder
+    request.discard_unfinished_files()
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def observe_request(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        # Route pattern, not the path - keeps ids out of the label values
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint, status=response.status_code)
+    return response
+
 # Configure upload settings
 app.config['UPLOAD_FOLDER'] = Config.UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB max file size
 
 # Initialize components
-print("🚀 Initializing Music-to-Video Generator with REAL Higgsfield API...")
-print(f"   API Key: {Config.HIGGSFIELD_API_KEY[:8]}...")
-print(f"   API Secret: {Config.HIGGSFIELD_API_SECRET[:8]}...")
+log.info("🚀 Initializing Music-to-Video Generator with REAL Higgsfield API")
+
+os.makedirs(Config.UPLOAD_FOLDER, exist_ok=True)
+purge_stale_spool_files(Config.UPLOAD_FOLDER, Config.SPOOL_MAX_AGE)
+chunked_uploads = ChunkedUploadStore(Config.CHUNKED_UPLOAD_FOLDER, Config.CHUNKED_UPLOAD_TTL, Config.CHUNKED_UPLOAD_PURGE_INTERVAL)
+chunked_uploads.purge_expired()
+analysis_tokens = AnalysisTokenStore(Config.ANALYSIS_TOKEN_TTL, Config.ANALYSIS_TOKEN_MAX_ENTRIES)
 
 music_analyzer = MusicAnalyzer()
-video_generator = VideoGenerator()
+video_generator = VideoGenerator(music_analyzer)
+admission = AdmissionController(
+    max_active=Config.MAX_ACTIVE_GENERATIONS,
+    max_outstanding_jobs=Config.MAX_OUTSTANDING_JOBS,
+    max_queue=Config.MAX_QUEUED_GENERATIONS,
+    max_queued_per_client=Config.MAX_QUEUED_PER_CLIENT,
+    max_active_per_client=Config.MAX_ACTIVE_PER_CLIENT,
+    queue_timeout=Config.ADMISSION_QUEUE_TIMEOUT,
+    max_active_background=Config.MAX_ACTIVE_BATCH_GENERATIONS
+)
+video_generator.api_client.add_listener(admission.on_api_event)
+video_generator.route_planner.load_provider = admission.stats
+video_generator.degradation.load_provider = admission.stats
+admission.duration_provider = video_generator.timing_history.expected_durations
+batch_runner = BatchRunner(video_generator, Config.BATCH_ANALYSIS_WORKERS, Config.BATCH_GENERATION_WORKERS,
+                           admission=admission, admission_timeout=Config.BATCH_ADMISSION_TIMEOUT)
+
+def collect_live_metrics():
+    """Gauges read from the live components on each /metrics scrape"""
+    load = admission.stats()
+    scheduler = video_generator.scheduler.stats()
+    cache = video_generator.generation_cache.stats()
+    budget = video_generator.credit_manager.stats()
+    media = video_generator.media_store.stats()
+    breakers = video_generator.api_client.breaker_states()
+    with batch_runner.lock:
+        running_batches = sum(1 for batch in batch_runner.batches.values() if not batch['finished_at'])
+    return [
+        ('active_generations', "Generations holding an admission slot", 'gauge', [({}, load['active_generations'])]),
+        ('queued_generations', "Generations waiting for an admission slot", 'gauge', [({}, load['queued_generations'])]),
+        ('batch_generations', "Batch generations by admission state", 'gauge',
+         [({'state': 'active'}, load['active_background']), ({'state': 'queued'}, load['queued_background'])]),
+        ('outstanding_jobs', "Higgsfield jobs submitted and not yet finished", 'gauge', [({}, load['outstanding_jobs'])]),
+        ('scheduler_running_jobs', "Jobs running in scheduler slots", 'gauge', [({}, scheduler['running'])]),
+        ('scheduler_waiting_jobs', "Jobs waiting for a scheduler slot", 'gauge', [({}, scheduler['waiting'])]),
+        ('scheduler_shared_jobs', "Jobs that joined an identical job already in flight", 'counter', [({}, scheduler['shared_jobs'])]),
+        ('generation_cache_lookups', "Generation cache lookups", 'counter', [({'result': 'hit'}, cache['hits']), ({'result': 'miss'}, cache['misses'])]),
+        ('generation_cache_entries', "Entries in the generation cache", 'gauge', [({}, cache['entries'])]),
+        ('api_key_in_flight_jobs', "In-flight Higgsfield jobs per API key", 'gauge',
+         [({'key': c['label']}, c['in_flight']) for c in video_generator.api_client.credential_stats()]),
+        ('circuit_breaker_open', "1 if the endpoint's circuit breaker is not closed", 'gauge',
+         [({'endpoint': name, 'state': state['state']}, int(state['state'] != 'closed')) for name, state in sorted(breakers.items())]),
+        ('budget_credits', "API budget by state", 'gauge', [({'state': name}, budget[name]) for name in ('used', 'reserved', 'available')]),
+        ('running_batches', "Batches with unfinished tracks", 'gauge', [({}, running_batches)]),
+        ('media_store_bytes', "Bytes of clips kept in the media store", 'gauge', [({}, media['bytes'])]),
+        ('media_store_files', "Clips kept in the media store", 'gauge', [({}, media['files'])])
+    ]
+
+REGISTRY.add_collector(collect_live_metrics)
 
 # Global progress tracking
 current_progress = {
@@ -35,26 +121,129 @@ current_progress = {
     'progress': 0,
     'current_step': 0,
     'total_steps': 6,
-    'is_complete': False
+    'is_complete': False,
+    'previews': [],
+    'eta_seconds': None,
+    'poll_after_seconds': 2
 }
 
-print("✅ All components initialized with REAL API!")
+log.info("✅ All components initialized with REAL API")
+
+# Resume jobs that were in flight when the process last stopped instead of resubmitting them.
+# Orphaned holds are released first, while no new request can have reserved budget yet.
+video_generator.release_orphaned_reservations()
+threading.Thread(target=video_generator.resume_interrupted, daemon=True).start()
 
 def allowed_file(filename):
     """Check if file extension is allowed"""
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in Config.ALLOWED_EXTENSIONS
 
+def client_id():
+    """Identify the caller for fair queuing"""
+    if request.headers.get('X-Client-Id'):
+        return request.headers['X-Client-Id']
+    forwarded = request.headers.get('X-Forwarded-For', '')
+    return forwarded.split(',')[0].strip() or request.remote_addr or 'unknown'
+
+def request_value(name):
+    """Read a field from the query string, JSON body or multipart form"""
+    value = request.args.get(name) or (request.get_json(silent=True) or {}).get(name)
+    if not value and request.mimetype == 'multipart/form-data':
+        # Parses (and spools) the multipart body - may raise UploadRejected
+        value = request.form.get(name)
+    return value
+
+def receive_upload():
+    """Get the spooled upload of the current request as (spool, error_response)"""
+    try:
+        # A finalized resumable upload can be referenced instead of sending the file again
+        upload_id = request_value('upload_id')
+        if upload_id:
+            return chunked_uploads.open_upload(upload_id), None
+        
+        files = request.files
+        if 'file' not in files:
+            return None, (jsonify({"error": "No file provided"}), 400)
+        
+        file = files['file']
+        if file.filename == '':
+            return None, (jsonify({"error": "No file selected"}), 400)
+        
+        if not allowed_file(file.filename):
+            return None, (jsonify({"error": "Invalid file type"}), 400)
+        
+        spool = file.stream.finish()
+    except UploadRejected as e:
+        return None, (jsonify({"error": str(e)}), e.status_code)
+    except RequestEntityTooLarge:
+        return None, (jsonify({"error": "File too large. Maximum size is 50MB."}), 413)
+    
+    log.info("📥 Spooled upload", file=spool.filename, bytes=spool.size, format=spool.probe['format'], sha256=spool.content_hash[:12])
+    return spool, None
+
+def generation_options():
+    """Per-request generation knobs from the query string, JSON body or form"""
+    options = {}
+    for name in ('latency_target', 'cost_target'):
+        value = request_value(name)
+        if value not in (None, ''):
+            try:
+                options[name] = float(value)
+            except (TypeError, ValueError):
+                raise UploadRejected(f"{name} must be a number")
+    quality_tier = request_value('quality_tier')
+    if quality_tier not in (None, ''):
+        if quality_tier not in QUALITY_TIERS:
+            raise UploadRejected(f"quality_tier must be one of: {', '.join(QUALITY_TIERS)}")
+        options['quality_tier'] = quality_tier
+    if str(request_value('profile') or '').lower() in ('1', 'true', 'yes'):
+        options['profile'] = True
+    return options
+
+def claim_analysis_token():
+    """Get (spool, analysis, error_response) for an analysis_token from /analyze-music, if one was sent"""
+    try:
+        analysis_token = request_value('analysis_token')
+    except UploadRejected as e:
+        return None, None, (jsonify({"error": str(e)}), e.status_code)
+    except RequestEntityTooLarge:
+        return None, None, (jsonify({"error": "File too large. Maximum size is 50MB."}), 413)
+    if not analysis_token:
+        return None, None, None
+    
+    claimed = analysis_tokens.take(analysis_token)
+    if claimed is None:
+        return None, None, (jsonify({"error": "Analysis token expired or unknown - upload the file again"}), 404)
+    spool, analysis = claimed
+    return spool, analysis, None
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
     response = jsonify({
         "status": "healthy",
         "message": "Music-to-Video Server is running with CORS fix!",
+        "load": admission.stats(),
+        "budget": video_generator.credit_manager.stats(),
+        "circuit_breakers": video_generator.api_client.breaker_states(),
+        "scheduler": video_generator.scheduler.stats(),
+        "api_keys": video_generator.api_client.credential_stats(),
+        "warm_pool": video_generator.warm_pool.stats(),
+        "media_store": video_generator.media_store.stats(),
         "endpoints": {
             "POST /analyze-music": "Analyze music without generating video",
             "POST /generate-video": "Full music-to-video generation",
-            "GET /progress": "Get generation progress"
+            "GET /progress": "Get generation progress",
+            "GET /metrics": "Prometheus metrics",
+            "GET /jobs/<request_id>": "Get status and trace spans of a (possibly resumed) generation request",
+            "GET /media/<digest>": "Stored copy of a generated clip (media_url in results), with Range support",
+            "POST /batches": "Generate clips for many files or upload_ids in the background",
+            "GET /batches/<batch_id>": "Get per-track and overall progress of a batch",
+            "POST /uploads": "Start a resumable chunked upload",
+            "PUT /uploads/<upload_id>?offset=N": "Upload a chunk at a byte offset",
+            "GET /uploads/<upload_id>": "Get the offset to resume an upload from",
+            "POST /uploads/<upload_id>/finalize": "Finish an upload; then pass upload_id to /analyze-music or /generate-video"
         }
     })
     # Force CORS headers
@@ -64,40 +253,197 @@ def health_check():
     return response
 
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus text exposition of counters, histograms and live gauges"""
+    return app.response_class(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/progress', methods=['GET'])
 def get_progress():
     """Get current generation progress"""
     return jsonify(current_progress)
 
+@app.route('/jobs/<request_id>', methods=['GET'])
+def get_job(request_id):
+    """Get the journaled status and result of a generation request"""
+    record = video_generator.get_request_status(request_id)
+    if record is None:
+        return jsonify({"error": "Unknown request id"}), 404
+    return jsonify({
+        "request_id": request_id,
+        "status": record['status'],
+        "result": record['result'],
+        "error": record['error'],
+        "previews": record.get('previews', {}),
+        "eta": record.get('eta'),
+        "trace": record.get('trace'),
+        "profile": record.get('profile'),
+        "completed_steps": len(record['results']),
+        "submitted_jobs": len(record['jobs'])
+    })
+
+@app.route('/media/<digest>', methods=['GET'])
+def get_media(digest):
+    """Serve a stored clip; Range and If-None-Match requests get 206/304"""
+    stored = video_generator.media_store.open(digest)
+    if stored is None:
+        return jsonify({"error": "Unknown media"}), 404
+    path, content_type = stored
+    # send_file resolves relative paths against the app root, not the working directory
+    response = send_file(os.path.abspath(path), mimetype=content_type, conditional=True,
+                         etag=digest, max_age=Config.MEDIA_CACHE_MAX_AGE)
+    response.headers['Cache-Control'] = f"public, max-age={Config.MEDIA_CACHE_MAX_AGE}, immutable"
+    return response
+
+def receive_batch_tracks():
+    """Spooled files and finalized upload_ids of a batch request as (tracks, error_response)"""
+    tracks = []
+    
+    def release_all():
+        for track in tracks:
+            track['release']()
+    
+    try:
+        upload_ids = request.args.getlist('upload_id') or (request.get_json(silent=True) or {}).get('upload_ids') or []
+        if request.mimetype == 'multipart/form-data':
+            upload_ids = upload_ids or request.form.getlist('upload_id')
+            for file in request.files.getlist('file'):
+                if not allowed_file(file.filename):
+                    release_all()
+                    file.stream.discard()
+                    return None, (jsonify({"error": f"Invalid file type: {file.filename}"}), 400)
+                spool = file.stream.finish()
+                tracks.append({'filename': spool.filename, 'path': spool.path, 'content_hash': spool.content_hash, 'release': spool.release})
+        for upload_id in upload_ids:
+            upload = chunked_uploads.open_upload(upload_id)
+            tracks.append({'filename': upload.filename, 'path': upload.path, 'content_hash': upload.content_hash, 'release': upload.release})
+    except UploadRejected as e:
+        release_all()
+        return None, (jsonify({"error": str(e)}), e.status_code)
+    except RequestEntityTooLarge:
+        release_all()
+        return None, (jsonify({"error": "Batch too large - upload big batches with /uploads and send upload_ids"}), 413)
+    
+    if not tracks:
+        return None, (jsonify({"error": "No files or upload_ids provided"}), 400)
+    if len(tracks) > Config.BATCH_MAX_TRACKS:
+        release_all()
+        return None, (jsonify({"error": f"A batch may hold at most {Config.BATCH_MAX_TRACKS} tracks"}), 400)
+    return tracks, None
+
+@app.route('/batches', methods=['POST'])
+def create_batch():
+    """Queue many tracks for generation; poll GET /batches/<batch_id> for progress"""
+    tracks, error_response = receive_batch_tracks()
+    if error_response:
+        return error_response
+    try:
+        options = generation_options()
+    except UploadRejected as e:
+        for track in tracks:
+            track['release']()
+        return jsonify({"error": str(e)}), e.status_code
+    
+    batch_id = batch_runner.submit(tracks, options)
+    return jsonify(batch_runner.get(batch_id)), 202
+
+@app.route('/batches/<batch_id>', methods=['GET'])
+def get_batch(batch_id):
+    """Per-track and overall progress and results of a batch"""
+    snapshot = batch_runner.get(batch_id)
+    if snapshot is None:
+        return jsonify({"error": "Unknown batch id"}), 404
+    return jsonify(snapshot)
+
+def upload_status(meta):
+    """Public view of a chunked upload"""
+    return {
+        "upload_id": meta['upload_id'],
+        "filename": meta['filename'],
+        "size": meta['size'],
+        "offset": meta['received'],
+        "status": meta['status'],
+        "content_hash": meta['content_hash']
+    }
+
+@app.route('/uploads', methods=['POST'])
+def create_upload():
+    """Start a resumable chunked upload"""
+    data = request.get_json(silent=True) or {}
+    try:
+        meta = chunked_uploads.create(data.get('filename'), data.get('size'))
+    except UploadRejected as e:
+        return jsonify({"error": str(e)}), e.status_code
+    
+    status = upload_status(meta)
+    status['chunk_size'] = Config.UPLOAD_CHUNK_SIZE
+    return jsonify(status), 201
+
+@app.route('/uploads/<upload_id>', methods=['GET'])
+def get_upload(upload_id):
+    """Get the received offset of an upload so the client can resume"""
+    meta = chunked_uploads.get(upload_id)
+    if meta is None:
+        return jsonify({"error": "Unknown upload id"}), 404
+    return jsonify(upload_status(meta))
+
+@app.route('/uploads/<upload_id>', methods=['PUT'])
+def put_upload_chunk(upload_id):
+    """Write the raw request body at the given offset"""
+    offset = request.args.get('offset', type=int)
+    content_range = request.headers.get('Content-Range', '')
+    if offset is None and content_range.startswith('bytes '):
+        # Content-Range: bytes <start>-<end>/<total>
+        try:
+            offset = int(content_range[len('bytes '):].split('-', 1)[0])
+        except ValueError:
+            offset = None
+    if offset is None:
+        return jsonify({"error": "Chunk offset required (?offset=N or Content-Range)"}), 400
+    
+    try:
+        meta = chunked_uploads.write_chunk(upload_id, offset, request.stream)
+    except UploadRejected as e:
+        response = {"error": str(e)}
+        current = chunked_uploads.get(upload_id)
+        if current:
+            response['offset'] = current['received']
+        return jsonify(response), e.status_code
+    return jsonify(upload_status(meta))
+
+@app.route('/uploads/<upload_id>/finalize', methods=['POST'])
+def finalize_upload(upload_id):
+    """Complete a chunked upload"""
+    try:
+        meta = chunked_uploads.finalize(upload_id)
+    except UploadRejected as e:
+        return jsonify({"error": str(e)}), e.status_code
+    return jsonify(upload_status(meta))
+
 @app.route('/analyze-music', methods=['POST'])
 def analyze_music():
     """Analyze uploaded music file"""
     try:
-        if 'file' not in request.files:
-            return jsonify({"error": "No file provided"}), 400
-        
-        file = request.files['file']
-        if file.filename == '':
-            return jsonify({"error": "No file selected"}), 400
-        
-        if not allowed_file(file.filename):
-            return jsonify({"error": "Invalid file type"}), 400
-        
-        # Save uploaded file
-        filename = secure_filename(file.filename)
-        unique_filename = f"{uuid.uuid4()}_{filename}"
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
-        file.save(file_path)
+        spool, error_response = receive_upload()
+        if error_response:
+            return error_response
+        file_path = spool.path
         
         # Analyze music
-        analysis = music_analyzer.analyze_music(file_path)
+        try:
+            analysis = music_analyzer.analyze_music(file_path, spool.content_hash)
+        except Exception:
+            spool.release()
+            raise
         
-        # Clean up uploaded file
-        os.remove(file_path)
+        # Keep the audio and analysis so /generate-video can skip the second upload and analysis
+        analysis_token = analysis_tokens.issue(spool, analysis)
         
         return jsonify({
             "status": "success",
             "analysis": analysis,
+            "analysis_token": analysis_token,
+            "analysis_token_expires_in": Config.ANALYSIS_TOKEN_TTL,
             "message": "Music analysis completed!"
         })
         
@@ -107,27 +453,46 @@ def analyze_music():
 @app.route('/generate-video', methods=['POST'])
 def generate_video():
     """Generate video from uploaded music file"""
-    try:
-        if 'file' not in request.files:
-            return jsonify({"error": "No file provided"}), 400
-        
-        file = request.files['file']
-        if file.filename == '':
-            return jsonify({"error": "No file selected"}), 400
+    # Traced from here, so queueing and upload time show up in GET /jobs/<request_id>
+    request_id = str(uuid.uuid4())
+    with tracing.trace(request_id, on_finish=video_generator.save_trace):
+        # Wait for a generation slot before taking the upload, or tell the client when to come back
+        try:
+            with tracing.span('admission'):
+                ticket = admission.admit(client_id())
+        except AdmissionRejected as e:
+            log.info("🚦 Generation rejected", reason=e, retry_after=e.retry_after)
+            response = jsonify({"error": str(e), "retry_after": e.retry_after})
+            response.headers['Retry-After'] = str(e.retry_after)
+            return response, 429
         
-        if not allowed_file(file.filename):
-            return jsonify({"error": "Invalid file type"}), 400
+        try:
+            return run_generation(request_id)
+        finally:
+            admission.release(ticket)
+
+def run_generation(request_id):
+    """Generate video for an admitted request"""
+    try:
+        with tracing.span('upload'):
+            spool, analysis, error_response = claim_analysis_token()
+            if error_response:
+                return error_response
+            if spool is None:
+                spool, error_response = receive_upload()
+                if error_response:
+                    return error_response
+        file_path = spool.path
         
-        # Save uploaded file
-        filename = secure_filename(file.filename)
-        unique_filename = f"{uuid.uuid4()}_{filename}"
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
-        file.save(file_path)
+        try:
+            options = generation_options()
+        except UploadRejected as e:
+            spool.release()
+            return jsonify({"error": str(e)}), e.status_code
         
         # Generate video using REAL Higgsfield API
-        print("🎬 Starting video generation with REAL Higgsfield API...")
-        print(f"   File: {file_path}")
-        print(f"   File exists: {os.path.exists(file_path)}")
+        log.info("🎬 Starting video generation with REAL Higgsfield API", file=spool.filename)
+        log.debug("🎬 Upload spool", path=file_path, exists=os.path.exists(file_path))
         
         try:
             # Reset progress
@@ -136,34 +501,37 @@ def generate_video():
                 'progress': 0,
                 'current_step': 0,
                 'total_steps': 6,
-                'is_complete': False
+                'is_complete': False,
+                'previews': [],
+                'request_id': request_id,
+                'eta_seconds': None,
+                'elapsed_seconds': 0,
+                'poll_after_seconds': 2
             })
             
             def progress_callback(progress_data):
                 global current_progress
                 current_progress.update(progress_data)
-                print(f"📊 Progress: {progress_data['step']} ({progress_data['progress']}%)")
+                log.debug("📊 Progress", step=progress_data['step'], progress=progress_data['progress'], eta=progress_data.get('eta_seconds'))
             
-            result = video_generator.create_video_from_music(file_path, progress_callback)
+            result = video_generator.create_video_from_music(
+                file_path, progress_callback, request_id=request_id,
+                content_hash=spool.content_hash, music_analysis=analysis, options=options
+            )
             
             # Mark as complete
             current_progress.update({
                 'step': 'Generation complete!',
                 'progress': 100,
-                'is_complete': True
+                'is_complete': True,
+                'eta_seconds': 0
             })
             
-            print("✅ Video generation completed!")
-            print(f"   Generated {len(result['video_urls'])} videos")
-            
-            # DEBUG: Print video URLs
-            for i, video in enumerate(result['video_urls']):
-                print(f"   Video {i+1}: {video['url'][:50]}...")
-                print(f"   Type: {video['type']}")
-                print(f"   Description: {video.get('description', 'N/A')[:50]}...")
+            log.info("✅ Video generation completed", request_id=result['request_id'], videos=len(result['video_urls']))
+            log.debug("✅ Generated videos", request_id=result['request_id'], videos=result['video_urls'])
             
             # Clean up uploaded file
-            os.remove(file_path)
+            spool.release()
             
             return jsonify({
                 "status": "success",
@@ -171,14 +539,20 @@ def generate_video():
                 "message": f"Successfully generated {len(result['video_urls'])} video clips!"
             })
             
+        except InsufficientBudget as e:
+            log.info("💰 Video generation refused", reason=e)
+            spool.release()
+            return jsonify({
+                "status": "error",
+                "error": str(e),
+                "message": "Not enough API budget left for this generation."
+            }), 402
+            
         except Exception as e:
-            print(f"❌ Video generation failed: {e}")
-            import traceback
-            print(f"Traceback: {traceback.format_exc()}")
+            log.exception("❌ Video generation failed")
             
             # Clean up uploaded file
-            if os.path.exists(file_path):
-                os.remove(file_path)
+            spool.release()
             
             return jsonify({
                 "status": "error",
@@ -202,19 +576,11 @@ def internal_error(e):
     return jsonify({"error": "Internal server error"}), 500
 
 if __name__ == '__main__':
-    # Create upload folder
-    os.makedirs(Config.UPLOAD_FOLDER, exist_ok=True)
-    
     # Get port from environment (for production deployment)
     port = int(os.environ.get('PORT', 8000))
     host = os.environ.get('HOST', '0.0.0.0')
     debug = os.environ.get('DEBUG', 'False').lower() == 'true'
     
-    print("🚀 Starting Music-to-Video Flask Server...")
-    print("📍 Available Endpoints:")
-    print(f"   GET  http://{host}:{port}/health")
-    print(f"   POST http://{host}:{port}/analyze-music") 
-    print(f"   POST http://{host}:{port}/generate-video")
-    print("")
+    log.info("🚀 Starting Music-to-Video Flask Server - GET /health lists the endpoints", host=host, port=port)
     
     app.run(host=host, port=port, debug=debug)
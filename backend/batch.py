@@ -0,0 +1,244 @@
+# batch.py - Turn many tracks into clips with shared analysis and scheduling
+import argparse
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from admission import AdmissionRejected
+from credit_manager import InsufficientBudget
+import tracing
+from logs import get_logger
+
+log = get_logger('batch')
+
+
+class BatchRunner:
+    """Runs batches of tracks through a VideoGenerator in the background.
+
+    Analyses run in parallel up to `analysis_workers`; generations run up to
+    `generation_workers` at a time, and all their Higgsfield jobs go through
+    the generator's shared JobScheduler (which also dedupes identical prompts).
+    With an AdmissionController, each generation also waits (up to
+    admission_timeout seconds) for a background slot, so batches only use
+    capacity interactive requests leave free.
+    Batch state is in memory; every item is journaled under its own request_id.
+    """
+
+    def __init__(self, video_generator, analysis_workers=4, generation_workers=8, max_batches=100, admission=None,
+                 admission_timeout=None):
+        self.video_generator = video_generator
+        self.admission = admission
+        self.admission_timeout = admission_timeout
+        self.analysis_slots = threading.BoundedSemaphore(analysis_workers)
+        self.executor = ThreadPoolExecutor(max_workers=generation_workers, thread_name_prefix='batch')
+        self.max_batches = max_batches
+        self.lock = threading.Lock()
+        self.batches = OrderedDict()  # batch_id -> batch
+
+    def submit(self, tracks, options=None):
+        """Start a batch; tracks are dicts with filename, path and optionally content_hash and release()"""
+        batch_id = str(uuid.uuid4())
+        batch = {
+            'batch_id': batch_id,
+            'created_at': time.time(),
+            'finished_at': None,
+            'options': dict(options or {}),
+            'items': [{
+                'index': i,
+                'filename': track['filename'],
+                'request_id': f"{batch_id}:{i}",
+                'status': 'queued',
+                'step': '',
+                'progress': 0,
+                'eta_seconds': None,
+                'previews': [],
+                'result': None,
+                'error': None
+            } for i, track in enumerate(tracks)]
+        }
+        with self.lock:
+            self.batches[batch_id] = batch
+            self._evict()
+
+        log.info("📦 Batch submitted", batch_id=batch_id, tracks=len(tracks))
+        for item, track in zip(batch['items'], tracks):
+            self.executor.submit(self._run_item, batch, item, track)
+        return batch_id
+
+    def _evict(self):
+        """Forget the oldest finished batches (caller holds the lock)"""
+        finished = [batch_id for batch_id, batch in self.batches.items() if batch['finished_at']]
+        while len(self.batches) > self.max_batches and finished:
+            del self.batches[finished.pop(0)]
+
+    def _update(self, batch, item, **fields):
+        with self.lock:
+            item.update(fields)
+            if all(i['status'] in ('completed', 'failed') for i in batch['items']) and not batch['finished_at']:
+                batch['finished_at'] = time.time()
+                log.info("📦 Batch finished", batch_id=batch['batch_id'], **self._summary(batch))
+
+    def _run_item(self, batch, item, track):
+        with tracing.trace(item['request_id'], on_finish=self.video_generator.save_trace):
+            self._run_traced_item(batch, item, track)
+
+    def _run_traced_item(self, batch, item, track):
+        try:
+            self._update(batch, item, status='analyzing', step='Analyzing music...')
+            with tracing.span('analysis'):
+                with tracing.span('analysis.wait'):
+                    self.analysis_slots.acquire()
+                try:
+                    analysis = self.video_generator.music_analyzer.analyze_music(track['path'], track.get('content_hash'))
+                finally:
+                    self.analysis_slots.release()
+
+            def progress_callback(progress_data):
+                fields = {'step': progress_data['step'], 'progress': progress_data['progress'], 'eta_seconds': progress_data.get('eta_seconds')}
+                if 'previews' in progress_data:
+                    fields['previews'] = progress_data['previews']
+                self._update(batch, item, **fields)
+
+            ticket = None
+            if self.admission:
+                self._update(batch, item, step='Waiting for a generation slot...')
+                with tracing.span('admission'):
+                    ticket = self.admission.admit_background(f"batch:{batch['batch_id']}", self.admission_timeout)
+            try:
+                self._update(batch, item, status='generating', step='Planning video scenes...')
+                result = self.video_generator.create_video_from_music(
+                    track['path'], progress_callback, request_id=item['request_id'],
+                    content_hash=track.get('content_hash'), music_analysis=analysis, options=batch['options']
+                )
+            finally:
+                if ticket:
+                    self.admission.release(ticket)
+            self._update(batch, item, status='completed', step='Generation complete!', progress=100, eta_seconds=0, result=result)
+        except (InsufficientBudget, AdmissionRejected) as e:
+            self._update(batch, item, status='failed', error=str(e))
+        except Exception as e:
+            log.exception("❌ Batch item failed", request_id=item['request_id'], file=item['filename'])
+            self._update(batch, item, status='failed', error=str(e))
+        finally:
+            if track.get('release'):
+                track['release']()
+
+    def _summary(self, batch):
+        items = batch['items']
+        counts = {status: sum(1 for i in items if i['status'] == status) for status in ('queued', 'analyzing', 'generating', 'completed', 'failed')}
+        return {
+            'total': len(items),
+            **counts,
+            'progress': round(sum(i['progress'] for i in items) / len(items), 1) if items else 100.0,
+            'clips': sum(len(i['result']['video_urls']) for i in items if i['result'])
+        }
+
+    def get(self, batch_id):
+        """Snapshot of a batch with per-item and overall progress, or None"""
+        with self.lock:
+            batch = self.batches.get(batch_id)
+            if batch is None:
+                return None
+            snapshot = json.loads(json.dumps(batch))
+            snapshot['summary'] = self._summary(batch)
+        snapshot['status'] = 'completed' if snapshot['finished_at'] else 'running'
+        return snapshot
+
+
+def find_tracks(paths, extensions):
+    """Audio files among the given files and directories (searched recursively)"""
+    tracks = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for name in sorted(files):
+                    if name.rsplit('.', 1)[-1].lower() in extensions:
+                        tracks.append(os.path.join(root, name))
+        elif os.path.isfile(path):
+            tracks.append(path)
+        else:
+            log.warning("⚠️ Skipping missing path", path=path)
+    return tracks
+
+
+def _server_request(server, method, path, body=None, headers=None, timeout=60):
+    """JSON response of one call to the API server; HTTP errors become RuntimeError with the server's message"""
+    request = urllib.request.Request(server.rstrip('/') + path, data=body, headers=headers or {}, method=method)
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        try:
+            message = json.loads(e.read()).get('error')
+        except ValueError:
+            message = None
+        raise RuntimeError(f"{method} {path} failed: {e.code} {message or e.reason}")
+
+
+def _post_json(server, path, data):
+    return _server_request(server, 'POST', path, json.dumps(data).encode('utf-8'), {'Content-Type': 'application/json'})
+
+
+def upload_track(server, path):
+    """Send a track through the server's resumable uploads and return its upload_id"""
+    status = _post_json(server, '/uploads', {'filename': os.path.basename(path), 'size': os.path.getsize(path)})
+    upload_id = status['upload_id']
+    offset = 0
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(status['chunk_size']), b''):
+            _server_request(server, 'PUT', f"/uploads/{upload_id}?offset={offset}", chunk,
+                            {'Content-Type': 'application/octet-stream'})
+            offset += len(chunk)
+    _server_request(server, 'POST', f"/uploads/{upload_id}/finalize")
+    return upload_id
+
+
+if __name__ == "__main__":
+    # Batches run inside the API server: it owns the credit ledger and job journal, and
+    # its admission control keeps batch items behind interactive requests
+    from config import Config
+    from video_generator import QUALITY_TIERS
+
+    parser = argparse.ArgumentParser(description="Generate clips for many tracks in one batch on the running API server")
+    parser.add_argument('paths', nargs='+', help="audio files or directories")
+    parser.add_argument('--quality-tier', choices=QUALITY_TIERS)
+    parser.add_argument('--server', default=Config.BATCH_SERVER_URL, help="URL of the running API server")
+    parser.add_argument('--out', default='batch_results.json', help="where to write the final batch report")
+    args = parser.parse_args()
+
+    track_paths = find_tracks(args.paths, Config.ALLOWED_EXTENSIONS)
+    if not track_paths:
+        raise SystemExit("❌ No audio files found")
+    try:
+        _server_request(args.server, 'GET', '/health', timeout=10)
+    except (urllib.error.URLError, OSError) as e:
+        raise SystemExit(f"❌ No API server at {args.server} ({e}) - start it first (python app_flask.py)")
+
+    try:
+        upload_ids = []
+        for path in track_paths:
+            upload_ids.append(upload_track(args.server, path))
+            print(f"📤 Uploaded {len(upload_ids)}/{len(track_paths)}: {path}")
+        body = {'upload_ids': upload_ids}
+        if args.quality_tier:
+            body['quality_tier'] = args.quality_tier
+        batch_id = _post_json(args.server, '/batches', body)['batch_id']
+
+        while True:
+            snapshot = _server_request(args.server, 'GET', f"/batches/{batch_id}")
+            summary = snapshot['summary']
+            print(f"📦 {summary['completed']}/{summary['total']} done, {summary['failed']} failed, {summary['progress']}% overall")
+            if snapshot['status'] == 'completed':
+                break
+            time.sleep(5)
+    except RuntimeError as e:
+        raise SystemExit(f"❌ {e}")
+
+    with open(args.out, 'w', encoding='utf-8') as f:
+        json.dump(snapshot, f, indent=2)
+    print(f"✅ Batch report written to {args.out}")
@@ -4,6 +4,11 @@ class Config:
     # Higgsfield API credentials - REAL CREDENTIALS SET!
     HIGGSFIELD_API_KEY = os.getenv('HIGGSFIELD_API_KEY', '7f3a2ee6-aeb6-4dc7-bd70-a9c01e841b0c')
     HIGGSFIELD_API_SECRET = os.getenv('HIGGSFIELD_API_SECRET', 'e5d0fdb10e97f43dfcee9031d78ec1ef28e254c20c817010c60050b67f9459eb')
+    # Extra accounts to spread jobs across, as "key:secret,key:secret"
+    HIGGSFIELD_CREDENTIALS = os.getenv('HIGGSFIELD_CREDENTIALS', '')
+    MAX_JOBS_PER_KEY = int(os.getenv('MAX_JOBS_PER_KEY', 4))  # In-flight jobs per account
+    KEY_THROTTLE_COOLDOWN = 30  # Seconds a key is skipped after a 429
+    MAX_CONCURRENT_JOBS = int(os.getenv('MAX_CONCURRENT_JOBS', 0))  # Process-wide; 0 = MAX_JOBS_PER_KEY per key
     
     # API endpoints - correct base URL from documentation
     HIGGSFIELD_BASE_URL = "https://platform.higgsfield.ai/v1"
@@ -16,13 +21,134 @@ class Config:
         'text_to_video': 'minimax-t2v'        # Minimax T2V - Text to Video
     }
     
+    # Expected job durations (seconds) until real ones have been observed
+    DEFAULT_MODEL_LATENCY = {
+        'nano-banana': 15,
+        'kling-2-5': 60,
+        'minimax-t2v': 70
+    }
+    # Expected request stage durations (seconds) until real ones have been observed - the ETA starts from these
+    DEFAULT_STAGE_SECONDS = {
+        'analysis': 10,
+        'planning': 1,
+        'scene:image_to_video': DEFAULT_MODEL_LATENCY['nano-banana'] + DEFAULT_MODEL_LATENCY['kling-2-5'] + 4,
+        'scene:text_to_video': DEFAULT_MODEL_LATENCY['minimax-t2v'] + 2,
+        'special': DEFAULT_MODEL_LATENCY['minimax-t2v'] + 2,
+        'media': 3,
+        'assembly': 5,
+        'fallback': 6,
+        'generation': 2 * (DEFAULT_MODEL_LATENCY['nano-banana'] + DEFAULT_MODEL_LATENCY['kling-2-5'] + 4),
+        'request': 2 * (DEFAULT_MODEL_LATENCY['nano-banana'] + DEFAULT_MODEL_LATENCY['kling-2-5'] + 4) + 19
+    }
+    TIMING_HISTORY_PATH = os.getenv('TIMING_HISTORY_PATH', 'data/timing_history.json')
+    SCENE_LATENCY_SLA = float(os.getenv('SCENE_LATENCY_SLA', 90))  # Target seconds per scene
+    DEFAULT_QUALITY_TIER = os.getenv('DEFAULT_QUALITY_TIER', 'final')  # 'preview' shows a still per scene first
+    
+    # Clip lengths in seconds per route; the minimums are the shortest the models accept
+    VIDEO_DURATIONS = {
+        'image_to_video': int(os.getenv('I2V_DURATION', 5)),
+        'text_to_video': int(os.getenv('T2V_DURATION', 6))
+    }
+    MIN_VIDEO_DURATIONS = {
+        'image_to_video': 5,
+        'text_to_video': 6
+    }
+    
+    # Load-aware degradation - trim requests instead of letting everyone time out
+    DEGRADATION_ENABLED = os.getenv('DEGRADATION_ENABLED', 'true').lower() == 'true'
+    
+    # Generation cache - identical model calls reuse earlier results
+    GENERATION_CACHE_ENABLED = os.getenv('GENERATION_CACHE_ENABLED', 'true').lower() == 'true'
+    GENERATION_CACHE_SIZE = 1024
+    GENERATION_CACHE_TTL = 24 * 3600  # Result URLs are not kept forever by Higgsfield
+    
+    # Warm pool - catalog images/clips pre-generated by `python warm_pool.py`
+    WARM_POOL_ENABLED = os.getenv('WARM_POOL_ENABLED', 'true').lower() == 'true'
+    WARM_POOL_PATH = os.getenv('WARM_POOL_PATH', 'data/warm_pool.json')
+    WARM_POOL_TTL = 24 * 3600
+    WARM_POOL_FLUSH_INTERVAL = 30  # Seconds between writes of handed-out assets and usage to the file
+    WARM_POOL_MIN_IMAGES = 1  # Per catalog entry, even if never used
+    WARM_POOL_MAX_IMAGES = 6  # For the most used entry; others scale with their usage
+    
+    # Media store - finished clips downloaded once and served from /media/<digest> instead of the remote URL
+    MEDIA_STORE_ENABLED = os.getenv('MEDIA_STORE_ENABLED', 'true').lower() == 'true'
+    MEDIA_STORE_PATH = os.getenv('MEDIA_STORE_PATH', 'data/media')
+    MEDIA_STORE_MAX_BYTES = int(os.getenv('MEDIA_STORE_MAX_BYTES', 5 * 1024 * 1024 * 1024))  # Least recently served go first
+    MEDIA_DOWNLOAD_WORKERS = int(os.getenv('MEDIA_DOWNLOAD_WORKERS', 4))
+    MEDIA_DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+    MEDIA_CACHE_MAX_AGE = 365 * 24 * 3600  # A digest's bytes never change
+    
+    # Final video - clips cut on beats and joined with the uploaded audio by a local ffmpeg
+    ASSEMBLY_ENABLED = os.getenv('ASSEMBLY_ENABLED', 'true').lower() == 'true'
+    FFMPEG_PATH = os.getenv('FFMPEG_PATH', 'ffmpeg')
+    FFPROBE_PATH = os.getenv('FFPROBE_PATH', 'ffprobe')
+    ASSEMBLY_TIMEOUT = 120  # Seconds per ffmpeg call
+    
+    # Fallback renderer - a local audio-reactive video when Higgsfield returns no clips (down, too slow, no budget)
+    FALLBACK_RENDER_ENABLED = os.getenv('FALLBACK_RENDER_ENABLED', 'true').lower() == 'true'
+    FALLBACK_VIDEO_SIZE = (640, 360)
+    FALLBACK_FPS = 24
+    FALLBACK_MAX_SECONDS = int(os.getenv('FALLBACK_MAX_SECONDS', 30))  # Rendered from the start of the track
+    
+    # Hedging - duplicate jobs running past their model's p95 latency
+    HEDGING_ENABLED = os.getenv('HEDGING_ENABLED', 'false').lower() == 'true'
+    HEDGE_MIN_SAMPLES = 20        # Observed jobs per model before its p95 is trusted
+    HEDGE_MAX_EXTRA_SHARE = float(os.getenv('HEDGE_MAX_EXTRA_SHARE', 0.1))  # Hedges may add at most 10% spend
+    
+    # Higgsfield request handling
+    REQUEST_TIMEOUT = 30  # Seconds per HTTP call; timeouts are retryable
+    
     # Generation settings
     MAX_POLLING_TIME = 300  # 5 minutes max wait
     POLLING_INTERVAL = 5    # Check every 5 seconds
     
+    # Admission control - caps concurrent generations by outstanding Higgsfield work
+    MAX_ACTIVE_GENERATIONS = int(os.getenv('MAX_ACTIVE_GENERATIONS', 4))
+    MAX_OUTSTANDING_JOBS = int(os.getenv('MAX_OUTSTANDING_JOBS', 8))
+    MAX_QUEUED_GENERATIONS = int(os.getenv('MAX_QUEUED_GENERATIONS', 16))
+    MAX_QUEUED_PER_CLIENT = int(os.getenv('MAX_QUEUED_PER_CLIENT', 2))
+    MAX_ACTIVE_PER_CLIENT = int(os.getenv('MAX_ACTIVE_PER_CLIENT', 2))
+    ADMISSION_QUEUE_TIMEOUT = 120  # Seconds a generation may wait for a slot before getting a 429
+    
     # Budget (in dollars)
-    TOTAL_BUDGET = 100.00
+    TOTAL_BUDGET = float(os.getenv('TOTAL_BUDGET', 100.00))
+    CREDIT_LEDGER_PATH = os.getenv('CREDIT_LEDGER_PATH', 'data/credit_ledger.json')
     
     # File upload settings
     UPLOAD_FOLDER = 'uploads'
-    ALLOWED_EXTENSIONS = {'mp3', 'wav', 'm4a', 'ogg'}
\ No newline at end of file
+    ALLOWED_EXTENSIONS = {'mp3', 'wav', 'm4a', 'ogg'}
+    MAX_UPLOAD_BYTES = 50 * 1024 * 1024           # Enforced while the body streams in
+    MAX_AUDIO_DURATION = int(os.getenv('MAX_AUDIO_DURATION', 15 * 60))  # Seconds, from the header probe
+    SPOOL_MAX_AGE = 6 * 3600                      # Spooled files older than this are leftovers
+    CHUNKED_UPLOAD_FOLDER = os.path.join(UPLOAD_FOLDER, 'chunked')
+    CHUNKED_UPLOAD_TTL = 24 * 3600                # Unfinished/unused resumable uploads expire after a day
+    CHUNKED_UPLOAD_PURGE_INTERVAL = 3600          # Expired uploads are purged at most this often, as new ones start
+    UPLOAD_CHUNK_SIZE = 5 * 1024 * 1024           # Suggested chunk size for resumable uploads
+    ANALYSIS_TOKEN_TTL = 600                      # /analyze-music results stay claimable for 10 minutes
+    ANALYSIS_TOKEN_MAX_ENTRIES = 256
+    
+    # Batch generation - many tracks per request, sharing the Higgsfield job scheduler
+    BATCH_MAX_TRACKS = int(os.getenv('BATCH_MAX_TRACKS', 500))
+    BATCH_ANALYSIS_WORKERS = int(os.getenv('BATCH_ANALYSIS_WORKERS', 4))
+    BATCH_GENERATION_WORKERS = int(os.getenv('BATCH_GENERATION_WORKERS', 8))
+    # Batch generations at once, admitted only into slots no interactive request is waiting for
+    MAX_ACTIVE_BATCH_GENERATIONS = int(os.getenv('MAX_ACTIVE_BATCH_GENERATIONS', max(1, MAX_ACTIVE_GENERATIONS - 1)))
+    BATCH_ADMISSION_TIMEOUT = int(os.getenv('BATCH_ADMISSION_TIMEOUT', 3600))  # Seconds a batch item may wait behind interactive traffic
+    # The batch CLI sends its tracks to this running server, which owns the ledger and journal
+    BATCH_SERVER_URL = os.getenv('BATCH_SERVER_URL', f"http://localhost:{os.getenv('PORT', 8000)}")
+    
+    # Job journal - submitted job_set_ids survive restarts and get resumed
+    JOB_JOURNAL_PATH = os.getenv('JOB_JOURNAL_PATH', 'data/job_journal.jsonl')
+    JOB_JOURNAL_RETENTION = int(os.getenv('JOB_JOURNAL_RETENTION', 24 * 3600))  # Keep finished requests for a day    
+    # Logging - LOG_LEVEL=DEBUG adds request/response payloads and every poll iteration
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+    LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')  # 'text' (key=value) or 'json' (one object per line)
+    LOG_SAMPLE_EVERY = int(os.getenv('LOG_SAMPLE_EVERY', 10))  # Log 1st and every Nth occurrence of high-frequency events
+    
+    # Tracing - per-request spans stored with the job and returned by GET /jobs/<request_id>
+    TRACE_ENABLED = os.getenv('TRACE_ENABLED', 'true').lower() == 'true'
+    TRACE_MAX_SPANS = int(os.getenv('TRACE_MAX_SPANS', 500))
+    # Profiling - cProfile report for sampled requests, or ones sent with profile=1 if allowed
+    PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', 0))
+    PROFILE_ON_REQUEST = os.getenv('PROFILE_ON_REQUEST', 'false').lower() == 'true'  # Reports expose code paths
+    PROFILE_TOP_FUNCTIONS = int(os.getenv('PROFILE_TOP_FUNCTIONS', 40))
@@ -0,0 +1,130 @@
+# credential_pool.py - Spread Higgsfield jobs across several API key/secret pairs
+import hashlib
+import threading
+import time
+from collections import deque
+from resilience import RetryableError
+from logs import get_logger
+
+log = get_logger('credential_pool')
+
+
+def parse_credentials(value):
+    """Parse 'key:secret,key:secret' into [(key, secret), ...]"""
+    pairs = []
+    for item in (value or '').split(','):
+        item = item.strip()
+        if not item:
+            continue
+        key, _, secret = item.partition(':')
+        if key and secret:
+            pairs.append((key.strip(), secret.strip()))
+    return pairs
+
+
+class Credential:
+    """One key/secret pair with its live load"""
+
+    def __init__(self, api_key, api_secret):
+        self.api_key = api_key
+        self.api_secret = api_secret
+        # Stable id that is safe to journal and log - never the key itself
+        self.label = hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:12]
+        self.in_flight = 0
+        self.throttles = deque()  # timestamps of recent 429s
+        self.cooldown_until = 0.0
+
+
+class CredentialPool:
+    """Least-loaded selection over key/secret pairs with per-key concurrency limits.
+
+    A key that gets a 429 cools down for a while and is skipped; among the usable
+    keys the one with the fewest in-flight jobs (then fewest recent 429s) wins.
+    A job stays charged to its key until polling finishes, and polling always goes
+    through the key that submitted it.
+    """
+
+    def __init__(self, pairs, max_in_flight=4, cooldown=30.0, throttle_window=60.0, wait_timeout=60.0):
+        if not pairs:
+            raise ValueError("At least one Higgsfield key/secret pair is required")
+        self.credentials = []
+        seen = set()
+        for key, secret in pairs:
+            if key not in seen:
+                seen.add(key)
+                self.credentials.append(Credential(key, secret))
+        self.max_in_flight = max_in_flight
+        self.cooldown = cooldown
+        self.throttle_window = throttle_window
+        self.wait_timeout = wait_timeout
+        self.cond = threading.Condition()
+
+    def __len__(self):
+        return len(self.credentials)
+
+    def default(self):
+        """The primary credential (first configured pair)"""
+        return self.credentials[0]
+
+    def _recent_throttles(self, credential, now):
+        while credential.throttles and credential.throttles[0] < now - self.throttle_window:
+            credential.throttles.popleft()
+        return len(credential.throttles)
+
+    def _pick(self, now):
+        usable = [c for c in self.credentials if c.cooldown_until <= now and c.in_flight < self.max_in_flight]
+        if not usable:
+            return None
+        return min(usable, key=lambda c: (c.in_flight, self._recent_throttles(c, now)))
+
+    def acquire(self):
+        """Claim the least-loaded usable credential for a new job, waiting if all are busy"""
+        deadline = time.time() + self.wait_timeout
+        with self.cond:
+            while True:
+                now = time.time()
+                credential = self._pick(now)
+                if credential is not None:
+                    credential.in_flight += 1
+                    return credential
+                if now >= deadline:
+                    soonest = min(max(c.cooldown_until - now, 1.0) for c in self.credentials)
+                    raise RetryableError("All Higgsfield API keys are busy or throttled", 'credentials', retry_after=soonest)
+                # Wake up when a job finishes or the first cooldown ends
+                cooling = [c.cooldown_until - now for c in self.credentials if c.cooldown_until > now]
+                self.cond.wait(min([deadline - now] + cooling))
+
+    def claim(self, label):
+        """Charge a job to a specific credential (resumed polls); falls back to the primary"""
+        with self.cond:
+            credential = next((c for c in self.credentials if c.label == label), self.default())
+            credential.in_flight += 1
+            return credential
+
+    def release(self, credential):
+        """A job on this credential is done"""
+        with self.cond:
+            credential.in_flight = max(0, credential.in_flight - 1)
+            self.cond.notify_all()
+
+    def report_throttled(self, credential, retry_after=None):
+        """Cool a credential down after a 429"""
+        with self.cond:
+            now = time.time()
+            credential.throttles.append(now)
+            # Back off longer on keys that keep getting throttled
+            cooldown = max(retry_after or 0, self.cooldown * min(4, self._recent_throttles(credential, now)))
+            credential.cooldown_until = max(credential.cooldown_until, now + cooldown)
+            log.warning("🔑 Key throttled - cooling down", key=credential.label, seconds=round(cooldown))
+            self.cond.notify_all()
+
+    def stats(self):
+        """Load per credential, for health checks"""
+        with self.cond:
+            now = time.time()
+            return [{
+                'label': c.label,
+                'in_flight': c.in_flight,
+                'recent_throttles': self._recent_throttles(c, now),
+                'cooling_down_for': round(max(0.0, c.cooldown_until - now), 1)
+            } for c in self.credentials]
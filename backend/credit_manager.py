@@ -1,5 +1,19 @@
+import json
+import os
+import threading
+import time
+from logs import get_logger
+
+log = get_logger('credit_manager')
+
+
+class InsufficientBudget(Exception):
+    """Raised when not even a reduced plan fits in the remaining budget"""
+    pass
+
+
 class CreditManager:
-    def __init__(self, total_budget=100.00):
+    def __init__(self, total_budget=100.00, ledger_path=None):
         self.total_budget = total_budget
         self.used_budget = 0.0
         # Actual Higgsfield pricing from documentation
@@ -9,25 +23,122 @@ class CreditManager:
             'kling-2-5': 0.25,         # Image-to-video Kling 2.5 Turbo (4 credits = $0.25)
             'minimax-t2v': 0.50        # Text-to-video Minimax T2V (8 credits = $0.50)
         }
-    
+        # Budget held for work in flight: request_id -> {step: {'model': ..., 'cost': ...}}
+        self.reservations = {}
+        self.lock = threading.RLock()
+        self.ledger_path = ledger_path
+        self._load()
+
+    def _load(self):
+        """Restore usage and open reservations from the ledger file"""
+        if not self.ledger_path or not os.path.exists(self.ledger_path):
+            return
+        with open(self.ledger_path, 'r', encoding='utf-8') as f:
+            ledger = json.load(f)
+        self.used_budget = ledger.get('used_budget', 0.0)
+        self.reservations = ledger.get('reservations', {})
+        log.info("💰 Credit ledger loaded", used=round(self.used_budget, 2), reserved=round(self.get_reserved_budget(), 2))
+
+    def _save(self):
+        """Atomically persist the ledger (caller holds the lock)"""
+        if not self.ledger_path:
+            return
+        directory = os.path.dirname(self.ledger_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.ledger_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'used_budget': self.used_budget,
+                'reservations': self.reservations,
+                'updated_at': time.time()
+            }, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.ledger_path)
+
+    def estimate_cost(self, model_type, operation_count=1):
+        """Estimated dollar cost of operations on a model"""
+        return self.estimated_costs.get(model_type, 0.10) * operation_count
+
     def can_afford(self, model_type, operation_count=1):
         """Check if we have enough budget for the operation"""
-        cost_per_operation = self.estimated_costs.get(model_type, 0.10)
-        total_cost = cost_per_operation * operation_count
-        return (self.used_budget + total_cost) <= self.total_budget
-    
+        return self.estimate_cost(model_type, operation_count) <= self.get_available_budget()
+
     def add_usage(self, model_type, operations=1):
         """Record usage and deduct from budget"""
-        cost_per_operation = self.estimated_costs.get(model_type, 0.10)
-        cost = cost_per_operation * operations
-        self.used_budget += cost
-        print(f"Used ${cost:.2f} for {model_type}. Total used: ${self.used_budget:.2f}")
-        return self.used_budget
-    
+        cost = self.estimate_cost(model_type, operations)
+        with self.lock:
+            self.used_budget += cost
+            self._save()
+            log.debug("💰 Credits used", model=model_type, cost=round(cost, 2), total_used=round(self.used_budget, 2))
+            return self.used_budget
+
+    def reserve(self, request_id, steps):
+        """Hold budget for the planned steps [(step, model), ...] of a request"""
+        holds = {step: {'model': model, 'cost': self.estimate_cost(model)} for step, model in steps}
+        amount = sum(hold['cost'] for hold in holds.values())
+        with self.lock:
+            if amount > self.get_available_budget():
+                raise InsufficientBudget(
+                    f"Plan needs ${amount:.2f} but only ${self.get_available_budget():.2f} is available"
+                )
+            self.reservations.setdefault(request_id, {}).update(holds)
+            self._save()
+        log.info("💰 Budget reserved", request_id=request_id, amount=round(amount, 2), available=round(self.get_available_budget(), 2))
+        return amount
+
+    def commit(self, request_id, step):
+        """Turn the hold for a finished job into usage (no-op if already committed)"""
+        with self.lock:
+            hold = self.reservations.get(request_id, {}).pop(step, None)
+            if hold is None:
+                return
+            self.used_budget += hold['cost']
+            if not self.reservations[request_id]:
+                del self.reservations[request_id]
+            self._save()
+        log.debug("💰 Credits used", request_id=request_id, model=hold['model'], cost=round(hold['cost'], 2), total_used=round(self.used_budget, 2))
+
+    def release(self, request_id, step=None):
+        """Drop the hold for one step, or every remaining hold of the request"""
+        with self.lock:
+            holds = self.reservations.get(request_id)
+            if not holds:
+                return
+            if step is None:
+                del self.reservations[request_id]
+            else:
+                holds.pop(step, None)
+                if not holds:
+                    del self.reservations[request_id]
+            self._save()
+
+    def get_reserved_budget(self):
+        """Get budget held for work in flight"""
+        with self.lock:
+            return sum(hold['cost'] for holds in self.reservations.values() for hold in holds.values())
+
+    def get_available_budget(self):
+        """Get budget that is neither used nor reserved"""
+        with self.lock:
+            return self.total_budget - self.used_budget - self.get_reserved_budget()
+
     def get_remaining_budget(self):
         """Get remaining budget"""
-        return self.total_budget - self.used_budget
-    
+        with self.lock:
+            return self.total_budget - self.used_budget
+
     def get_usage_percentage(self):
         """Get percentage of budget used"""
-        return (self.used_budget / self.total_budget) * 100
\ No newline at end of file
+        return (self.used_budget / self.total_budget) * 100
+
+    def stats(self):
+        """Budget summary for health checks"""
+        with self.lock:
+            return {
+                'total': round(self.total_budget, 2),
+                'used': round(self.used_budget, 2),
+                'reserved': round(self.get_reserved_budget(), 2),
+                'available': round(self.get_available_budget(), 2)
+            }
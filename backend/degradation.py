@@ -0,0 +1,84 @@
+# degradation.py - Shrink requests while the service is overloaded
+from config import Config
+from logs import get_logger
+
+log = get_logger('degradation')
+
+
+class DegradationPolicy:
+    """Picks how much to trim a request from live queue depth and Higgsfield latency.
+
+    Level 1 drops the special moment, level 2 also shortens clips to the
+    model minimum (where the configured length is longer) and drops preview
+    stills, level 3 also cuts to one scene.
+    """
+
+    def __init__(self, latency_stats, load_provider=None, queue_steps=(0.5, 1.0, 2.0), latency_steps=(1.5, 2.0, 3.0)):
+        self.latency_stats = latency_stats
+        self.load_provider = load_provider  # () -> AdmissionController.stats()
+        self.queue_steps = queue_steps      # queued requests per generation slot
+        self.latency_steps = latency_steps  # recent job duration / expected duration
+
+    def signals(self):
+        """Current queue pressure and latency ratio"""
+        queue_pressure = 0.0
+        if self.load_provider is not None:
+            stats = self.load_provider()
+            queue_pressure = stats.get('queued_generations', 0) / max(1, stats.get('max_active', 1))
+        latency_ratio = 1.0
+        for model, expected in self.latency_stats.defaults.items():
+            recent = self.latency_stats.recent_mean(model)
+            if expected and recent:
+                latency_ratio = max(latency_ratio, recent / expected)
+        return {'queue_pressure': round(queue_pressure, 2), 'latency_ratio': round(latency_ratio, 2)}
+
+    def level(self, signals):
+        """0 (full quality) to 3 (heaviest trimming)"""
+        level = 0
+        for i, (queue_step, latency_step) in enumerate(zip(self.queue_steps, self.latency_steps)):
+            if signals['queue_pressure'] >= queue_step or signals['latency_ratio'] >= latency_step:
+                level = i + 1
+        return level
+
+    def apply(self, scene_plan):
+        """Trim the plan for the current load; returns the adjustments made"""
+        signals = self.signals()
+        level = self.level(signals)
+        if level == 0:
+            return []
+
+        adjustments = []
+
+        def record(action, **details):
+            adjustments.append({'reason': 'load', 'action': action, 'level': level, **signals, **details})
+
+        if scene_plan['special_moments']:
+            scene_plan['special_moments'] = []
+            record('dropped_special_moment')
+
+        if level >= 2:
+            # Routes whose clips are longer than the model minimum - none with the default lengths
+            durations = {route: minimum for route, minimum in Config.MIN_VIDEO_DURATIONS.items()
+                         if Config.VIDEO_DURATIONS[route] > minimum}
+            if durations:
+                # Plan-wide lengths also cover clips without a scene, like the special moment
+                scene_plan['clip_durations'] = durations
+                shortened = 0
+                for scene in scene_plan['scenes']:
+                    route = scene.get('route', 'image_to_video')
+                    if route in durations and scene.get('duration', Config.VIDEO_DURATIONS[route]) > durations[route]:
+                        scene['duration'] = durations[route]
+                        shortened += 1
+                if shortened:
+                    record('shortened_clips', clips=shortened)
+            if scene_plan.get('quality_tier') == 'preview':
+                scene_plan['quality_tier'] = 'final'
+                record('dropped_previews')
+
+        if level >= 3 and len(scene_plan['scenes']) > 1:
+            scene_plan['scenes'] = scene_plan['scenes'][:1]
+            record('reduced_scenes', scenes=1)
+
+        if adjustments:
+            log.info("🪫 Degrading request under load", level=level, actions=[a['action'] for a in adjustments])
+        return adjustments
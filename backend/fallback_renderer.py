@@ -0,0 +1,160 @@
+# fallback_renderer.py - Audio-reactive video rendered locally when Higgsfield produces no clips
+import shutil
+import subprocess
+import numpy as np
+from logs import get_logger
+import tracing
+
+log = get_logger('fallback_renderer')
+
+# Base hue (0..1 around the color wheel) per analyzer mood
+MOOD_HUES = {'energetic': 0.02, 'dynamic': 0.72, 'calm': 0.55}
+RING_DENSITY = 14.0  # Radians of ring phase per unit of radius
+SPOKES = 6
+LEVELS = 64  # Brightness steps per hue in the color table
+
+
+class RenderError(Exception):
+    """ffmpeg failed while encoding the fallback video"""
+
+
+class FallbackRenderer:
+    """Rings that pulse with loudness, flash on onsets and move with the beat.
+
+    Everything that depends only on the pixel position (radius, angle and their
+    sines and cosines) is computed once; each frame is then a few multiply-adds
+    of those fields with the frame's features, and one lookup from (hue,
+    brightness) to packed RGB. Frames are built batch_frames at a time in
+    reused (frames, height, width) arrays, with no per-frame or per-pixel
+    Python loop, and piped as raw video into ffmpeg, which encodes them with
+    the audio - nothing is written to disk but the finished MP4.
+    """
+
+    def __init__(self, ffmpeg='ffmpeg', width=640, height=360, fps=24, batch_frames=8, timeout=120):
+        self.ffmpeg = ffmpeg
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.batch_frames = batch_frames
+        self.timeout = timeout
+
+        y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+        x = (x - width / 2) / (height / 2)
+        y = (y - height / 2) / (height / 2)
+        radius = np.sqrt(x * x + y * y)
+        angle = np.arctan2(y, x) / np.float32(2 * np.pi)  # -0.5..0.5
+        self.ring_sin = np.sin(RING_DENSITY * radius)
+        self.ring_cos = np.cos(RING_DENSITY * radius)
+        self.spoke_sin = np.sin(2 * np.pi * SPOKES * angle)
+        self.spoke_cos = np.cos(2 * np.pi * SPOKES * angle)
+        # Pre-scaled to brightness levels, so frames never leave level units
+        self.vignette = np.clip(1.25 - 0.55 * radius, 0, 1) * np.float32(LEVELS - 1)
+        self.glow = np.exp(-2.5 * radius) * np.float32(LEVELS - 1)
+        # Hue varies around the center; per frame only an offset is added. As a
+        # row offset into the color table, which holds the wheel twice so the sum never wraps.
+        self.hue_rows = (((0.15 * np.cos(2 * np.pi * angle) + radius * 0.12) * 256).astype(np.int32) & 255) * LEVELS
+        # (hue, brightness level) -> RGBX packed in a little-endian uint32, i.e. ffmpeg's rgb0
+        hues = np.arange(512, dtype=np.float32)[:, None, None] / 256
+        levels = np.arange(LEVELS, dtype=np.float32)[None, :, None] / (LEVELS - 1)
+        rgb = (0.5 + 0.5 * np.cos(2 * np.pi * (hues + np.array([0, 1 / 3, 2 / 3], dtype=np.float32)))) * levels * 255
+        rgb = rgb.astype(np.uint32).reshape(512 * LEVELS, 3)
+        self.colors = (rgb[:, 0] | rgb[:, 1] << 8 | rgb[:, 2] << 16).astype('<u4')
+
+    def _buffers(self):
+        """Work arrays for one batch, reused by every batch of a render"""
+        shape = (self.batch_frames, self.height, self.width)
+        return {
+            'value': np.empty(shape, np.float32),
+            'spokes': np.empty(shape, np.float32),
+            'scratch': np.empty(shape, np.float32),
+            'index': np.empty(shape, np.int32),
+            'level': np.empty(shape, np.int32),
+            'pixels': np.empty(shape, '<u4')
+        }
+
+    def available(self):
+        return shutil.which(self.ffmpeg) is not None
+
+    def _frames(self, features, start, end, base_hue, buffers):
+        """Frames [start, end) as a (frames, height, width) array of rgb0 pixels, a view into buffers"""
+        def per_frame(name):
+            return features[name][start:end, None, None]
+
+        value, spokes, scratch, index, level, pixels = (
+            buffers[name][:end - start] for name in ('value', 'spokes', 'scratch', 'index', 'level', 'pixels')
+        )
+        times = np.arange(start, end, dtype=np.float32)[:, None, None] / self.fps
+        # sin(k*r - phase) = sin(k*r)cos(phase) - cos(k*r)sin(phase): per pixel only multiply-adds
+        # Rings drift outwards slowly and step forward by one ring per beat
+        ring_phase = 2 * np.pi * (0.3 * times + per_frame('beat_phase'))
+        np.multiply(self.ring_sin, np.cos(ring_phase), out=value)
+        np.multiply(self.ring_cos, np.sin(ring_phase), out=scratch)
+        value -= scratch
+        value += 1
+        spoke_phase = 2 * np.pi * (0.05 * times + 0.15 * per_frame('brightness'))
+        np.multiply(self.spoke_cos, np.cos(spoke_phase), out=spokes)
+        np.multiply(self.spoke_sin, np.sin(spoke_phase), out=scratch)
+        spokes -= scratch
+        spokes *= 0.225
+        spokes += 0.775
+        value *= spokes
+        value *= self.vignette
+        value *= 0.5 * (0.25 + 0.75 * per_frame('loudness'))
+        np.multiply(self.glow, per_frame('onset'), out=scratch)
+        value += scratch
+        np.minimum(value, LEVELS - 1, out=value)
+
+        hue_offset = ((base_hue + 0.25 * per_frame('brightness') + 0.02 * times) * 256).astype(np.int32) & 255
+        np.add(self.hue_rows, hue_offset * LEVELS, out=index)
+        np.copyto(level, value, casting='unsafe')
+        index += level
+        return np.take(self.colors, index, out=pixels)
+
+    def render(self, features, audio_path, output_path, mood=None):
+        """Encode frames for the per-frame features (see MusicAnalyzer.frame_features) with the audio"""
+        frames = len(features['loudness'])
+        if frames == 0:
+            raise RenderError("No audio to render")
+        duration = frames / self.fps
+        base_hue = MOOD_HUES.get(mood, MOOD_HUES['dynamic'])
+        buffers = self._buffers()
+        process = subprocess.Popen([
+            self.ffmpeg, '-y', '-v', 'error',
+            '-f', 'rawvideo', '-pix_fmt', 'rgb0', '-s', f"{self.width}x{self.height}", '-r', str(self.fps), '-i', '-',
+            '-i', audio_path, '-map', '0:v:0', '-map', '1:a:0', '-t', f"{duration:.3f}",
+            '-c:v', 'libx264', '-preset', 'ultrafast', '-pix_fmt', 'yuv420p',
+            '-c:a', 'aac', '-movflags', '+faststart', '-f', 'mp4', output_path
+        ], stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+        try:
+            with tracing.span('fallback.frames', frames=frames):
+                try:
+                    for start in range(0, frames, self.batch_frames):
+                        batch = self._frames(features, start, min(start + self.batch_frames, frames), base_hue, buffers)
+                        process.stdin.write(memoryview(batch).cast('B'))
+                    process.stdin.close()
+                except BrokenPipeError:
+                    pass  # ffmpeg gave up - its stderr says why
+            with tracing.span('fallback.encode'):
+                # -v error keeps stderr far below the pipe buffer, so reading it last cannot block ffmpeg
+                stderr = process.stderr.read()
+                process.wait(timeout=self.timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            raise RenderError("ffmpeg timed out encoding the fallback video")
+        except BaseException:
+            process.kill()
+            raise
+        finally:
+            process.stderr.close()
+            if not process.stdin.closed:
+                try:
+                    process.stdin.close()
+                except BrokenPipeError:
+                    pass
+        if process.returncode != 0:
+            lines = stderr.decode('utf-8', 'replace').strip().splitlines()
+            raise RenderError(f"ffmpeg exited with {process.returncode}: {' | '.join(lines[-3:])}")
+
+        log.info("🌀 Fallback video rendered", frames=frames, seconds=round(duration, 2), size=f"{self.width}x{self.height}")
+        return {'duration': round(duration, 3), 'frames': frames, 'fps': self.fps}
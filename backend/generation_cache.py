@@ -0,0 +1,66 @@
+# generation_cache.py - Reuse Higgsfield results for identical generation params
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+class GenerationCache:
+    """Result URLs keyed by model and request params.
+
+    A key can hold several variants (e.g. the losing job of a hedge); lookups
+    rotate through them. Entries expire with the TTL since result URLs do too.
+    """
+
+    def __init__(self, max_entries=1024, ttl=24 * 3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> {'variants': [...], 'next': i, 'expires_at': ts}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(model, params):
+        """Stable cache key for a model call"""
+        payload = json.dumps({'model': model, 'params': params}, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """Get a cached result URL, or None"""
+        with self.lock:
+            entry = self._entries.get(key)
+            if entry is None or entry['expires_at'] < time.time():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            url = entry['variants'][entry['next'] % len(entry['variants'])]
+            entry['next'] += 1
+            self.hits += 1
+            return url
+
+    def put(self, key, url):
+        """Add a result URL as a variant for the key"""
+        with self.lock:
+            entry = self._entries.get(key)
+            if entry is None or entry['expires_at'] < time.time():
+                entry = self._entries[key] = {'variants': [], 'next': 0}
+            if url not in entry['variants']:
+                entry['variants'].append(url)
+            entry['expires_at'] = time.time() + self.ttl
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0
+            }
@@ -0,0 +1,46 @@
+# hedging.py - Duplicate straggling Higgsfield jobs within an extra-spend budget
+import threading
+
+
+class Hedge:
+    """How to hedge one job: when, how to submit the duplicate, what to do with the loser"""
+
+    def __init__(self, after_seconds, submit, on_loser):
+        self.after_seconds = after_seconds
+        self.submit = submit        # () -> job_set_id, or None when the budget says no
+        self.on_loser = on_loser    # (job_set_id, credential) -> None, called for the job that did not win
+
+
+class HedgeBudget:
+    """Caps hedge spend at a share of the spend on primary jobs"""
+
+    def __init__(self, max_extra_share=0.1):
+        self.max_extra_share = max_extra_share
+        self.primary_spend = 0.0
+        self.hedge_spend = 0.0
+        self.lock = threading.Lock()
+
+    def record_primary(self, cost):
+        with self.lock:
+            self.primary_spend += cost
+
+    def try_spend(self, cost):
+        """Claim budget for a hedge; False if it would exceed the allowed share"""
+        with self.lock:
+            if self.hedge_spend + cost > self.max_extra_share * self.primary_spend:
+                return False
+            self.hedge_spend += cost
+            return True
+
+    def refund(self, cost):
+        """Give back a claim whose hedge could not be submitted"""
+        with self.lock:
+            self.hedge_spend = max(0.0, self.hedge_spend - cost)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'primary_spend': round(self.primary_spend, 2),
+                'hedge_spend': round(self.hedge_spend, 2),
+                'max_extra_share': self.max_extra_share
+            }
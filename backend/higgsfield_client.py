@@ -2,12 +2,26 @@
 import time
 import os
 import json
+import socket
+import http.client
+import threading
 import urllib.request
 import urllib.parse
 import urllib.error
+from config import Config
+from credential_pool import CredentialPool
+from logs import get_logger
+import tracing
+from metrics import HIGGSFIELD_SUBMIT_SECONDS, HIGGSFIELD_POLL_WAIT_SECONDS, HIGGSFIELD_POLLS_PER_JOB, HIGGSFIELD_ERRORS
+from resilience import (
+    RetryableError, PermanentError, CircuitOpenError, RetryPolicy, CircuitBreaker,
+    classify_http_error, endpoint_name
+)
+
+log = get_logger('higgsfield_client')
 
 class HiggsfieldClient:
-    def __init__(self, api_key, api_secret):
+    def __init__(self, api_key, api_secret, credentials=None):
         self.api_key = api_key
         self.api_secret = api_secret
         # FIXED: Use correct base URLs from documentation
@@ -15,84 +29,63 @@ class HiggsfieldClient:
         self.base_url = "https://platform.higgsfield.ai"        # For non-v1 endpoints
         # FORCE REAL API - NO MOCK MODE
         self.use_mock = False
+        # Callbacks (event, info) for job lifecycle events, e.g. admission control
+        self.listeners = []
+        # Retries with backoff and one circuit breaker per endpoint (text2image, kling, minimax, job-sets)
+        self.retry_policy = RetryPolicy()
+        self.breakers = {}
+        self.breakers_lock = threading.Lock()
+        # Extra key/secret pairs share the load; each job is pinned to the key that submitted it
+        self.credentials = CredentialPool(
+            [(api_key, api_secret)] + list(credentials or []),
+            max_in_flight=Config.MAX_JOBS_PER_KEY,
+            cooldown=Config.KEY_THROTTLE_COOLDOWN
+        )
+        self.job_credentials = {}  # job_set_id -> Credential
+        self.job_credentials_lock = threading.Lock()
         
         # Verify we have real credentials
         if api_key == 'YOUR_API_KEY_HERE' or api_secret == 'YOUR_API_SECRET_HERE':
             raise Exception("❌ API credentials not properly configured!")
         
-        print("✅ Using REAL Higgsfield API with provided credentials")
-        print(f"   API Key: {api_key[:8]}...")
-        print(f"   API Secret: {api_secret[:8]}...")
+        log.info("✅ Using REAL Higgsfield API", api_keys=len(self.credentials))
     
     def _make_request(self, endpoint, data=None, method='POST'):
         """Make HTTP request to Higgsfield API"""
-        # REAL API ONLY - NO MOCK MODE
-        
-        url = f"{self.base_url}/{endpoint}"
-        print(f"   🌐 Making API request to: {url}")
-        print(f"   📝 Method: {method}")
-        print(f"   🔑 API Key: {self.api_key[:8]}...")
-        
-        # Prepare headers - correct format from documentation + anti-bot measures
-        headers = {
-            'Content-Type': 'application/json',
-            'Accept': 'application/json',
-            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'hf-api-key': self.api_key,
-            'hf-secret': self.api_secret,
-            'Referer': 'https://cloud.higgsfield.ai',
-            'Origin': 'https://cloud.higgsfield.ai'
-        }
-        
-        # Prepare data
-        if data:
-            data_json = json.dumps(data).encode('utf-8')
-            print(f"   📦 Data: {json.dumps(data, indent=2)}")
-        else:
-            data_json = None
-        
-        try:
-            # Create request
-            req = urllib.request.Request(url, data=data_json, headers=headers, method=method)
-            
-            # Add minimal delay to avoid rate limiting
-            import time
-            time.sleep(1)  # 1 second delay for speed
-            
-            # Make request
-            print(f"   ⏳ Sending request...")
-            with urllib.request.urlopen(req) as response:
-                response_data = json.loads(response.read().decode('utf-8'))
-                print(f"   ✅ Response received: {response_data}")
-                return response_data
-                
-        except urllib.error.HTTPError as e:
-            error_body = e.read().decode('utf-8')
-            print(f"❌ API Error {e.code}: {error_body}")
-            print(f"   Headers: {dict(e.headers)}")
-            raise Exception(f"API request failed: {e.code} - {error_body}")
-        except Exception as e:
-            print(f"❌ Request failed: {e}")
-            print(f"   Error type: {type(e).__name__}")
-            raise Exception(f"Request failed: {e}")
+        return self._make_request_with_base_url(endpoint, data, self.base_url, method)
+    
+    def _breaker(self, name):
+        with self.breakers_lock:
+            if name not in self.breakers:
+                self.breakers[name] = CircuitBreaker(name)
+            return self.breakers[name]
     
-    def _make_request_with_base_url(self, endpoint, data=None, base_url=None, method='POST'):
-        """Make HTTP request with custom base URL"""
+    def breaker_states(self):
+        """Circuit breaker state per endpoint, for health checks"""
+        with self.breakers_lock:
+            breakers = dict(self.breakers)
+        return {name: breaker.snapshot() for name, breaker in breakers.items()}
+    
+    def _make_request_with_base_url(self, endpoint, data=None, base_url=None, method='POST', credential=None, raise_on_throttle=False):
+        """Make HTTP request with custom base URL, retrying retryable errors with backoff"""
         if base_url is None:
             base_url = self.base_url
+        if credential is None:
+            credential = self.credentials.default()
+        max_attempts = self.retry_policy.max_attempts
             
         url = f"{base_url}/{endpoint}"
-        print(f"   🌐 Making API request to: {url}")
-        print(f"   📝 Method: {method}")
-        print(f"   🔑 API Key: {self.api_key[:8]}...")
+        name = endpoint_name(endpoint)
+        breaker = self._breaker(name)
+        log.debug("🌐 API request", method=method, url=url, key=credential.label)
         
         # Prepare headers - correct format from documentation + anti-bot measures
         headers = {
             'Content-Type': 'application/json',
             'Accept': 'application/json',
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'hf-api-key': self.api_key,
-            'hf-secret': self.api_secret,
+            'hf-api-key': credential.api_key,
+            'hf-secret': credential.api_secret,
             'Referer': 'https://cloud.higgsfield.ai',
             'Origin': 'https://cloud.higgsfield.ai'
         }
@@ -100,123 +93,315 @@ class HiggsfieldClient:
         # Prepare data
         if data:
             data_json = json.dumps(data).encode('utf-8')
-            print(f"   📦 Data: {json.dumps(data, indent=2)}")
+            log.debug("📦 Request payload", endpoint=name, payload=data)
         else:
             data_json = None
         
-        try:
-            # Create request
-            req = urllib.request.Request(url, data=data_json, headers=headers, method=method)
-            
-            # Add minimal delay to avoid rate limiting
-            import time
-            time.sleep(1)  # 1 second delay for speed
-            
-            # Make request
-            print(f"   ⏳ Sending request...")
-            with urllib.request.urlopen(req) as response:
-                response_data = json.loads(response.read().decode('utf-8'))
-                print(f"   ✅ Response received: {response_data}")
-                return response_data
+        attempt = 0
+        while True:
+            attempt += 1
+            # Fails fast with CircuitOpenError while the endpoint is unhealthy
+            try:
+                breaker.before_request()
+            except CircuitOpenError:
+                HIGGSFIELD_ERRORS.inc(endpoint=name, kind='circuit_open')
+                raise
+            settled = False  # Whether the breaker has been told how this request went
+            try:
+                try:
+                    # Create request
+                    req = urllib.request.Request(url, data=data_json, headers=headers, method=method)
+                    
+                    # Add minimal delay to avoid rate limiting
+                    with tracing.accumulate('request_delay'):
+                        time.sleep(1)  # 1 second delay for speed
+                    
+                    # Make request - status polls are too frequent for a span each, they add up on the poll span
+                    with tracing.span('higgsfield.request', endpoint=name, attempt=attempt) if method == 'POST' else tracing.accumulate('status_request'):
+                        with urllib.request.urlopen(req, timeout=Config.REQUEST_TIMEOUT) as response:
+                            response_data = json.loads(response.read().decode('utf-8'))
+                    breaker.record_success()
+                    settled = True
+                    log.debug("✅ API response", endpoint=name, body=response_data)
+                    return response_data
+                    
+                except urllib.error.HTTPError as e:
+                    error_body = e.read().decode('utf-8', 'replace')
+                    log.warning("❌ API error", endpoint=name, status=e.code, attempt=attempt)
+                    log.debug("❌ API error body", endpoint=name, body=error_body)
+                    error = classify_http_error(name, e.code, error_body, e.headers)
+                    HIGGSFIELD_ERRORS.inc(endpoint=name, kind='throttled' if e.code == 429 else f"http_{e.code // 100}xx")
+                    if e.code == 429:
+                        self.credentials.report_throttled(credential, error.retry_after)
+                except (urllib.error.URLError, socket.timeout, ConnectionError, http.client.HTTPException) as e:
+                    reason = getattr(e, 'reason', e)
+                    log.warning("❌ Request failed", endpoint=name, error=e, attempt=attempt)
+                    HIGGSFIELD_ERRORS.inc(endpoint=name, kind='timeout' if isinstance(reason, socket.timeout) else 'network')
+                    error = RetryableError(
+                        f"Request failed: {e}", name,
+                        # Refused connections never reached the API, so resubmitting is safe
+                        resubmit_safe=isinstance(reason, ConnectionRefusedError)
+                    )
+                except ValueError as e:
+                    log.warning("❌ Invalid response", endpoint=name, error=e)
+                    HIGGSFIELD_ERRORS.inc(endpoint=name, kind='invalid_response')
+                    error = RetryableError(f"Invalid API response: {e}", name)
                 
-        except urllib.error.HTTPError as e:
-            error_body = e.read().decode('utf-8')
-            print(f"❌ API Error {e.code}: {error_body}")
-            print(f"   Headers: {dict(e.headers)}")
-            raise Exception(f"API request failed: {e.code} - {error_body}")
-        except Exception as e:
-            print(f"❌ Request failed: {e}")
-            print(f"   Error type: {type(e).__name__}")
-            raise Exception(f"Request failed: {e}")
+                if error.status == 429:
+                    # Throttling is per key (the pool cools it down) - the endpoint itself is fine
+                    breaker.release_probe()
+                elif isinstance(error, RetryableError):
+                    breaker.record_failure()
+                else:
+                    # A 4xx still means the endpoint is up
+                    breaker.record_success()
+                settled = True
+            finally:
+                if not settled:
+                    # Unclassified errors must not hold on to a half-open probe slot
+                    breaker.release_probe()
+            if not isinstance(error, RetryableError):
+                raise error
+            
+            # Only resubmit generation requests that certainly were not processed - each one costs credits
+            can_retry = method == 'GET' or error.resubmit_safe
+            # The caller would rather move to another key than wait out this one's throttling
+            throttled = raise_on_throttle and error.status == 429
+            if not can_retry or throttled or attempt >= max_attempts:
+                raise error
+            delay = self.retry_policy.delay(attempt, error.retry_after)
+            log.info("🔁 Retrying", endpoint=name, delay=round(delay, 1), attempt=attempt + 1, max_attempts=max_attempts)
+            with tracing.accumulate('retry_backoff'):
+                time.sleep(delay)
+    
+    def _submit(self, endpoint, data, base_url=None):
+        """POST a generation job through the least-loaded API key and return its job_set_id"""
+        with tracing.span('higgsfield.submit', endpoint=endpoint_name(endpoint)):
+            return self._submit_with_any_key(endpoint, data, base_url)
+    
+    def _submit_with_any_key(self, endpoint, data, base_url):
+        started = time.time()
+        attempt = 0
+        while True:
+            attempt += 1
+            with tracing.accumulate('api_key_wait'):
+                credential = self.credentials.acquire()
+            try:
+                # A throttled key cools down and the next attempt picks another one
+                response = self._make_request_with_base_url(
+                    endpoint, data, base_url, credential=credential,
+                    raise_on_throttle=len(self.credentials) > 1
+                )
+            except RetryableError as e:
+                self.credentials.release(credential)
+                if e.status != 429 or len(self.credentials) == 1 or attempt > len(self.credentials):
+                    raise
+                log.info("🔑 Key throttled - resubmitting with another key", key=credential.label)
+                continue
+            except Exception:
+                self.credentials.release(credential)
+                raise
+            job_set_id = response['id']
+            HIGGSFIELD_SUBMIT_SECONDS.observe(time.time() - started, endpoint=endpoint_name(endpoint))
+            log.info("📝 Job submitted", endpoint=endpoint_name(endpoint), job_set_id=job_set_id, key=credential.label)
+            # The key stays charged with this job until polling finishes
+            with self.job_credentials_lock:
+                self.job_credentials[job_set_id] = credential
+            return job_set_id
+    
+    def job_credential(self, job_set_id):
+        """Label of the key a job was submitted with (safe to persist), or None"""
+        with self.job_credentials_lock:
+            credential = self.job_credentials.get(job_set_id)
+        return credential.label if credential else None
+    
+    def credential_stats(self):
+        """In-flight jobs and throttling per API key, for health checks"""
+        return self.credentials.stats()
+    
+    def _credential_for(self, job_set_id):
+        with self.job_credentials_lock:
+            return self.job_credentials.get(job_set_id)
+    
+    def _release_job(self, job_set_id):
+        with self.job_credentials_lock:
+            credential = self.job_credentials.pop(job_set_id, None)
+        if credential is not None:
+            self.credentials.release(credential)
     
     # Mock methods removed - REAL API ONLY
     
-    def _poll_for_results(self, job_set_id):
-        """Poll until job is completed"""
+    def add_listener(self, listener):
+        """Register a callback(event, info) for 'job_started' / 'job_finished' events"""
+        self.listeners.append(listener)
+    
+    def _notify(self, event, **info):
+        for listener in self.listeners:
+            try:
+                listener(event, info)
+            except Exception as e:
+                log.warning("⚠️ Listener failed", event=event, error=e)
+    
+    def _poll_for_results(self, job_set_id, model=None, hedge=None):
+        """Poll until job is completed, reporting the job as outstanding meanwhile"""
+        started = time.time()
+        self._notify('job_started', job_set_id=job_set_id, model=model)
+        succeeded = False
+        poll_stats = {'checks': 0}
+        # Every job submitted for this result (the original and any hedge) and those that lost
+        race = {'job_ids': [job_set_id], 'losers': []}
+        try:
+            with tracing.span('higgsfield.poll', model=model, job_set_id=job_set_id) as span:
+                try:
+                    result = self._wait_for_job(job_set_id, hedge, poll_stats, race)
+                finally:
+                    span['checks'] = poll_stats['checks']
+            succeeded = True
+            return result
+        finally:
+            # Losers are handed on with the key that submitted them, after this poll has let go of it
+            losers = [(loser_id, self.job_credential(loser_id)) for loser_id in race['losers']]
+            for race_id in race['job_ids']:
+                self._release_job(race_id)
+            for loser_id, credential in losers:
+                hedge.on_loser(loser_id, credential)
+            HIGGSFIELD_POLL_WAIT_SECONDS.observe(time.time() - started, model=model or 'unknown', outcome='succeeded' if succeeded else 'failed')
+            HIGGSFIELD_POLLS_PER_JOB.observe(poll_stats['checks'], model=model or 'unknown')
+            log.info("🏁 Job finished" if succeeded else "❌ Job failed", job_set_id=job_set_id, model=model,
+                     seconds=round(time.time() - started, 1), checks=poll_stats['checks'])
+            self._notify('job_finished', job_set_id=job_set_id, model=model, seconds=time.time() - started, succeeded=succeeded)
+    
+    def _check_job(self, job_set_id):
+        """Fetch a job set once: ('completed', url) when done, otherwise (status, retry_after)"""
+        # FIXED: Use the correct polling endpoint from documentation
+        # The correct endpoint is: GET /v1/job-sets/{job_set_id}
+        polling_attempts = [
+            (f"v1/job-sets/{job_set_id}", self.base_url),  # Correct endpoint!
+        ]
+        
+        response = None
+        for endpoint, base_url in polling_attempts:
+            try:
+                response = self._make_request_with_base_url(
+                    endpoint, method='GET', base_url=base_url, credential=self._credential_for(job_set_id)
+                )
+                break
+            except CircuitOpenError:
+                raise
+            except RetryableError as e:
+                log.info("❌ Job status unreachable", job_set_id=job_set_id, error=e)
+                return 'unreachable', e.retry_after
+        
+        if not response.get('jobs'):
+            log.debug("⚠️ No jobs found in response", job_set_id=job_set_id)
+            return 'missing', None
+        
+        job = response['jobs'][0]
+        status = job.get('status')
+        
+        if status == 'completed':
+            # FIXED: Use correct result format from documentation
+            results = job.get('results', {})
+            
+            # Check the correct result format: results.raw.url
+            if results and 'raw' in results and 'url' in results['raw']:
+                video_url = results['raw']['url']
+                log.debug("✅ Found result URL", job_set_id=job_set_id, url=video_url)
+                return 'completed', video_url
+            log.warning("⚠️ No result URL in completed job", job_set_id=job_set_id)
+            log.debug("⚠️ Completed job results", job_set_id=job_set_id, results=results)
+            raise PermanentError("Completed job has no video URL", 'job-sets')
+        elif status == 'failed':
+            error_message = job.get('error', 'Unknown API error')
+            raise PermanentError(f"Higgsfield API job failed: {error_message}", 'job-sets')
+        elif status not in ['pending', 'running', 'queued', 'in_progress']:
+            log.warning("⚠️ Unknown job status", job_set_id=job_set_id, status=status)
+        return status, None
+    
+    def _wait_for_job(self, job_set_id, hedge=None, poll_stats=None, race=None):
+        """Poll until job is completed, optionally racing a hedged duplicate against it.
+
+        Hedge job ids are added to race['job_ids'] and the unfinished ones that lose to race['losers'].
+        """
         # REAL API ONLY - NO MOCK MODE
         
         # Real polling implementation - balanced for speed and reliability
         max_attempts = 40  # 2 minutes max for reliable results
+        if race is None:
+            race = {'job_ids': [job_set_id], 'losers': []}
+        job_ids = [job_set_id]
+        started = time.time()
+        hedge_pending = hedge is not None
+        unreachable_streak = 0
         for attempt in range(max_attempts):
-            try:
-                print(f"   🔍 Checking job status (attempt {attempt + 1}/{max_attempts})...")
-                
-                # Try a completely different approach - maybe we need to use a different base URL
-                # or maybe the polling endpoint is completely different
-                
-                # FIXED: Use the correct polling endpoint from documentation
-                # The correct endpoint is: GET /v1/job-sets/{job_set_id}
-                polling_attempts = [
-                    (f"v1/job-sets/{job_set_id}", self.base_url),  # Correct endpoint!
-                ]
-                
-                response = None
-                for endpoint, base_url in polling_attempts:
-                    try:
-                        print(f"   🔍 Trying: {base_url}/{endpoint}")
-                        response = self._make_request_with_base_url(endpoint, method='GET', base_url=base_url)
-                        print(f"   ✅ Success with: {base_url}/{endpoint}")
-                        break
-                    except Exception as e:
-                        if "404" in str(e) or "unidentified route" in str(e):
-                            print(f"   ❌ 404 for {base_url}/{endpoint}")
-                            continue
-                        else:
-                            print(f"   ❌ Error for {base_url}/{endpoint}: {e}")
-                            continue
+            # Straggler past the model's p95 - race a duplicate against it (at most once)
+            if hedge_pending and time.time() - started >= hedge.after_seconds:
+                hedge_pending = False
+                hedged_id = hedge.submit()
+                if hedged_id:
+                    log.info("🏁 Hedging slow job", job_set_id=job_set_id, duplicate=hedged_id)
+                    job_ids.append(hedged_id)
+                    race['job_ids'].append(hedged_id)
+            
+            delay = 2  # Fastest polling for speed
+            for current_id in list(job_ids):
+                if poll_stats is not None:
+                    poll_stats['checks'] += 1
+                try:
+                    # CircuitOpenError is not caught here - an unhealthy endpoint fails the job fast
+                    status, info = self._check_job(current_id)
+                except PermanentError as e:
+                    if len(job_ids) > 1:
+                        # A failed job is final, but the other one in the race may still succeed
+                        log.warning("❌ Job failed, still waiting on the other", job_set_id=current_id, error=e)
+                        job_ids.remove(current_id)
+                        continue
+                    raise
                 
-                if response is None:
-                    print(f"   ⏳ All polling attempts failed, waiting... ({attempt + 1}/{max_attempts})")
-                    time.sleep(2)  # Fastest retry
+                if status == 'completed':
+                    race['losers'].extend(loser_id for loser_id in job_ids if loser_id != current_id)
+                    return info
+                if status == 'unreachable':
+                    unreachable_streak += 1
+                    delay = max(delay, self.retry_policy.delay(unreachable_streak, info))
                     continue
-                
-                
-                print(f"   📊 Polling response: {response}")
-                
-                if response.get('jobs') and len(response['jobs']) > 0:
-                    job = response['jobs'][0]
-                    status = job.get('status')
-                    print(f"   🔍 Job status: {status}")
-                    
-                    if status == 'completed':
-                        # FIXED: Use correct result format from documentation
-                        results = job.get('results', {})
-                        video_url = None
-                        
-                        # Check the correct result format: results.raw.url
-                        if results and 'raw' in results and 'url' in results['raw']:
-                            video_url = results['raw']['url']
-                            print(f"   ✅ Found video URL: {video_url}")
-                            return video_url
-                        else:
-                            print(f"   ⚠️ No video URL found in results: {results}")
-                            raise Exception("Completed job has no video URL")
-                    elif status == 'failed':
-                        error_message = job.get('error', 'Unknown API error')
-                        raise Exception(f"Higgsfield API job failed: {error_message}")
-                    elif status in ['pending', 'running', 'queued', 'in_progress']:
-                        print(f"   ⏳ Waiting for completion... ({attempt + 1}/{max_attempts})")
-                        time.sleep(2)  # Fastest polling for speed
-                    else:
-                        print(f"   ⚠️ Unknown job status: {status}")
-                        time.sleep(5)
+                unreachable_streak = 0
+                if status in ['pending', 'running', 'queued', 'in_progress', 'missing']:
+                    # Poll iterations are the noisiest event - sampled unless debugging
+                    log.sampled(attempt + 1, "⏳ Waiting for completion", job_set_id=current_id, status=status,
+                                attempt=attempt + 1, max_attempts=max_attempts)
                 else:
-                    print(f"   ⚠️ No jobs found in response")
-                    time.sleep(2)  # Fastest retry
-                
-            except Exception as e:
-                print(f"   ❌ Polling error: {e}")
-                time.sleep(3)  # Faster retry
+                    delay = max(delay, 5)
+            with tracing.accumulate('poll_sleep'):
+                time.sleep(delay)
+        
+        # A hedge may still finish after we give up - keep its result rather than losing it
+        race['losers'].extend(hedged_id for hedged_id in job_ids if hedged_id != job_set_id)
         
-        print("   ⏰ Generation timed out - this may be due to high API load")
-        print("   💡 Tip: Try again in a few minutes or with a shorter audio file")
+        HIGGSFIELD_ERRORS.inc(endpoint='job-sets', kind='poll_timeout')
+        log.error("⏰ Generation timed out - this may be due to high API load", job_set_id=job_set_id, attempts=max_attempts)
         raise Exception("Generation timed out - API may be experiencing high load")
     
+    def poll_job(self, job_set_id, model=None, hedge=None, credential=None):
+        """Wait for a previously submitted job set and return its result URL.
+
+        `credential` is the label from job_credential() for jobs submitted before a restart.
+        """
+        if credential is not None and self._credential_for(job_set_id) is None:
+            with self.job_credentials_lock:
+                self.job_credentials[job_set_id] = self.credentials.claim(credential)
+        return self._poll_for_results(job_set_id, model, hedge)
+    
     def text_to_image(self, prompt, aspect_ratio="16:9"):
         """Generate image from text prompt using Nano Banana model"""
+        return self._poll_for_results(self.submit_text_to_image(prompt, aspect_ratio), 'nano-banana')
+    
+    def submit_text_to_image(self, prompt, aspect_ratio="16:9"):
+        """Submit a Nano Banana text-to-image job and return its job_set_id"""
         # REAL API ONLY - NO MOCK MODE
         
-        print(f"   🎨 Generating image: '{prompt[:50]}...'")
+        log.info("🎨 Generating image", aspect_ratio=aspect_ratio)
+        log.debug("🎨 Image prompt", prompt=prompt)
         
         # FIXED: Use correct endpoint and parameters from documentation
         endpoint = "v1/text2image/nano-banana"
@@ -230,19 +415,18 @@ class HiggsfieldClient:
             }
         }
         
-        print(f"   🔄 Using correct endpoint: {endpoint}")
-        print(f"   📦 Data: {json.dumps(data, indent=2)}")
-        
-        response = self._make_request_with_base_url(endpoint, data, base_url)
-        job_set_id = response['id']
-        print(f"   📝 Image generation submitted: {job_set_id}")
-        return self._poll_for_results(job_set_id)
+        return self._submit(endpoint, data, base_url)
     
     def image_to_video(self, image_url, prompt, duration=5):
         """Animate image into video using Kling 2.5 Turbo model"""
+        return self._poll_for_results(self.submit_image_to_video(image_url, prompt, duration), 'kling-2-5')
+    
+    def submit_image_to_video(self, image_url, prompt, duration=5):
+        """Submit a Kling 2.5 Turbo image-to-video job and return its job_set_id"""
         # REAL API ONLY - NO MOCK MODE
         
-        print(f"   🎥 Animating image: '{prompt[:50]}...'")
+        log.info("🎥 Animating image", duration=duration)
+        log.debug("🎥 Animation prompt", prompt=prompt)
         
         # FIXED: Use correct Kling 2.5 Turbo endpoint from documentation
         endpoint = "generate/kling-2-5"
@@ -261,17 +445,18 @@ class HiggsfieldClient:
             }
         }
         
-        print(f"   🔄 Using Kling 2.5 Turbo endpoint: {endpoint}")
-        response = self._make_request_with_base_url(endpoint, data, base_url)
-        job_set_id = response['id']
-        print(f"   📝 Video generation submitted: {job_set_id}")
-        return self._poll_for_results(job_set_id)
+        return self._submit(endpoint, data, base_url)
     
     def text_to_video(self, prompt, duration=6):
         """Generate video directly from text using Minimax T2V model"""
+        return self._poll_for_results(self.submit_text_to_video(prompt, duration), 'minimax-t2v')
+    
+    def submit_text_to_video(self, prompt, duration=6):
+        """Submit a Minimax T2V text-to-video job and return its job_set_id"""
         # REAL API ONLY - NO MOCK MODE
         
-        print(f"   ✨ Creating special video: '{prompt[:50]}...'")
+        log.info("✨ Creating special video", duration=duration)
+        log.debug("✨ Video prompt", prompt=prompt)
         
         # FIXED: Use correct Minimax T2V endpoint from documentation
         endpoint = "generate/minimax-t2v"
@@ -286,12 +471,7 @@ class HiggsfieldClient:
             }
         }
         
-        print(f"   🔄 Using Minimax T2V endpoint: {endpoint}")
-        response = self._make_request_with_base_url(endpoint, data, base_url)
-        job_set_id = response['id']
-        
-        print(f"   📝 Text-to-video generation submitted: {job_set_id}")
-        return self._poll_for_results(job_set_id)
+        return self._submit(endpoint, data, base_url)
 
 # Test the client
 if __name__ == "__main__":
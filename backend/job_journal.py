@@ -0,0 +1,172 @@
+# job_journal.py - Durable journal of submitted Higgsfield jobs
+import json
+import os
+import threading
+import time
+from logs import get_logger
+
+log = get_logger('job_journal')
+
+
+class JobJournal:
+    """Append-only journal of request progress so in-flight work survives a restart.
+
+    Every submitted job_set_id and every finished step is appended as one JSON
+    line and fsync'd before the call returns. On startup the journal is replayed
+    and compacted into one snapshot line per request.
+    """
+
+    def __init__(self, path, retention_seconds=24 * 3600):
+        self.path = path
+        self.retention_seconds = retention_seconds
+        self.lock = threading.Lock()
+        self.requests = {}
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._replay()
+        self._compact()
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    def _replay(self):
+        """Rebuild request state from the journal file"""
+        if not os.path.exists(self.path):
+            return
+
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A torn final line from a crash mid-write - everything before it is intact
+                    log.warning("⚠️ Skipping corrupt journal line", line=line[:50])
+                    continue
+                self._apply(entry)
+
+    def _apply(self, entry):
+        """Apply one journal entry to the in-memory state"""
+        kind = entry.get('type')
+        request_id = entry.get('request_id')
+
+        if kind == 'snapshot':
+            self.requests[request_id] = entry['request']
+            return
+
+        if kind == 'request':
+            self.requests[request_id] = {
+                'request_id': request_id,
+                'status': 'running',
+                'music_analysis': entry.get('music_analysis'),
+                'scene_plan': entry.get('scene_plan'),
+                'jobs': {},
+                'job_credentials': {},
+                'results': {},
+                'previews': {},
+                'result': None,
+                'error': None,
+                'created_at': entry.get('ts'),
+                'updated_at': entry.get('ts')
+            }
+            return
+
+        record = self.requests.get(request_id)
+        if record is None:
+            return
+
+        if kind == 'job':
+            record['jobs'][entry['step']] = entry['job_set_id']
+            if entry.get('credential'):
+                # Polling has to go through the key that submitted the job
+                record.setdefault('job_credentials', {})[entry['step']] = entry['credential']
+        elif kind == 'step':
+            record['results'][entry['step']] = entry['url']
+        elif kind == 'preview':
+            record.setdefault('previews', {})[str(entry['scene'])] = entry['url']
+        elif kind == 'trace':
+            record['trace'] = entry['trace']
+            record['profile'] = entry.get('profile')
+        elif kind == 'finish':
+            record['status'] = entry['status']
+            record['result'] = entry.get('result')
+            record['error'] = entry.get('error')
+        record['updated_at'] = entry.get('ts')
+
+    def _compact(self):
+        """Rewrite the journal as one snapshot per live request"""
+        cutoff = time.time() - self.retention_seconds
+        for request_id in list(self.requests):
+            record = self.requests[request_id]
+            if record['status'] != 'running' and (record.get('updated_at') or 0) < cutoff:
+                del self.requests[request_id]
+
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for request_id, record in self.requests.items():
+                f.write(json.dumps({'type': 'snapshot', 'request_id': request_id, 'request': record}) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def _append(self, entry):
+        """Durably append an entry and apply it"""
+        entry['ts'] = time.time()
+        with self.lock:
+            self._file.write(json.dumps(entry) + '\n')
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._apply(entry)
+
+    def start_request(self, request_id, music_analysis, scene_plan):
+        """Record a new request together with its scene plan"""
+        self._append({
+            'type': 'request',
+            'request_id': request_id,
+            'music_analysis': music_analysis,
+            'scene_plan': scene_plan
+        })
+
+    def record_job(self, request_id, step, job_set_id, credential=None):
+        """Record a job_set_id (and the label of the key that submitted it) as soon as Higgsfield accepted it"""
+        self._append({'type': 'job', 'request_id': request_id, 'step': step, 'job_set_id': job_set_id, 'credential': credential})
+
+    def record_result(self, request_id, step, url):
+        """Record the result URL of a finished step"""
+        self._append({'type': 'step', 'request_id': request_id, 'step': step, 'url': url})
+
+    def record_preview(self, request_id, scene, url):
+        """Record the preview published for a scene before its final clip is ready"""
+        self._append({'type': 'preview', 'request_id': request_id, 'scene': scene, 'url': url})
+
+    def record_trace(self, request_id, trace, profile=None):
+        """Attach a request's trace spans (and cProfile report) to its record"""
+        with self.lock:
+            known = request_id in self.requests
+        # Requests refused before planning never got a record
+        if known:
+            self._append({'type': 'trace', 'request_id': request_id, 'trace': trace, 'profile': profile})
+
+    def finish_request(self, request_id, result=None, error=None):
+        """Mark a request as completed or failed"""
+        self._append({
+            'type': 'finish',
+            'request_id': request_id,
+            'status': 'failed' if error else 'completed',
+            'result': result,
+            'error': error
+        })
+
+    def get_request(self, request_id):
+        """Get a copy of the journaled state of a request"""
+        with self.lock:
+            record = self.requests.get(request_id)
+            return json.loads(json.dumps(record)) if record else None
+
+    def pending_requests(self):
+        """Get all requests that were interrupted before finishing"""
+        with self.lock:
+            return [json.loads(json.dumps(r)) for r in self.requests.values() if r['status'] == 'running']
@@ -0,0 +1,80 @@
+# job_scheduler.py - One concurrency limit for every Higgsfield job in the process
+import threading
+from concurrent.futures import Future
+import tracing
+
+
+class JobScheduler:
+    """Runs Higgsfield jobs (submit + poll) in a fixed number of slots.
+
+    Interactive requests and batch items share the slots. A job whose key
+    (model + params) is already in flight is not submitted again; the caller
+    waits for the running one and shares its result.
+    """
+
+    def __init__(self, max_concurrent):
+        self.max_concurrent = max_concurrent
+        self.slots = threading.BoundedSemaphore(max_concurrent)
+        self.lock = threading.Lock()
+        self.inflight = {}  # key -> Future of the running job
+        self.running = 0
+        self.waiting = 0
+        self.shared = 0
+
+    def _run_in_slot(self, work):
+        with self.lock:
+            self.waiting += 1
+        with tracing.span('scheduler.wait'):
+            self.slots.acquire()
+        with self.lock:
+            self.waiting -= 1
+            self.running += 1
+        try:
+            return work()
+        finally:
+            with self.lock:
+                self.running -= 1
+            self.slots.release()
+
+    def run(self, key, work):
+        """Run work() in a slot, or join an identical job already running; returns (result, shared)"""
+        if key is None:
+            return self._run_in_slot(work), False
+
+        with self.lock:
+            future = self.inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self.inflight[key] = Future()
+
+        if not owner:
+            try:
+                with tracing.span('scheduler.shared_wait'):
+                    result = future.result()
+            except Exception:
+                # The shared job failed - ours may still succeed
+                return self._run_in_slot(work), False
+            with self.lock:
+                self.shared += 1
+            return result, True
+
+        try:
+            result = self._run_in_slot(work)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            with self.lock:
+                self.inflight.pop(key, None)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'max_concurrent': self.max_concurrent,
+                'running': self.running,
+                'waiting': self.waiting,
+                'shared_jobs': self.shared
+            }
@@ -0,0 +1,77 @@
+# latency_stats.py - Rolling per-model Higgsfield job durations
+import threading
+from collections import deque
+
+
+class LatencyStats:
+    """Keeps the most recent job durations per model.
+
+    Registered as a HiggsfieldClient listener; models without observations fall
+    back to configured defaults so planning works from the first request.
+    """
+
+    def __init__(self, defaults=None, window=200):
+        self.defaults = dict(defaults or {})
+        self.window = window
+        self.lock = threading.Lock()
+        self.samples = {}  # model -> deque of seconds
+
+    def on_api_event(self, event, info):
+        if event == 'job_finished' and info.get('succeeded') and info.get('model'):
+            self.record(info['model'], info['seconds'])
+
+    def record(self, model, seconds):
+        with self.lock:
+            self.samples.setdefault(model, deque(maxlen=self.window)).append(seconds)
+
+    def dump(self):
+        """Samples per model as plain lists, for persisting"""
+        with self.lock:
+            return {model: list(samples) for model, samples in self.samples.items()}
+
+    def load(self, samples):
+        """Restore samples written by dump()"""
+        with self.lock:
+            for model, values in samples.items():
+                self.samples[model] = deque(values, maxlen=self.window)
+
+    def count(self, model):
+        with self.lock:
+            return len(self.samples.get(model, ()))
+
+    def mean(self, model):
+        """Mean duration in seconds, or the default when nothing was observed yet"""
+        with self.lock:
+            samples = self.samples.get(model)
+            if not samples:
+                return self.defaults.get(model)
+            return sum(samples) / len(samples)
+
+    def recent_mean(self, model, n=10):
+        """Mean of the last n durations - reacts to spikes the full window would smooth out"""
+        with self.lock:
+            samples = list(self.samples.get(model, ()))[-n:]
+        if not samples:
+            return self.defaults.get(model)
+        return sum(samples) / len(samples)
+
+    def percentile(self, model, pct):
+        """Duration percentile (0-100) in seconds, or the default when nothing was observed yet"""
+        with self.lock:
+            samples = sorted(self.samples.get(model, ()))
+        if not samples:
+            return self.defaults.get(model)
+        index = min(len(samples) - 1, int(round(pct / 100.0 * (len(samples) - 1))))
+        return samples[index]
+
+    def snapshot(self):
+        """Summary per model for status endpoints"""
+        models = set(self.defaults) | set(self.samples)
+        return {
+            model: {
+                'count': self.count(model),
+                'mean': self.mean(model),
+                'p95': self.percentile(model, 95)
+            }
+            for model in sorted(models)
+        }
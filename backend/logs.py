@@ -0,0 +1,108 @@
+# logs.py - Leveled, structured logging shared by the backend modules
+import json
+import logging
+import sys
+import threading
+from config import Config
+
+ROOT_LOGGER = 'musicvideo'
+
+_configured = False
+_configure_lock = threading.Lock()
+
+
+def _text_value(value):
+    if isinstance(value, (dict, list, tuple)):
+        return json.dumps(value, default=str)
+    text = str(value)
+    return json.dumps(text) if not text or ' ' in text or '"' in text else text
+
+
+class StructuredFormatter(logging.Formatter):
+    """`time LEVEL module: message key=value ...` or one JSON object per line"""
+
+    def __init__(self, output='text'):
+        super().__init__()
+        self.json = output == 'json'
+
+    def format(self, record):
+        # Message args and fields are only rendered here, for records that pass the level check
+        message = record.getMessage()
+        fields = getattr(record, 'fields', None) or {}
+        module = record.name.split('.', 1)[-1]
+        if self.json:
+            entry = {'ts': round(record.created, 3), 'level': record.levelname.lower(), 'module': module, 'msg': message}
+            entry.update(fields)
+            if record.exc_info:
+                entry['exc'] = self.formatException(record.exc_info)
+            return json.dumps(entry, default=str)
+
+        line = f"{self.formatTime(record)} {record.levelname:<7} {module}: {message}"
+        if fields:
+            line += ' ' + ' '.join(f"{name}={_text_value(value)}" for name, value in fields.items())
+        if record.exc_info:
+            line += '\n' + self.formatException(record.exc_info)
+        return line
+
+
+def configure(level=None, output=None):
+    """Send the backend's records to stdout; safe to call more than once"""
+    global _configured
+    with _configure_lock:
+        root = logging.getLogger(ROOT_LOGGER)
+        if not _configured:
+            handler = logging.StreamHandler(sys.stdout)
+            root.addHandler(handler)
+            # Keep our records out of Flask's/werkzeug's handlers
+            root.propagate = False
+            _configured = True
+        root.setLevel(level or Config.LOG_LEVEL)
+        for handler in root.handlers:
+            handler.setFormatter(StructuredFormatter(output or Config.LOG_FORMAT))
+
+
+class StructuredLogger:
+    """Logger taking a message plus keyword fields.
+
+    Use %-style args for anything costly to format: nothing is formatted or
+    serialized unless the record's level is enabled.
+    """
+
+    def __init__(self, name):
+        self.logger = logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+    def enabled(self, level):
+        return self.logger.isEnabledFor(level)
+
+    def _log(self, level, message, args, fields, exc_info=False):
+        if self.logger.isEnabledFor(level):
+            self.logger.log(level, message, *args, exc_info=exc_info, extra={'fields': fields})
+
+    def debug(self, message, *args, **fields):
+        self._log(logging.DEBUG, message, args, fields)
+
+    def info(self, message, *args, **fields):
+        self._log(logging.INFO, message, args, fields)
+
+    def warning(self, message, *args, **fields):
+        self._log(logging.WARNING, message, args, fields)
+
+    def error(self, message, *args, **fields):
+        self._log(logging.ERROR, message, args, fields)
+
+    def exception(self, message, *args, **fields):
+        """Error with the current traceback attached"""
+        self._log(logging.ERROR, message, args, fields, exc_info=True)
+
+    def sampled(self, occurrence, message, *args, **fields):
+        """Info for the 1st and every LOG_SAMPLE_EVERY-th occurrence of a repeating event; debug logs them all"""
+        if occurrence == 1 or occurrence % max(1, Config.LOG_SAMPLE_EVERY) == 0:
+            self._log(logging.INFO, message, args, fields)
+        else:
+            self._log(logging.DEBUG, message, args, fields)
+
+
+def get_logger(name):
+    if not _configured:
+        configure()
+    return StructuredLogger(name)
@@ -0,0 +1,281 @@
+# media_store.py - Local content-addressed copies of generated clips, served at /media/<digest>
+import atexit
+import contextlib
+import contextvars
+import hashlib
+import http.client
+import json
+import mimetypes
+import os
+import re
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import Future, ThreadPoolExecutor
+from logs import get_logger
+from metrics import MEDIA_DOWNLOAD_SECONDS, MEDIA_FETCHES
+import tracing
+
+log = get_logger('media_store')
+
+DIGEST_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+PARTIAL_MAX_AGE = 24 * 3600  # Unfinished downloads nobody asked for again
+EVICTION_MIN_IDLE = 300  # Files served or stored this recently stay - their path may be about to be opened
+
+
+class DownloadInterrupted(Exception):
+    """The connection dropped before the whole body arrived - resume from what was written"""
+
+
+class MediaStore:
+    """Clips downloaded once and kept on disk under the SHA-256 of their bytes.
+
+    Remote result URLs map to digests in an index file, so a URL handed out
+    again (generation cache, warm pool, resumed request) is served locally
+    without another download. Downloads stream in chunks to a partial file and
+    continue from its size with a Range request after a dropped connection.
+    The least recently served files go once the store grows past max_bytes,
+    except files pinned by a reader or used within EVICTION_MIN_IDLE seconds.
+    """
+
+    def __init__(self, root, max_bytes, workers=4, chunk_size=1024 * 1024, timeout=30, retries=3):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.retries = retries
+        self.index_path = os.path.join(root, 'index.json')
+        self.partial_dir = os.path.join(root, 'partial')
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='media')
+        self.lock = threading.Lock()
+        self.in_flight = {}  # remote url -> Future of its digest
+        self.urls = {}  # remote url -> digest
+        self.files = {}  # digest -> {'size', 'content_type', 'last_used'}
+        self.pins = {}  # digest -> number of readers that need its path to stay valid
+        self.dirty = False
+        os.makedirs(self.partial_dir, exist_ok=True)
+        self._load()
+        atexit.register(self.save)
+
+    def _load(self):
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except ValueError:
+                log.warning("⚠️ Media index is corrupt - starting empty", path=self.index_path)
+                data = {}
+            # Files removed by hand are forgotten
+            self.files = {digest: entry for digest, entry in data.get('files', {}).items()
+                          if os.path.exists(self._file_path(digest))}
+            self.urls = {url: digest for url, digest in data.get('urls', {}).items() if digest in self.files}
+
+        cutoff = time.time() - PARTIAL_MAX_AGE
+        for name in os.listdir(self.partial_dir):
+            path = os.path.join(self.partial_dir, name)
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+
+    def _save_locked(self):
+        self.dirty = False
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'files': self.files, 'urls': self.urls}, f)
+        os.replace(tmp_path, self.index_path)
+
+    def save(self):
+        """Write last-used times of served files; downloads and evictions save right away"""
+        with self.lock:
+            if self.dirty:
+                self._save_locked()
+
+    def _file_path(self, digest):
+        return os.path.join(self.root, digest[:2], digest)
+
+    def _partial_path(self, url):
+        return os.path.join(self.partial_dir, hashlib.sha256(url.encode('utf-8')).hexdigest() + '.part')
+
+    def fetch(self, url):
+        """Start storing url in the background; returns a Future of its digest"""
+        with self.lock:
+            digest = self.urls.get(url)
+            if digest is not None:
+                MEDIA_FETCHES.inc(result='hit')
+                done = Future()
+                done.set_result(digest)
+                return done
+            future = self.in_flight.get(url)
+            if future is None:
+                # Spans of the download land in the trace of the request that started it
+                future = self.in_flight[url] = self.executor.submit(contextvars.copy_context().run, self._download, url)
+        return future
+
+    def fetch_all(self, urls):
+        """Store several URLs in parallel; returns {url: digest or None if it failed}"""
+        futures = {url: self.fetch(url) for url in dict.fromkeys(urls)}
+        digests = {}
+        for url, future in futures.items():
+            try:
+                digests[url] = future.result()
+            except Exception as e:
+                log.warning("⚠️ Storing clip failed - serving the remote URL", host=urllib.parse.urlsplit(url).netloc, error=e)
+                digests[url] = None
+        return digests
+
+    def _download(self, url):
+        started = time.perf_counter()
+        partial = self._partial_path(url)
+        try:
+            with tracing.span('media.download') as span:
+                content_type = None
+                for attempt in range(self.retries + 1):
+                    try:
+                        content_type = self._stream_to(url, partial)
+                        break
+                    except urllib.error.HTTPError as e:
+                        if e.code < 500 and e.code != 429:
+                            raise
+                        error = e
+                    except (DownloadInterrupted, urllib.error.URLError, http.client.HTTPException, OSError) as e:
+                        error = e
+                    if attempt == self.retries:
+                        raise error
+                    offset = os.path.getsize(partial) if os.path.exists(partial) else 0
+                    log.warning("⚠️ Clip download interrupted - resuming", offset=offset, attempt=attempt + 1, error=error)
+                    time.sleep(min(2 ** attempt, 10))
+                span['bytes'] = os.path.getsize(partial)
+            content_type = content_type or mimetypes.guess_type(urllib.parse.urlsplit(url).path)[0] or 'video/mp4'
+            digest = self.add_file(partial, content_type, url)
+            MEDIA_FETCHES.inc(result='downloaded')
+            MEDIA_DOWNLOAD_SECONDS.observe(time.perf_counter() - started, outcome='stored')
+            return digest
+        except Exception:
+            MEDIA_FETCHES.inc(result='failed')
+            MEDIA_DOWNLOAD_SECONDS.observe(time.perf_counter() - started, outcome='failed')
+            raise
+        finally:
+            with self.lock:
+                self.in_flight.pop(url, None)
+
+    def add_file(self, path, content_type, url=None):
+        """Move a finished file into the store (optionally as the copy of url); returns its digest"""
+        digest = self._hash_file(path)
+        size = os.path.getsize(path)
+        stored_path = self._file_path(digest)
+        os.makedirs(os.path.dirname(stored_path), exist_ok=True)
+        # Files are only replaced and removed under the lock, so an eviction never deletes a file just stored again
+        with self.lock:
+            # The same bytes under another URL just land on the same file
+            os.replace(path, stored_path)
+            self.files[digest] = {'size': size, 'content_type': content_type, 'last_used': time.time()}
+            if url:
+                self.urls[url] = digest
+            evicted = self._evict_locked(keep=digest)
+            for old_digest in evicted:
+                try:
+                    os.remove(self._file_path(old_digest))
+                except FileNotFoundError:
+                    pass
+            self._save_locked()
+        log.info("💾 Media stored", digest=digest[:12], bytes=size, evicted=len(evicted))
+        return digest
+
+    def _stream_to(self, url, partial):
+        """Append the rest of url's body to the partial file; returns the response's content type"""
+        offset = os.path.getsize(partial) if os.path.exists(partial) else 0
+        headers = {'User-Agent': 'musicvideo-media-store'}
+        if offset:
+            headers['Range'] = f"bytes={offset}-"
+        try:
+            response = urllib.request.urlopen(urllib.request.Request(url, headers=headers), timeout=self.timeout)
+        except urllib.error.HTTPError as e:
+            if e.code == 416 and offset:
+                # The partial file does not match the remote one (or is already whole) - start over
+                os.remove(partial)
+                raise DownloadInterrupted("Range not satisfiable - restarting the download")
+            raise
+        with response:
+            if offset and response.status != 206:
+                offset = 0  # Server ignored the range and sent everything
+            elif offset:
+                match = re.match(r'bytes (\d+)-', response.headers.get('Content-Range', ''))
+                if not match or int(match.group(1)) != offset:
+                    # Appending would corrupt the file - start over
+                    os.remove(partial)
+                    raise DownloadInterrupted(f"Asked for bytes from {offset}, got Content-Range {response.headers.get('Content-Range')!r}")
+            expected = response.headers.get('Content-Length')
+            written = 0
+            with open(partial, 'ab' if offset else 'wb') as f:
+                while True:
+                    chunk = response.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    f.write(chunk)
+                    written += len(chunk)
+            if expected is not None and written < int(expected):
+                raise DownloadInterrupted(f"Connection closed after {written} of {expected} bytes")
+            return response.headers.get_content_type()
+
+    def _hash_file(self, path):
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(self.chunk_size), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def _evict_locked(self, keep=None):
+        """Forget least recently used files until the store fits max_bytes (caller holds the lock)"""
+        total = sum(entry['size'] for entry in self.files.values())
+        evicted = []
+        recent = time.time() - EVICTION_MIN_IDLE
+        for digest in sorted(self.files, key=lambda d: self.files[d]['last_used']):
+            if total <= self.max_bytes:
+                break
+            if digest == keep or digest in self.pins or self.files[digest]['last_used'] > recent:
+                continue
+            total -= self.files.pop(digest)['size']
+            evicted.append(digest)
+        if evicted:
+            gone = set(evicted)
+            self.urls = {url: digest for url, digest in self.urls.items() if digest not in gone}
+        return evicted
+
+    @contextlib.contextmanager
+    def pinned(self, digests):
+        """Keep files from being evicted while something reads them by path (e.g. ffmpeg)"""
+        digests = list(digests)
+        with self.lock:
+            for digest in digests:
+                self.pins[digest] = self.pins.get(digest, 0) + 1
+        try:
+            yield
+        finally:
+            with self.lock:
+                for digest in digests:
+                    self.pins[digest] -= 1
+                    if not self.pins[digest]:
+                        del self.pins[digest]
+
+    def open(self, digest):
+        """(path, content_type) of a stored file, or None. The path stays valid for EVICTION_MIN_IDLE seconds."""
+        if not DIGEST_PATTERN.match(digest):
+            return None
+        path = self._file_path(digest)
+        with self.lock:
+            entry = self.files.get(digest)
+            if entry is None or not os.path.exists(path):
+                return None
+            entry['last_used'] = time.time()
+            self.dirty = True
+            return path, entry['content_type']
+
+    def stats(self):
+        with self.lock:
+            return {
+                'files': len(self.files),
+                'bytes': sum(entry['size'] for entry in self.files.values()),
+                'max_bytes': self.max_bytes,
+                'downloading': len(self.in_flight)
+            }
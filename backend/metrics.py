@@ -0,0 +1,163 @@
+# metrics.py - Counters and histograms exposed in Prometheus text format at /metrics
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from logs import get_logger
+
+log = get_logger('metrics')
+
+PREFIX = 'musicvideo_'
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 90, 120, 180, 300)
+SIZE_BUCKETS = (64 * 1024, 256 * 1024, 1024 * 1024, 4 * 1024 * 1024, 16 * 1024 * 1024, 50 * 1024 * 1024)
+COUNT_BUCKETS = (1, 2, 3, 5, 8, 13, 20, 30, 40)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = PREFIX + name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+        self._values = {}  # label values tuple -> state
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def collect(self):
+        with self.lock:
+            values = dict(self._values)
+        lines = self.header()
+        for key, value in sorted(values.items()):
+            lines.append(f"{self.name}_total{_format_labels(dict(zip(self.labelnames, key)))} {_format_value(value)}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self.lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {'counts': [0] * (len(self.buckets) + 1), 'sum': 0.0}
+            # Non-cumulative per bucket here; made cumulative when rendered
+            state['counts'][bisect.bisect_left(self.buckets, value)] += 1
+            state['sum'] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the with-block in seconds"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def collect(self):
+        with self.lock:
+            values = {key: {'counts': list(state['counts']), 'sum': state['sum']} for key, state in self._values.items()}
+        lines = self.header()
+        for key, state in sorted(values.items()):
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), state['counts']):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': _format_value(bound)})} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(state['sum'])}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {cumulative}")
+        return lines
+
+
+class Registry:
+    """Metrics defined at import time plus collectors that read live state on each scrape"""
+
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def counter(self, name, documentation, labelnames=()):
+        metric = Counter(name, documentation, labelnames)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector):
+        """collector() -> [(name, documentation, 'gauge' or 'counter', [(labels, value), ...]), ...]"""
+        self.collectors.append(collector)
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.collect())
+        for collector in self.collectors:
+            try:
+                families = collector()
+            except Exception as e:
+                log.warning("⚠️ Metrics collector failed", error=e)
+                continue
+            for name, documentation, kind, samples in families:
+                full_name = PREFIX + name
+                lines.append(f"# HELP {full_name} {documentation}")
+                lines.append(f"# TYPE {full_name} {kind}")
+                suffix = '_total' if kind == 'counter' else ''
+                for labels, value in samples:
+                    lines.append(f"{full_name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+UPLOAD_BYTES = REGISTRY.histogram('upload_bytes', "Size of received audio uploads", ('kind',), SIZE_BUCKETS)
+UPLOAD_SECONDS = REGISTRY.histogram('upload_seconds', "Time from first to last byte of an upload", ('kind',))
+ANALYSIS_PHASE_SECONDS = REGISTRY.histogram('analysis_phase_seconds', "analyze_music time per phase", ('phase',))
+ANALYSIS_CACHE = REGISTRY.counter('analysis_cache_lookups', "Music analysis cache lookups", ('result',))
+GENERATION_STAGE_SECONDS = REGISTRY.histogram('generation_stage_seconds', "create_video_from_music time per stage", ('stage',))
+HIGGSFIELD_SUBMIT_SECONDS = REGISTRY.histogram('higgsfield_submit_seconds', "Time to get a job accepted, retries included", ('endpoint',))
+HIGGSFIELD_POLL_WAIT_SECONDS = REGISTRY.histogram('higgsfield_poll_wait_seconds', "Time from polling start to job result", ('model', 'outcome'))
+HIGGSFIELD_POLLS_PER_JOB = REGISTRY.histogram('higgsfield_polls_per_job', "Status checks made per polled job", ('model',), COUNT_BUCKETS)
+HIGGSFIELD_ERRORS = REGISTRY.counter('higgsfield_errors', "Failed Higgsfield calls by endpoint and kind", ('endpoint', 'kind'))
+MEDIA_FETCHES = REGISTRY.counter('media_fetches', "Clip URLs asked of the media store by result", ('result',))
+MEDIA_DOWNLOAD_SECONDS = REGISTRY.histogram('media_download_seconds', "Time to download and store a clip, resumes included", ('outcome',))
+HTTP_REQUEST_SECONDS = REGISTRY.histogram('http_request_seconds', "Flask request handling time", ('endpoint', 'status'))
@@ -1,29 +1,87 @@
 import librosa
 import numpy as np
 import os
+import threading
+import time
+from collections import OrderedDict
+from metrics import ANALYSIS_PHASE_SECONDS, ANALYSIS_CACHE
+from logs import get_logger
+import tracing
+
+log = get_logger('music_analyzer')
 
 class MusicAnalyzer:
-    def analyze_music(self, audio_file_path):
+    def __init__(self, cache_size=128):
+        # Analyses keyed by upload content hash, so re-uploads of the same track skip librosa
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+    
+    def get_cached_analysis(self, content_hash):
+        """Get a previous analysis of the same audio content, if any"""
+        if not content_hash:
+            return None
+        with self._cache_lock:
+            analysis = self._cache.get(content_hash)
+            if analysis is None:
+                return None
+            self._cache.move_to_end(content_hash)
+            return dict(analysis)
+    
+    def _remember_analysis(self, content_hash, analysis):
+        if not content_hash:
+            return
+        with self._cache_lock:
+            self._cache[content_hash] = dict(analysis)
+            self._cache.move_to_end(content_hash)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+    
+    def _end_phase(self, phase, started):
+        """Record how long an analysis phase took and return the start of the next one"""
+        now = time.perf_counter()
+        ANALYSIS_PHASE_SECONDS.observe(now - started, phase=phase)
+        tracing.record_span(f"analysis.{phase}", started, now)
+        return now
+    
+    def analyze_music(self, audio_file_path, content_hash=None):
         """
         REAL music analysis using librosa
         """
+        with tracing.span('analyze_music'):
+            return self._analyze_music(audio_file_path, content_hash)
+    
+    def _analyze_music(self, audio_file_path, content_hash):
+        cached = self.get_cached_analysis(content_hash)
+        tracing.annotate(cache='hit' if cached is not None else 'miss')
+        if cached is not None:
+            ANALYSIS_CACHE.inc(result='hit')
+            log.info("🎵 Reusing cached analysis", file=os.path.basename(audio_file_path))
+            return cached
+        ANALYSIS_CACHE.inc(result='miss')
+        
         try:
-            print(f"🎵 Analyzing music file: {os.path.basename(audio_file_path)}")
+            log.info("🎵 Analyzing music file", file=os.path.basename(audio_file_path))
             
             # Load audio file
+            phase_started = time.perf_counter()
             y, sr = librosa.load(audio_file_path)
+            phase_started = self._end_phase('load', phase_started)
             
             # Extract features with error handling and multiple methods
             tempo = 120.0  # Default fallback
             beats = []
+            beat_times = []
             
             # Try multiple tempo detection methods
             try:
                 # Method 1: Standard beat tracking
                 tempo, beats = librosa.beat.beat_track(y=y, sr=sr)
-                print(f"   🎵 Beat tracking: {tempo:.1f} BPM")
+                # Seconds of each beat - final video assembly cuts clips on them
+                beat_times = [round(float(t), 3) for t in librosa.frames_to_time(beats, sr=sr)]
+                log.debug("🎵 Beat tracking tempo", tempo=round(float(tempo), 1), beats=len(beat_times))
             except Exception as e:
-                print(f"   ⚠️ Beat tracking failed: {e}")
+                log.warning("⚠️ Beat tracking failed", error=e)
                 
                 # Method 2: Onset-based tempo estimation
                 try:
@@ -32,9 +90,9 @@ class MusicAnalyzer:
                         onset_times = librosa.frames_to_time(onset_frames, sr=sr)
                         intervals = np.diff(onset_times)
                         tempo = 60.0 / np.median(intervals)
-                        print(f"   🎵 Onset-based tempo: {tempo:.1f} BPM")
+                        log.debug("🎵 Onset-based tempo", tempo=round(float(tempo), 1))
                 except Exception as e2:
-                    print(f"   ⚠️ Onset detection failed: {e2}")
+                    log.warning("⚠️ Onset detection failed", error=e2)
                     
                     # Method 3: Spectral-based estimation
                     try:
@@ -42,25 +100,27 @@ class MusicAnalyzer:
                         spectral_centroids = librosa.feature.spectral_centroid(y=y, sr=sr)[0]
                         tempo = 60.0 + (np.mean(spectral_centroids) / 1000) * 60
                         tempo = max(60, min(200, tempo))  # Clamp to reasonable range
-                        print(f"   🎵 Spectral-based tempo: {tempo:.1f} BPM")
+                        log.debug("🎵 Spectral-based tempo", tempo=round(float(tempo), 1))
                     except Exception as e3:
-                        print(f"   ⚠️ All tempo methods failed, using default: {e3}")
+                        log.warning("⚠️ All tempo methods failed, using default", error=e3)
                         tempo = 120.0
+            phase_started = self._end_phase('tempo', phase_started)
             
             try:
                 spectral_centroids = librosa.feature.spectral_centroid(y=y, sr=sr)[0]
             except Exception as e:
-                print(f"   ⚠️ Spectral centroid failed: {e}")
+                log.warning("⚠️ Spectral centroid failed", error=e)
                 spectral_centroids = np.array([0.5])
             
             try:
                 zero_crossing_rate = librosa.feature.zero_crossing_rate(y)[0]
             except Exception as e:
-                print(f"   ⚠️ Zero crossing rate failed: {e}")
+                log.warning("⚠️ Zero crossing rate failed", error=e)
                 zero_crossing_rate = np.array([0.1])
             
             # Calculate energy (RMS)
             energy = np.sqrt(np.mean(y**2))
+            phase_started = self._end_phase('features', phase_started)
             
             # Calculate mood based on tempo, energy, and spectral features
             mood = self._classify_mood(tempo, energy, np.mean(spectral_centroids), np.mean(zero_crossing_rate))
@@ -74,6 +134,7 @@ class MusicAnalyzer:
             # Enhanced analysis
             genre = self._classify_genre(tempo, energy, np.mean(spectral_centroids), np.mean(zero_crossing_rate))
             energy_level = self._get_energy_level(energy)
+            self._end_phase('classify', phase_started)
             
             analysis = {
                 'tempo': float(tempo),
@@ -83,18 +144,50 @@ class MusicAnalyzer:
                 'energy_level': energy_level,
                 'duration': float(duration),
                 'total_beats': total_beats,
+                'beat_times': beat_times,
                 'spectral_centroid': float(np.mean(spectral_centroids)),
                 'zero_crossing_rate': float(np.mean(zero_crossing_rate))
             }
             
-            print(f"   📊 Analysis: {tempo:.1f} BPM, {mood}, energy: {energy:.2f}")
+            log.info("📊 Analysis complete", tempo=round(tempo, 1), mood=mood, energy=round(energy, 2))
+            self._remember_analysis(content_hash, analysis)
             return analysis
             
         except Exception as e:
-            print(f"❌ Music analysis error: {e}")
-            print("   Using fallback analysis...")
+            log.error("❌ Music analysis error - using fallback analysis", error=e)
             return self._get_default_analysis()
     
+    def frame_features(self, audio_file_path, fps, max_seconds=None, beat_times=None, tempo=120.0):
+        """
+        Per-video-frame features scaled to 0..1 for the fallback renderer:
+        loudness (RMS), brightness (spectral centroid), onset strength and
+        beat_phase (how far each frame is between two beats)
+        """
+        with tracing.span('frame_features'):
+            y, sr = librosa.load(audio_file_path, duration=max_seconds)
+            hop_length = 512
+            frame_times = np.arange(int(len(y) / sr * fps), dtype=np.float32) / fps
+            feature_times = librosa.frames_to_time(np.arange(1 + len(y) // hop_length), sr=sr, hop_length=hop_length)
+            
+            def per_frame(values):
+                # Feature frames -> video frames, then scaled so the loudest moment is 1
+                values = np.interp(frame_times, feature_times[:len(values)], values)
+                peak = values.max() if len(values) else 0
+                return (values / peak if peak > 0 else values).astype(np.float32)
+            
+            features = {
+                'loudness': per_frame(librosa.feature.rms(y=y, hop_length=hop_length)[0]),
+                'brightness': per_frame(librosa.feature.spectral_centroid(y=y, sr=sr, hop_length=hop_length)[0]),
+                'onset': per_frame(librosa.onset.onset_strength(y=y, sr=sr, hop_length=hop_length))
+            }
+            if beat_times is not None and len(beat_times) >= 2:
+                beat_index = np.interp(frame_times, beat_times, np.arange(len(beat_times)))
+            else:
+                # No tracked beats - a steady grid at the tempo
+                beat_index = frame_times * (tempo or 120.0) / 60.0
+            features['beat_phase'] = (beat_index % 1.0).astype(np.float32)
+            return features
+    
     def _classify_mood(self, tempo, energy, spectral_centroid=None, zero_crossing_rate=None):
         """Enhanced mood classification using multiple features"""
         # More sophisticated mood detection
@@ -180,6 +273,7 @@ class MusicAnalyzer:
             'mood': 'dynamic',
             'duration': 30.0,
             'total_beats': 60,
+            'beat_times': [],
             'spectral_centroid': 2000.0,
             'zero_crossing_rate': 0.1
         }
\ No newline at end of file
@@ -0,0 +1,165 @@
+# resilience.py - Error classification, retry policy and circuit breakers for Higgsfield endpoints
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from logs import get_logger
+
+log = get_logger('resilience')
+
+
+class HiggsfieldError(Exception):
+    """Base class for classified Higgsfield API errors"""
+    def __init__(self, message, endpoint=None, status=None):
+        super().__init__(message)
+        self.endpoint = endpoint
+        self.status = status
+
+
+class RetryableError(HiggsfieldError):
+    """5xx, 429 and network failures - worth trying again later"""
+    def __init__(self, message, endpoint=None, status=None, retry_after=None, resubmit_safe=False):
+        super().__init__(message, endpoint, status)
+        self.retry_after = retry_after
+        # True when the request certainly was not processed, so a POST may be sent again
+        self.resubmit_safe = resubmit_safe
+
+
+class PermanentError(HiggsfieldError):
+    """4xx and failed jobs - retrying will not help"""
+    pass
+
+
+class CircuitOpenError(RetryableError):
+    """The endpoint's circuit breaker is open - failing fast"""
+    pass
+
+
+def parse_retry_after(value):
+    """Retry-After header as seconds (delta-seconds or HTTP date), or None"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def endpoint_name(endpoint):
+    """Breaker name for an API path: text2image, kling, minimax or job-sets"""
+    if 'job-sets' in endpoint:
+        return 'job-sets'
+    if 'text2image' in endpoint:
+        return 'text2image'
+    if 'kling' in endpoint:
+        return 'kling'
+    if 'minimax' in endpoint:
+        return 'minimax'
+    return endpoint.split('/')[0] or 'other'
+
+
+def classify_http_error(endpoint, status, body, headers=None):
+    """Turn an HTTP error response into a RetryableError or PermanentError"""
+    message = f"API request failed: {status} - {body}"
+    retry_after = parse_retry_after((headers or {}).get('Retry-After'))
+    if status == 429:
+        return RetryableError(message, endpoint, status, retry_after, resubmit_safe=True)
+    if status in (502, 503, 504):
+        # Gateway/unavailable responses mean the request never reached a worker
+        return RetryableError(message, endpoint, status, retry_after, resubmit_safe=True)
+    if status >= 500 or status == 408:
+        return RetryableError(message, endpoint, status, retry_after)
+    return PermanentError(message, endpoint, status)
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter that honours Retry-After"""
+
+    def __init__(self, max_attempts=4, base_delay=1.0, max_delay=30.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt, retry_after=None):
+        """Seconds to wait before the given retry (1 = first retry)"""
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+        if retry_after is not None:
+            return min(max(retry_after, backoff), self.max_delay * 4)
+        return backoff
+
+
+class CircuitBreaker:
+    """Per-endpoint breaker: closed -> open after consecutive failures -> half-open probes -> closed"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30.0, half_open_probes=2):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_probes = half_open_probes
+        self.lock = threading.Lock()
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probes_in_flight = 0
+        self.probe_successes = 0
+
+    def before_request(self):
+        """Raise CircuitOpenError unless a request may go through right now"""
+        with self.lock:
+            if self.state == self.OPEN:
+                remaining = self.opened_at + self.reset_timeout - time.time()
+                if remaining > 0:
+                    raise CircuitOpenError(
+                        f"Circuit open for {self.name} - failing fast for {remaining:.0f}s",
+                        self.name, retry_after=remaining
+                    )
+                log.info("🔌 Circuit half-open - letting probe requests through", endpoint=self.name)
+                self.state = self.HALF_OPEN
+                self.probes_in_flight = 0
+                self.probe_successes = 0
+
+            if self.state == self.HALF_OPEN:
+                if self.probes_in_flight >= self.half_open_probes:
+                    raise CircuitOpenError(
+                        f"Circuit half-open for {self.name} - probes already in flight",
+                        self.name, retry_after=1.0
+                    )
+                self.probes_in_flight += 1
+
+    def record_success(self):
+        with self.lock:
+            self.consecutive_failures = 0
+            if self.state == self.HALF_OPEN:
+                self.probes_in_flight = max(0, self.probes_in_flight - 1)
+                self.probe_successes += 1
+                if self.probe_successes >= self.half_open_probes:
+                    log.info("🔌 Circuit closed - endpoint recovered", endpoint=self.name)
+                    self.state = self.CLOSED
+
+    def record_failure(self):
+        with self.lock:
+            self.consecutive_failures += 1
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    log.warning("🔌 Circuit opened", endpoint=self.name, consecutive_failures=self.consecutive_failures)
+                self.state = self.OPEN
+                self.opened_at = time.time()
+                self.probes_in_flight = 0
+
+    def release_probe(self):
+        """Give back the probe slot of a request that ended without a success or failure verdict"""
+        with self.lock:
+            if self.state == self.HALF_OPEN:
+                self.probes_in_flight = max(0, self.probes_in_flight - 1)
+
+    def snapshot(self):
+        with self.lock:
+            return {'state': self.state, 'consecutive_failures': self.consecutive_failures}
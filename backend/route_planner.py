@@ -0,0 +1,75 @@
+# route_planner.py - Pick the generation route for each scene
+from config import Config
+from logs import get_logger
+
+log = get_logger('route_planner')
+
+# Each route is the serial chain of models a scene goes through
+ROUTES = {
+    'image_to_video': [Config.MODELS['text_to_image'], Config.MODELS['image_to_video']],  # nano-banana still, then kling
+    'text_to_video': [Config.MODELS['text_to_video']]                                      # minimax in one job
+}
+
+
+class RoutePlanner:
+    """Chooses between t2i+i2v and direct t2v for each scene.
+
+    Routes are scored by cost (CreditManager.estimated_costs) and expected latency
+    (observed per-model durations, stretched by current load). The cheapest route
+    that meets the latency and cost targets wins; if none meets the latency
+    target, the fastest affordable one is used.
+    """
+
+    def __init__(self, credit_manager, latency_stats, load_provider=None):
+        self.credit_manager = credit_manager
+        self.latency_stats = latency_stats
+        # Callable returning admission stats (outstanding_jobs, max_outstanding_jobs, ...)
+        self.load_provider = load_provider
+
+    def load_factor(self):
+        """How much longer than usual jobs take given outstanding Higgsfield work"""
+        if self.load_provider is None:
+            return 1.0
+        stats = self.load_provider()
+        capacity = max(1, stats.get('max_outstanding_jobs', 1))
+        return 1.0 + stats.get('outstanding_jobs', 0) / capacity
+
+    def estimate(self, route, load_factor=1.0):
+        """Expected cost and latency of one scene on a route"""
+        models = ROUTES[route]
+        return {
+            'route': route,
+            'cost': sum(self.credit_manager.estimate_cost(model) for model in models),
+            'latency': sum(self.latency_stats.mean(model) or 0 for model in models) * load_factor
+        }
+
+    def choose(self, latency_target=None, cost_target=None, load_factor=None):
+        """Pick a route for one scene under per-scene targets"""
+        if load_factor is None:
+            load_factor = self.load_factor()
+        latency_target = latency_target or Config.SCENE_LATENCY_SLA
+        estimates = [self.estimate(route, load_factor) for route in ROUTES]
+
+        affordable = [e for e in estimates if cost_target is None or e['cost'] <= cost_target] or estimates
+        on_time = [e for e in affordable if e['latency'] <= latency_target]
+        if on_time:
+            return min(on_time, key=lambda e: (e['cost'], e['latency']))
+        return min(affordable, key=lambda e: (e['latency'], e['cost']))
+
+    def plan(self, scene_plan, latency_target=None, cost_target=None):
+        """Annotate every scene of a plan with its route"""
+        scenes = scene_plan['scenes']
+        if not scenes:
+            return scene_plan
+        # Scenes are generated one after another, so per-request targets split evenly
+        scene_latency = latency_target / len(scenes) if latency_target else None
+        scene_cost = cost_target / len(scenes) if cost_target else None
+        load_factor = self.load_factor()
+
+        for scene in scenes:
+            choice = self.choose(scene_latency, scene_cost, load_factor)
+            scene['route'] = choice['route']
+            scene['estimated_cost'] = round(choice['cost'], 2)
+            scene['estimated_latency'] = round(choice['latency'], 1)
+        log.info("🧭 Routes planned", routes=[scene['route'] for scene in scenes], load_factor=round(load_factor, 2))
+        return scene_plan
@@ -0,0 +1,98 @@
+# scene_catalog.py - Scene prompt catalog loaded once from scene_catalog.json
+import itertools
+import json
+import os
+import random
+import string
+
+CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scene_catalog.json')
+
+# Analysis fields the rules can match on, with every value MusicAnalyzer can produce for them
+MATCH_FIELDS = ('genre', 'mood', 'energy_level')
+FIELD_VALUES = {
+    'genre': ('electronic', 'rock', 'pop', 'ambient', 'alternative'),
+    'mood': ('energetic', 'dynamic', 'calm'),
+    'energy_level': ('high', 'medium', 'low')
+}
+# Placeholders each prompt may use. Warm-pool images are keyed by catalog entry and
+# clips by entry and tempo, so prompts may not depend on anything else.
+TEMPLATE_FIELDS = {'image_prompt': set(), 'video_prompt': {'tempo'}}
+
+
+class SceneCatalog:
+    """Catalog entries indexed by (genre, mood, energy_level).
+
+    Rules are tried in file order and a rule without a field matches any value.
+    Every combination the analyzer can produce is resolved at load time, so
+    planning is a dict lookup plus a seeded per-request RNG.
+    """
+
+    def __init__(self, path=CATALOG_PATH):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        self.catalogs = data['catalogs']
+        self.rules = data['rules']
+        self.default = data['default']
+        self._validate()
+
+        values = [sorted(set(FIELD_VALUES[field]) | {rule[field] for rule in self.rules if field in rule}) for field in MATCH_FIELDS]
+        self.index = {key: self._match(*key) for key in itertools.product(*values)}
+
+    def _validate(self):
+        """Fail at startup, not mid-request, on a bad catalog file"""
+        for rule in self.rules + [{'catalog': self.default}]:
+            if rule['catalog'] not in self.catalogs:
+                raise ValueError(f"Scene catalog rule points at unknown catalog '{rule['catalog']}'")
+        formatter = string.Formatter()
+        for catalog_key, entry in self.catalogs.items():
+            for scene in entry['scenes']:
+                for prompt, allowed in TEMPLATE_FIELDS.items():
+                    fields = {name for _, name, _, _ in formatter.parse(scene[prompt]) if name is not None}
+                    if fields - allowed:
+                        raise ValueError(f"Placeholder {sorted(fields - allowed)} not allowed in {prompt} of catalog '{catalog_key}'")
+
+    def _match(self, genre, mood, energy_level):
+        key = dict(zip(MATCH_FIELDS, (genre, mood, energy_level)))
+        for rule in self.rules:
+            if all(rule[field] == key[field] for field in MATCH_FIELDS if field in rule):
+                return rule['catalog']
+        return self.default
+
+    def lookup(self, genre, mood, energy_level):
+        """Catalog key for an analysis"""
+        catalog_key = self.index.get((genre, mood, energy_level))
+        # Only values from outside FIELD_VALUES miss the index
+        return catalog_key if catalog_key is not None else self._match(genre, mood, energy_level)
+
+    def entries(self):
+        """(catalog_id, scene) for every catalog scene - what the warm pool stocks"""
+        for catalog_key, entry in self.catalogs.items():
+            for i, scene in enumerate(entry['scenes']):
+                yield f"{catalog_key}:{i}", scene
+
+    def plan(self, music_analysis, count=2):
+        """Pick scenes for an analysis; the same analysis always gets the same scenes"""
+        tempo = music_analysis['tempo']
+        mood = music_analysis['mood']
+        genre = music_analysis.get('genre', 'alternative')
+        energy_level = music_analysis.get('energy_level', 'medium')
+        energy = music_analysis.get('energy', 0.1)
+        spectral_centroid = music_analysis.get('spectral_centroid', 2000)
+
+        catalog_key = self.lookup(genre, mood, energy_level)
+        entry = self.catalogs[catalog_key]
+        # Per-request RNG - deterministic per track and safe to use from many threads
+        rng = random.Random(int(tempo * energy * spectral_centroid))
+        indices = rng.sample(range(len(entry['scenes'])), min(count, len(entry['scenes'])))
+
+        # Whole BPM in prompts, so pre-generated clips can be reused across tracks
+        bpm = round(tempo)
+        scenes = [{
+            'catalog_id': f"{catalog_key}:{i}",
+            'bpm': bpm,
+            # Exactly the prompts the warm pool builder uses for this entry and tempo
+            'image_prompt': entry['scenes'][i]['image_prompt'],
+            'video_prompt': entry['scenes'][i]['video_prompt'].format(tempo=bpm)
+        } for i in indices]
+
+        return {'style': entry['style'], 'scenes': scenes, 'special_moments': list(entry['special_moments'])}
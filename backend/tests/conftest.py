@@ -0,0 +1,5 @@
+# conftest.py - Backend modules are imported flat, the way app_flask.py runs them
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
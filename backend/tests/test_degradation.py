@@ -0,0 +1,44 @@
+# test_degradation.py - Load-based trimming only reports what it changed
+from config import Config
+from degradation import DegradationPolicy
+
+
+class FixedLatency:
+    defaults = {'kling-2-5': 60}
+
+    def recent_mean(self, model):
+        return None
+
+
+def overloaded_policy(level):
+    """Policy whose queue pressure puts every request at the given level"""
+    steps = tuple(0 if i < level else 100 for i in range(3))
+    return DegradationPolicy(FixedLatency(), lambda: {'queued_generations': 1, 'max_active': 1}, queue_steps=steps)
+
+
+def plan():
+    return {
+        'scenes': [{'route': 'image_to_video'}, {'route': 'text_to_video'}],
+        'special_moments': [],
+        'quality_tier': 'final'
+    }
+
+
+def test_clips_at_the_model_minimum_are_not_reported_as_shortened():
+    scene_plan = plan()
+    adjustments = overloaded_policy(2).apply(scene_plan)
+
+    assert 'shortened_clips' not in [a['action'] for a in adjustments]
+    assert 'clip_durations' not in scene_plan
+    assert all('duration' not in scene for scene in scene_plan['scenes'])
+
+
+def test_longer_clips_are_shortened_plan_wide(monkeypatch):
+    monkeypatch.setitem(Config.VIDEO_DURATIONS, 'text_to_video', 10)
+    scene_plan = plan()
+    adjustments = overloaded_policy(2).apply(scene_plan)
+
+    assert [a['clips'] for a in adjustments if a['action'] == 'shortened_clips'] == [1]
+    assert scene_plan['clip_durations'] == {'text_to_video': Config.MIN_VIDEO_DURATIONS['text_to_video']}
+    assert scene_plan['scenes'][1]['duration'] == Config.MIN_VIDEO_DURATIONS['text_to_video']
+    assert 'duration' not in scene_plan['scenes'][0]
@@ -0,0 +1,63 @@
+# test_higgsfield_client.py - Per-key accounting of polled and hedged jobs
+import higgsfield_client
+from hedging import Hedge
+from higgsfield_client import HiggsfieldClient
+
+
+def make_client(monkeypatch, statuses):
+    """Client with two keys whose job-set polls answer from statuses (job_set_id -> status)"""
+    client = HiggsfieldClient('key-1', 'secret-1', credentials=[('key-2', 'secret-2')])
+    submitted = iter(['job-original', 'job-hedge'])
+
+    def fake_request(endpoint, data=None, base_url=None, method='POST', credential=None, raise_on_throttle=False):
+        return {'id': next(submitted)}
+
+    def fake_check(job_set_id):
+        status = statuses[job_set_id]
+        return (status, f"https://cdn.example/{job_set_id}.mp4") if status == 'completed' else (status, None)
+
+    monkeypatch.setattr(client, '_make_request_with_base_url', fake_request)
+    monkeypatch.setattr(client, '_check_job', fake_check)
+    monkeypatch.setattr(higgsfield_client.time, 'sleep', lambda seconds: None)
+    return client
+
+
+def in_flight(client):
+    return [stats['in_flight'] for stats in client.credential_stats()]
+
+
+def test_hedge_win_releases_every_key(monkeypatch):
+    statuses = {'job-original': 'running', 'job-hedge': 'completed'}
+    client = make_client(monkeypatch, statuses)
+    job_set_id = client._submit('v1/text2video/minimax', {})
+    losers = []
+    hedge = Hedge(0, lambda: client._submit('v1/text2video/minimax', {}), lambda *loser: losers.append(loser))
+    assert in_flight(client) == [1, 0]
+
+    url = client.poll_job(job_set_id, 'minimax-t2v', hedge)
+
+    assert url == 'https://cdn.example/job-hedge.mp4'
+    assert in_flight(client) == [0, 0]
+    assert client.job_credentials == {}
+    # The loser is handed on with the key that submitted it
+    assert losers == [('job-original', client.credentials.credentials[0].label)]
+
+
+def test_hedge_loser_is_polled_through_its_own_key(monkeypatch):
+    statuses = {'job-original': 'running', 'job-hedge': 'completed'}
+    client = make_client(monkeypatch, statuses)
+    job_set_id = client._submit('v1/text2video/minimax', {})
+    polled_with = []
+
+    def keep_loser(loser_id, credential):
+        statuses[loser_id] = 'completed'
+        real_check = client._check_job
+        monkeypatch.setattr(client, '_check_job', lambda job_id: (polled_with.append(client._credential_for(job_id)), real_check(job_id))[1])
+        client.poll_job(loser_id, 'minimax-t2v', credential=credential)
+
+    hedge = Hedge(0, lambda: client._submit('v1/text2video/minimax', {}), keep_loser)
+    client.poll_job(job_set_id, 'minimax-t2v', hedge)
+
+    assert polled_with == [client.credentials.credentials[0]]
+    assert in_flight(client) == [0, 0]
+    assert client.job_credentials == {}
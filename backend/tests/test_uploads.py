@@ -0,0 +1,86 @@
+# test_uploads.py - Spooled multipart uploads never outlive a rejected request
+import io
+import os
+import struct
+import pytest
+from config import Config
+
+
+def wav_header(seconds=1, rate=8000):
+    """Header of a mono 16-bit PCM WAV file (the samples are not needed for the probe)"""
+    data_size = seconds * rate * 2
+    return (b'RIFF' + struct.pack('<I', 36 + data_size) + b'WAVE'
+            + b'fmt ' + struct.pack('<IHHIIHH', 16, 1, 1, rate, rate * 2, 2, 16)
+            + b'data' + struct.pack('<I', data_size))
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(Config, 'UPLOAD_FOLDER', str(tmp_path / 'uploads'))
+    import app_flask
+    return app_flask.app.test_client()
+
+
+def spooled_files():
+    """Files in the upload folder itself (resumable uploads live in a subfolder)"""
+    if not os.path.isdir(Config.UPLOAD_FOLDER):
+        return []
+    return [name for name in os.listdir(Config.UPLOAD_FOLDER) if os.path.isfile(os.path.join(Config.UPLOAD_FOLDER, name))]
+
+
+def test_empty_filename_leaves_no_spool_file(client):
+    response = client.post('/analyze-music', data={'file': (io.BytesIO(wav_header()), '')},
+                           content_type='multipart/form-data')
+    assert response.status_code == 400
+    assert spooled_files() == []
+
+
+def test_file_parts_under_other_fields_leave_no_spool_file(client):
+    response = client.post('/analyze-music', data={'other': (io.BytesIO(wav_header()), 'track.wav')},
+                           content_type='multipart/form-data')
+    assert response.status_code == 400
+    assert spooled_files() == []
+
+
+class TrickleStream:
+    """Request body that hands out at most `step` bytes per read, like a slow client"""
+
+    def __init__(self, data, step):
+        self.data = data
+        self.step = step
+
+    def read(self, size=-1):
+        chunk, self.data = self.data[:self.step], self.data[self.step:]
+        return chunk
+
+
+def test_chunked_probe_waits_for_the_whole_header(tmp_path):
+    from upload_spool import ChunkedUploadStore
+    store = ChunkedUploadStore(str(tmp_path), ttl=3600)
+    body = wav_header() + bytes(16000)
+    meta = store.create('track.wav', len(body))
+
+    # A first PUT that is only part of the header arrives a few bytes per read
+    meta = store.write_chunk(meta['upload_id'], 0, TrickleStream(body[:20], 4))
+    assert meta['probe'] is None
+    meta = store.write_chunk(meta['upload_id'], 20, TrickleStream(body[20:], 4096))
+
+    assert meta['probe'] == {'format': 'wav', 'duration': 1.0}
+    assert store.finalize(meta['upload_id'])['status'] == 'complete'
+
+
+def test_chunked_probe_skips_an_id3_tag_larger_than_a_chunk(tmp_path):
+    from upload_spool import ChunkedUploadStore
+    store = ChunkedUploadStore(str(tmp_path), ttl=3600)
+    tag_size = 200 * 1024
+    synchsafe = bytes([(tag_size >> 21) & 0x7F, (tag_size >> 14) & 0x7F, (tag_size >> 7) & 0x7F, tag_size & 0x7F])
+    # ID3v2 tag (artwork) followed by MPEG-1 Layer III frames at 128 kbit/s
+    body = b'ID3\x04\x00\x00' + synchsafe + bytes(tag_size) + b'\xff\xfb\x90\x00' * 16000
+    meta = store.create('track.mp3', len(body))
+
+    for offset in range(0, len(body), 64 * 1024):
+        meta = store.write_chunk(meta['upload_id'], offset, io.BytesIO(body[offset:offset + 64 * 1024]))
+
+    assert meta['probe']['format'] == 'mp3'
+    assert meta['probe']['duration'] == pytest.approx(16000 * 4 * 8 / 128000)
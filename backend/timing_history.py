@@ -0,0 +1,144 @@
+# timing_history.py - Persisted model/stage durations and per-request ETAs built from them
+import atexit
+import json
+import os
+import threading
+import time
+from latency_stats import LatencyStats
+from logs import get_logger
+
+log = get_logger('timing_history')
+
+
+class TimingHistory:
+    """Job durations per model and request durations per stage, kept across restarts.
+
+    `models` is the LatencyStats the planner, hedging and degradation read;
+    `stages` holds request-side timings ('analysis', 'planning', 'request',
+    'scene:<route>', 'special'). Samples are written to a JSON file
+    at most every `save_interval` seconds and when the process exits.
+    """
+
+    def __init__(self, path, model_defaults=None, stage_defaults=None, window=200, save_interval=30):
+        self.path = path
+        self.save_interval = save_interval
+        self.models = LatencyStats(model_defaults, window)
+        self.stages = LatencyStats(stage_defaults, window)
+        self.lock = threading.Lock()
+        self.last_saved = time.time()
+        self.dirty = False
+        self._load()
+        atexit.register(self.save)
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except ValueError:
+            log.warning("⚠️ Timing history file is corrupt - starting empty", path=self.path)
+            return
+        self.models.load(data.get('models', {}))
+        self.stages.load(data.get('stages', {}))
+
+    def save(self):
+        with self.lock:
+            if not self.dirty:
+                return
+            self.dirty = False
+            self.last_saved = time.time()
+            data = {'models': self.models.dump(), 'stages': self.stages.dump()}
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+
+    def _changed(self):
+        with self.lock:
+            self.dirty = True
+            due = time.time() - self.last_saved >= self.save_interval
+        if due:
+            try:
+                self.save()
+            except OSError as e:
+                log.warning("⚠️ Saving timing history failed", error=e)
+
+    def on_api_event(self, event, info):
+        """HiggsfieldClient listener - records finished job durations per model"""
+        if event == 'job_finished' and info.get('succeeded') and info.get('model'):
+            self.models.record(info['model'], info['seconds'])
+            self._changed()
+
+    def record_stage(self, stage, seconds):
+        self.stages.record(stage, seconds)
+        self._changed()
+
+    def expected_durations(self):
+        """Typical request and job durations for admission control (None until known)"""
+        job_means = [self.models.mean(model) for model in self.models.dump()]
+        return {
+            'request': self.stages.mean('request') if self.stages.count('request') else None,
+            'job': sum(job_means) / len(job_means) if job_means else None
+        }
+
+
+class RequestEta:
+    """Time left for one request: the history's mean for every step still ahead.
+
+    Steps are (name, stage key) pairs in the order they run. The running step
+    counts with whatever part of its expected time has not elapsed yet.
+    """
+
+    def __init__(self, stages, steps):
+        self.stages = stages
+        self.started = time.time()
+        self.steps = list(steps)
+        self.current = None
+        self.current_started = None
+        self.last_progress = 0.0
+
+    def replan(self, steps):
+        """Replace the steps still ahead, e.g. once the scene plan is known"""
+        self.steps = list(steps)
+
+    def start(self, name):
+        self.current = name
+        self.current_started = time.time()
+
+    def finish(self, name):
+        self.steps = [step for step in self.steps if step[0] != name]
+        if self.current == name:
+            self.current = None
+
+    def _expected(self, key):
+        return self.stages.mean(key) or 0.0
+
+    def current_remaining(self):
+        if self.current is None:
+            return 0.0
+        expected = next((self._expected(key) for name, key in self.steps if name == self.current), 0.0)
+        # A step running over its estimate is still not done - keep a sliver of it
+        return max(expected - (time.time() - self.current_started), expected * 0.1)
+
+    def remaining(self):
+        later = sum(self._expected(key) for name, key in self.steps if name != self.current)
+        return later + self.current_remaining()
+
+    def snapshot(self):
+        """ETA fields for progress events; progress never moves backwards"""
+        elapsed = time.time() - self.started
+        remaining = self.remaining()
+        progress = 100.0 * elapsed / (elapsed + remaining) if elapsed + remaining > 0 else 0.0
+        self.last_progress = max(self.last_progress, min(99.0, progress))
+        # Poll about twice per step, but not more than once a second or less than every 15 seconds
+        next_change = self.current_remaining() or remaining
+        return {
+            'progress': round(self.last_progress, 1),
+            'eta_seconds': round(remaining, 1),
+            'elapsed_seconds': round(elapsed, 1),
+            'poll_after_seconds': round(min(15.0, max(1.0, next_change / 2)), 1)
+        }
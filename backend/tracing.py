@@ -0,0 +1,204 @@
+# tracing.py - Per-request trace spans and opt-in cProfile reports
+import contextvars
+import cProfile
+import io
+import itertools
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+from config import Config
+from logs import get_logger
+
+log = get_logger('tracing')
+
+_current_trace = contextvars.ContextVar('trace', default=None)
+_current_span = contextvars.ContextVar('span', default=None)  # attrs dict of the innermost open span
+
+# cProfile hooks the interpreter, so only one request is profiled at a time
+_profile_lock = threading.Lock()
+
+# Traces of running requests, so their status can show spans before they finish
+_active = {}
+_active_lock = threading.Lock()
+
+
+class Trace:
+    """Timed spans of one request, relative to when the trace started.
+
+    Spans are recorded from whatever thread runs the request's code; work
+    handed to other threads (hedge losers, warm pool refills) is not traced.
+    """
+
+    def __init__(self, request_id, max_spans=500):
+        self.request_id = request_id
+        self.max_spans = max_spans
+        self.started = time.perf_counter()
+        self.started_at = time.time()
+        self.ended = None
+        self.lock = threading.Lock()
+        self.spans = []
+        self.dropped = 0
+        self._ids = itertools.count(1)
+        self.profiler = None
+        self.profile_report = None
+
+    def next_id(self):
+        return next(self._ids)
+
+    def add(self, span_id, parent, name, start, end, attrs):
+        with self.lock:
+            if len(self.spans) >= self.max_spans:
+                self.dropped += 1
+                return
+            self.spans.append({
+                'id': span_id,
+                'parent': parent,
+                'name': name,
+                'start_ms': round((start - self.started) * 1000, 1),
+                'duration_ms': round((end - start) * 1000, 1),
+                'attrs': attrs
+            })
+
+    def start_profiling(self):
+        """Profile the rest of this request, unless another request is being profiled"""
+        if self.profiler is not None:
+            return True
+        if not _profile_lock.acquire(blocking=False):
+            log.info("🔬 Another request is being profiled - skipping", request_id=self.request_id)
+            return False
+        self.profiler = cProfile.Profile()
+        self.profiler.enable()
+        return True
+
+    def finish(self):
+        self.ended = time.perf_counter()
+        if self.profiler is not None:
+            self.profiler.disable()
+            _profile_lock.release()
+            stream = io.StringIO()
+            stats = pstats.Stats(self.profiler, stream=stream)
+            stats.sort_stats('cumulative').print_stats(Config.PROFILE_TOP_FUNCTIONS)
+            self.profile_report = stream.getvalue()
+            self.profiler = None
+
+    def to_dict(self):
+        """Spans in start order plus total time per span name"""
+        with self.lock:
+            spans = sorted(self.spans, key=lambda s: (s['start_ms'], s['id']))
+            dropped = self.dropped
+        summary = {}
+        for s in spans:
+            entry = summary.setdefault(s['name'], {'count': 0, 'total_ms': 0.0})
+            entry['count'] += 1
+            entry['total_ms'] = round(entry['total_ms'] + s['duration_ms'], 1)
+        return {
+            'request_id': self.request_id,
+            'started_at': self.started_at,
+            'duration_ms': round(((self.ended or time.perf_counter()) - self.started) * 1000, 1),
+            'spans': spans,
+            'dropped_spans': dropped,
+            'summary': summary
+        }
+
+
+def current():
+    """The trace of the request running in this context, or None"""
+    return _current_trace.get()
+
+
+def active(request_id):
+    """The trace of a request that is still running, or None"""
+    with _active_lock:
+        return _active.get(request_id)
+
+
+@contextmanager
+def trace(request_id, profile=False, on_finish=None):
+    """Trace the with-block as request_id; nested calls join the outer trace.
+
+    on_finish(trace) runs when the outermost block exits.
+    """
+    existing = _current_trace.get()
+    if existing is not None:
+        if profile:
+            existing.start_profiling()
+        yield existing
+        return
+    if not Config.TRACE_ENABLED:
+        yield None
+        return
+
+    new_trace = Trace(request_id, Config.TRACE_MAX_SPANS)
+    trace_token = _current_trace.set(new_trace)
+    span_token = _current_span.set(None)
+    with _active_lock:
+        _active[request_id] = new_trace
+    if profile:
+        new_trace.start_profiling()
+    try:
+        yield new_trace
+    finally:
+        new_trace.finish()
+        _current_span.reset(span_token)
+        _current_trace.reset(trace_token)
+        with _active_lock:
+            _active.pop(request_id, None)
+        if on_finish:
+            try:
+                on_finish(new_trace)
+            except Exception as e:
+                log.warning("⚠️ Saving trace failed", request_id=request_id, error=e)
+
+
+@contextmanager
+def span(name, **attrs):
+    """Time the with-block as a child of the current span; yields its attrs dict to add to"""
+    current_trace = _current_trace.get()
+    if current_trace is None:
+        yield attrs
+        return
+    parent = _current_span.get()
+    attrs['_id'] = span_id = current_trace.next_id()
+    token = _current_span.set(attrs)
+    start = time.perf_counter()
+    try:
+        yield attrs
+    except BaseException as e:
+        attrs['error'] = type(e).__name__
+        raise
+    finally:
+        end = time.perf_counter()
+        _current_span.reset(token)
+        del attrs['_id']
+        current_trace.add(span_id, parent['_id'] if parent else None, name, start, end, attrs)
+
+
+@contextmanager
+def accumulate(name):
+    """Add the with-block's time to the current span as name_ms / name_count instead of a span of its own"""
+    parent = _current_span.get()
+    start = time.perf_counter()
+    try:
+        yield {}
+    finally:
+        if parent is not None:
+            parent[f'{name}_ms'] = round(parent.get(f'{name}_ms', 0.0) + (time.perf_counter() - start) * 1000, 1)
+            parent[f'{name}_count'] = parent.get(f'{name}_count', 0) + 1
+
+
+def record_span(name, start, end=None, **attrs):
+    """Record an already timed region (time.perf_counter() values) under the current span"""
+    current_trace = _current_trace.get()
+    if current_trace is None:
+        return
+    parent = _current_span.get()
+    current_trace.add(current_trace.next_id(), parent['_id'] if parent else None, name, start,
+                      end if end is not None else time.perf_counter(), attrs)
+
+
+def annotate(**attrs):
+    """Add attributes to the innermost open span"""
+    current_span = _current_span.get()
+    if current_span is not None:
+        current_span.update(attrs)
@@ -0,0 +1,463 @@
+# upload_spool.py - Stream uploads to disk while hashing and probing them
+import hashlib
+import json
+import os
+import struct
+import threading
+import time
+import uuid
+from flask import Request
+from werkzeug.utils import secure_filename
+from config import Config
+from metrics import UPLOAD_BYTES, UPLOAD_SECONDS
+
+PROBE_BYTES = 64 * 1024          # Enough for the WAV/MP3/OGG/M4A headers we look at
+MAX_PROBE_BYTES = 1024 * 1024    # Give up on skipping huge ID3 tags (embedded artwork) beyond this
+
+# Layer III bitrates in kbps, indexed by the 4-bit bitrate field
+MP3_BITRATES = {
+    'mpeg1': [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    'mpeg2': [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160]
+}
+
+
+class UploadRejected(Exception):
+    """Raised while an upload is still streaming in and turns out to be unusable"""
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _allowed_extension(filename):
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in Config.ALLOWED_EXTENSIONS
+
+
+def _probe_window(header):
+    """How many leading bytes the header probe needs to see"""
+    if len(header) >= 10 and header[:3] == b'ID3':
+        # ID3v2 tag size is a 28-bit synchsafe integer
+        tag_size = (header[6] << 21) | (header[7] << 14) | (header[8] << 7) | header[9]
+        return min(10 + tag_size + 4096, MAX_PROBE_BYTES)
+    return PROBE_BYTES
+
+
+def _probe_wav(header, total_size):
+    """Read byte rate and data size from the RIFF chunks"""
+    byte_rate = None
+    offset = 12
+    while offset + 8 <= len(header):
+        chunk_id = header[offset:offset + 4]
+        chunk_size = struct.unpack('<I', header[offset + 4:offset + 8])[0]
+        if chunk_id == b'fmt ' and offset + 20 <= len(header):
+            byte_rate = struct.unpack('<I', header[offset + 16:offset + 20])[0]
+        elif chunk_id == b'data':
+            if not byte_rate:
+                return None
+            if total_size and chunk_size > total_size:
+                # Streaming writers leave 0xFFFFFFFF here - fall back to the upload size
+                chunk_size = total_size - offset - 8
+            return chunk_size / byte_rate
+        offset += 8 + chunk_size + (chunk_size & 1)
+    return None
+
+
+def _probe_mp3(header, total_size):
+    """Estimate duration from the first Layer III frame header (assumes CBR)"""
+    start = 0
+    if header[:3] == b'ID3' and len(header) >= 10:
+        start = 10 + ((header[6] << 21) | (header[7] << 14) | (header[8] << 7) | header[9])
+
+    for i in range(start, len(header) - 3):
+        if header[i] != 0xFF or (header[i + 1] & 0xE0) != 0xE0:
+            continue
+        version = (header[i + 1] >> 3) & 0x03
+        layer = (header[i + 1] >> 1) & 0x03
+        bitrate_index = header[i + 2] >> 4
+        sample_rate_index = (header[i + 2] >> 2) & 0x03
+        if version == 1 or layer != 1 or bitrate_index in (0, 15) or sample_rate_index == 3:
+            continue
+        table = MP3_BITRATES['mpeg1' if version == 3 else 'mpeg2']
+        if not total_size:
+            return None
+        return (total_size - i) * 8 / (table[bitrate_index] * 1000)
+    return None
+
+
+def probe_audio_header(header, total_size=None):
+    """Cheaply identify the container and estimate the duration from the first bytes"""
+    header = bytes(header)
+    if header[:4] == b'RIFF' and header[8:12] == b'WAVE':
+        try:
+            return {'format': 'wav', 'duration': _probe_wav(header, total_size)}
+        except struct.error:
+            raise UploadRejected("WAV header is truncated or malformed")
+    if header[:4] == b'OggS':
+        return {'format': 'ogg', 'duration': None}
+    if header[4:8] == b'ftyp':
+        return {'format': 'm4a', 'duration': None}
+    if header[:3] == b'ID3' or (len(header) > 1 and header[0] == 0xFF and (header[1] & 0xE0) == 0xE0):
+        return {'format': 'mp3', 'duration': _probe_mp3(header, total_size)}
+    raise UploadRejected("File does not look like a supported audio file")
+
+
+class SpoolFile:
+    """Writable sink that Werkzeug streams an uploaded file into chunk by chunk.
+
+    The body goes straight to disk, is hashed as it arrives and gets a header probe
+    as soon as the first bytes are in, so bad uploads fail before the body is done.
+    """
+
+    def __init__(self, spool_dir, filename, expected_size=None):
+        os.makedirs(spool_dir, exist_ok=True)
+        self.filename = secure_filename(filename) or 'upload'
+        self.path = os.path.join(spool_dir, f"{uuid.uuid4()}_{self.filename}")
+        self.expected_size = expected_size
+        self.size = 0
+        self.probe = None
+        self.finished = False  # Set once a handler has taken the upload over
+        self._header = bytearray()
+        self._hash = hashlib.sha256()
+        self._file = open(self.path, 'wb+')
+        self.started_at = time.time()
+
+    def write(self, chunk):
+        self.size += len(chunk)
+        if self.size > Config.MAX_UPLOAD_BYTES:
+            self.discard()
+            raise UploadRejected("File too large. Maximum size is 50MB.", 413)
+
+        if self.probe is None:
+            self._header += chunk[:MAX_PROBE_BYTES - len(self._header)]
+            if len(self._header) >= _probe_window(self._header):
+                self._run_probe()
+
+        self._hash.update(chunk)
+        return self._file.write(chunk)
+
+    def _run_probe(self):
+        try:
+            self.probe = probe_audio_header(self._header, self.expected_size)
+        except UploadRejected:
+            self.discard()
+            raise
+        self._header = bytearray()
+
+        duration = self.probe.get('duration')
+        if duration is not None and duration > Config.MAX_AUDIO_DURATION:
+            self.discard()
+            raise UploadRejected(f"Audio too long ({duration:.0f}s). Maximum is {Config.MAX_AUDIO_DURATION}s.")
+
+    def finish(self):
+        """Flush the spooled file and run the probe if the body was shorter than the probe window"""
+        if self.size == 0:
+            self.discard()
+            raise UploadRejected("Uploaded file is empty")
+        if self.probe is None:
+            self.expected_size = self.size
+            self._run_probe()
+        self._file.close()
+        UPLOAD_BYTES.observe(self.size, kind='multipart')
+        UPLOAD_SECONDS.observe(time.time() - self.started_at, kind='multipart')
+        self.finished = True
+        return self
+
+    @property
+    def content_hash(self):
+        return self._hash.hexdigest()
+
+    def release(self):
+        """Done with the upload - one-shot uploads are deleted right away"""
+        self.discard()
+
+    def discard(self):
+        """Close and delete the spooled file"""
+        if not self._file.closed:
+            self._file.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    # Werkzeug seeks/reads the container once parsing is done
+    def seek(self, *args):
+        return self._file.seek(*args)
+
+    def tell(self):
+        return self._file.tell()
+
+    def read(self, *args):
+        return self._file.read(*args)
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+    @property
+    def closed(self):
+        return self._file.closed
+
+
+class SpoolingRequest(Request):
+    """Request that streams file parts into the upload spool instead of buffering them"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.spool_files = []  # Every file part spooled while parsing, finished or not
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if filename and not _allowed_extension(filename):
+            raise UploadRejected("Invalid file type")
+        spool = SpoolFile(Config.UPLOAD_FOLDER, filename or 'upload', content_length or total_content_length)
+        self.spool_files.append(spool)
+        return spool
+
+    def discard_unfinished_files(self):
+        """Delete every file part spooled for this request that no handler finished (and so took over)"""
+        for spool in self.spool_files:
+            if not spool.finished:
+                spool.discard()
+
+
+class ChunkedUpload:
+    """A finalized chunked upload, usable wherever a spooled upload is"""
+
+    def __init__(self, meta):
+        self.upload_id = meta['upload_id']
+        self.path = meta['path']
+        self.filename = meta['filename']
+        self.size = meta['size']
+        self.content_hash = meta['content_hash']
+        self.probe = meta['probe']
+
+    def release(self):
+        """Chunked uploads can be referenced again, so they live until they expire"""
+        pass
+
+
+class ChunkedUploadStore:
+    """Resumable uploads: init, put chunks at an offset, finalize.
+
+    Chunks go straight into the spooled file. Metadata lives next to it as JSON so
+    an upload can be resumed across restarts. The content hash is computed while
+    chunks arrive in order, and recomputed at finalize only if that was broken.
+    """
+
+    def __init__(self, directory, ttl, purge_interval=3600):
+        self.directory = directory
+        self.ttl = ttl
+        self.purge_interval = purge_interval
+        self.lock = threading.Lock()
+        self._upload_locks = {}  # upload_id -> Lock while the upload takes chunks
+        self._last_purge = 0.0
+        self._hashers = {}  # upload_id -> (sha256, hashed_offset) while chunks arrive in order
+        os.makedirs(directory, exist_ok=True)
+
+    def _meta_path(self, upload_id):
+        return os.path.join(self.directory, f"{upload_id}.json")
+
+    def _upload_lock(self, upload_id):
+        with self.lock:
+            return self._upload_locks.setdefault(upload_id, threading.Lock())
+
+    def _forget(self, upload_id):
+        """Drop the in-memory state of a finalized or deleted upload"""
+        with self.lock:
+            self._upload_locks.pop(upload_id, None)
+            self._hashers.pop(upload_id, None)
+
+    def _maybe_purge(self):
+        """Purge expired uploads at most once per purge_interval"""
+        with self.lock:
+            now = time.time()
+            if now - self._last_purge < self.purge_interval:
+                return
+            self._last_purge = now
+        self.purge_expired()
+
+    def _save(self, meta):
+        meta['updated_at'] = time.time()
+        tmp_path = f"{self._meta_path(meta['upload_id'])}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self._meta_path(meta['upload_id']))
+
+    def get(self, upload_id):
+        """Get upload metadata, or None for unknown or malformed ids"""
+        try:
+            upload_id = str(uuid.UUID(upload_id))
+        except (ValueError, TypeError, AttributeError):
+            return None
+        try:
+            with open(self._meta_path(upload_id), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def create(self, filename, size):
+        """Start a new upload of a file with a known total size"""
+        if not filename or not _allowed_extension(filename):
+            raise UploadRejected("Invalid file type")
+        if not isinstance(size, int) or size <= 0:
+            raise UploadRejected("Upload size must be a positive integer")
+        if size > Config.MAX_UPLOAD_BYTES:
+            raise UploadRejected("File too large. Maximum size is 50MB.", 413)
+        # Abandoned uploads are cleaned up as new ones arrive
+        self._maybe_purge()
+
+        upload_id = str(uuid.uuid4())
+        filename = secure_filename(filename) or 'upload'
+        meta = {
+            'upload_id': upload_id,
+            'filename': filename,
+            # Keep the extension - decoders pick the format from it
+            'path': os.path.join(self.directory, f"{upload_id}_{filename}"),
+            'size': size,
+            'received': 0,
+            'status': 'uploading',
+            'content_hash': None,
+            'probe': None,
+            'created_at': time.time()
+        }
+        open(meta['path'], 'wb').close()
+        self._save(meta)
+        self._hashers[upload_id] = (hashlib.sha256(), 0)
+        return meta
+
+    def _probe_header(self, meta, f, received):
+        """Probe of the upload's first bytes, or None until they cover the probe window.
+
+        Bytes before `received` are contiguous, so the header is read back from the
+        file - it may have arrived in any number of reads and PUTs.
+        """
+        f.flush()
+        end = f.tell()
+        f.seek(0)
+        header = f.read(min(received, MAX_PROBE_BYTES))
+        f.seek(end)
+        if len(header) < _probe_window(header) and received < meta['size']:
+            return None
+        probe = probe_audio_header(header, meta['size'])
+        duration = probe.get('duration')
+        if duration is not None and duration > Config.MAX_AUDIO_DURATION:
+            raise UploadRejected(f"Audio too long ({duration:.0f}s). Maximum is {Config.MAX_AUDIO_DURATION}s.")
+        return probe
+
+    def write_chunk(self, upload_id, offset, stream, chunk_size=64 * 1024):
+        """Write a chunk at an offset. Re-sending already received bytes is fine, gaps are not."""
+        meta = self.get(upload_id)
+        if meta is None:
+            raise UploadRejected("Unknown upload id", 404)
+
+        with self._upload_lock(meta['upload_id']):
+            meta = self.get(upload_id)
+            if meta is None:
+                raise UploadRejected("Unknown upload id", 404)
+            if meta['status'] != 'uploading':
+                raise UploadRejected("Upload is already finalized", 409)
+            if offset < 0 or offset > meta['received']:
+                raise UploadRejected(f"Chunk offset {offset} does not match received offset {meta['received']}", 409)
+
+            hasher, hashed_offset = self._hashers.get(meta['upload_id'], (None, 0))
+            position = offset
+            with open(meta['path'], 'r+b') as f:
+                f.seek(offset)
+                while True:
+                    chunk = stream.read(chunk_size)
+                    if not chunk:
+                        break
+                    if position + len(chunk) > meta['size']:
+                        raise UploadRejected("Chunk extends past the declared upload size", 416)
+                    f.write(chunk)
+                    if hasher is not None and position <= hashed_offset < position + len(chunk):
+                        hasher.update(chunk[hashed_offset - position:])
+                        hashed_offset = position + len(chunk)
+                    position += len(chunk)
+                    if meta['probe'] is None:
+                        # Header probe as soon as enough of the file is in, before the rest is sent
+                        try:
+                            meta['probe'] = self._probe_header(meta, f, max(meta['received'], position))
+                        except UploadRejected:
+                            self.delete(meta['upload_id'])
+                            raise
+
+            if hasher is not None:
+                self._hashers[meta['upload_id']] = (hasher, hashed_offset)
+            meta['received'] = max(meta['received'], position)
+            self._save(meta)
+            return meta
+
+    def finalize(self, upload_id):
+        """Complete an upload once every byte has arrived"""
+        meta = self.get(upload_id)
+        if meta is None:
+            raise UploadRejected("Unknown upload id", 404)
+
+        with self._upload_lock(meta['upload_id']):
+            meta = self.get(upload_id)
+            if meta is None:
+                raise UploadRejected("Unknown upload id", 404)
+            if meta['status'] == 'complete':
+                return meta
+            if meta['received'] != meta['size']:
+                raise UploadRejected(f"Upload incomplete: received {meta['received']} of {meta['size']} bytes", 409)
+
+            hasher, hashed_offset = self._hashers.get(meta['upload_id'], (None, 0))
+            if hasher is None or hashed_offset != meta['size']:
+                # Chunks arrived out of order or the server restarted mid-upload
+                hasher = hashlib.sha256()
+                with open(meta['path'], 'rb') as f:
+                    for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                        hasher.update(chunk)
+
+            meta['content_hash'] = hasher.hexdigest()
+            meta['status'] = 'complete'
+            self._save(meta)
+            # No more chunks can arrive - later calls see status 'complete' without a lock
+            self._forget(meta['upload_id'])
+            UPLOAD_BYTES.observe(meta['size'], kind='chunked')
+            UPLOAD_SECONDS.observe(time.time() - meta['created_at'], kind='chunked')
+            return meta
+
+    def open_upload(self, upload_id):
+        """Get a finalized upload for analysis or generation"""
+        meta = self.get(upload_id)
+        if meta is None:
+            raise UploadRejected("Unknown upload id", 404)
+        if meta['status'] != 'complete':
+            raise UploadRejected("Upload has not been finalized", 409)
+        return ChunkedUpload(meta)
+
+    def delete(self, upload_id):
+        """Remove an upload and its data"""
+        meta = self.get(upload_id)
+        if meta is None:
+            return
+        self._forget(meta['upload_id'])
+        for path in (meta['path'], self._meta_path(meta['upload_id'])):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def purge_expired(self):
+        """Remove uploads that were not touched within the TTL"""
+        cutoff = time.time() - self.ttl
+        removed = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            meta = self.get(name[:-len('.json')])
+            if meta and meta.get('updated_at', 0) < cutoff:
+                self.delete(meta['upload_id'])
+                removed += 1
+        return removed
+
+
+def purge_stale_spool_files(spool_dir, max_age):
+    """Remove spooled files left behind by interrupted uploads"""
+    if not os.path.isdir(spool_dir):
+        return 0
+    cutoff = time.time() - max_age
+    removed = 0
+    for name in os.listdir(spool_dir):
+        path = os.path.join(spool_dir, name)
+        if os.path.isfile(path) and os.path.getmtime(path) < cutoff:
+            os.remove(path)
+            removed += 1
+    return removed
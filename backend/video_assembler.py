@@ -0,0 +1,175 @@
+# video_assembler.py - One beat-synced video from a request's clips and its audio, via ffmpeg
+import bisect
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+from collections import Counter
+from logs import get_logger
+import tracing
+
+log = get_logger('video_assembler')
+
+MIN_CUT_SECONDS = 1.0  # Never trim a clip shorter than this just to end on a beat
+MP4_AUDIO_CODECS = ('aac', 'mp3')  # Copied into the MP4 as they are; anything else becomes AAC
+ENCODERS = {'h264': 'libx264', 'hevc': 'libx265'}
+
+
+class AssemblyError(Exception):
+    """ffmpeg or ffprobe failed, or the clips cannot be joined"""
+
+
+def beat_grid(beat_times, tempo, duration):
+    """Beat times of the track, or a grid from its tempo when beat tracking found none"""
+    if len(beat_times) >= 2:
+        return sorted(beat_times)
+    interval = 60.0 / tempo if tempo and tempo > 0 else 0.5
+    return [round(i * interval, 3) for i in range(int(duration / interval) + 1)]
+
+
+def plan_cuts(clip_durations, beats, audio_duration):
+    """Seconds to keep of each clip so every cut lands on a beat.
+
+    Clips are only ever shortened: each ends on the last beat before its own
+    end or the end of the audio. Clips that would be left with less than
+    MIN_CUT_SECONDS before the audio ends get 0 and are skipped.
+    """
+    cuts = []
+    position = 0.0
+    for duration in clip_durations:
+        end = min(position + duration, audio_duration)
+        i = bisect.bisect_right(beats, end) - 1
+        if i >= 0 and beats[i] >= position + MIN_CUT_SECONDS:
+            end = beats[i]
+        length = end - position if end - position >= MIN_CUT_SECONDS else 0.0
+        cuts.append(round(length, 3))
+        position += length
+    return cuts
+
+
+class VideoAssembler:
+    """Joins clips over the track into one MP4, copying streams wherever it can.
+
+    Clips are trimmed only at their end (they all start on a keyframe), so the
+    concat demuxer can stream-copy them with an outpoint. If the clips differ
+    in codec, profile, level, size, frame rate, time base or pixel format,
+    all of them are re-encoded to the most common size, frame rate and pixel
+    format first; the audio is re-encoded only if MP4 can't hold it as it is.
+    """
+
+    def __init__(self, ffmpeg='ffmpeg', ffprobe='ffprobe', timeout=120):
+        self.ffmpeg = ffmpeg
+        self.ffprobe = ffprobe
+        self.timeout = timeout
+
+    def available(self):
+        return shutil.which(self.ffmpeg) is not None and shutil.which(self.ffprobe) is not None
+
+    def _run(self, args):
+        tool = os.path.basename(args[0])
+        try:
+            completed = subprocess.run(args, capture_output=True, timeout=self.timeout)
+        except (OSError, subprocess.TimeoutExpired) as e:
+            raise AssemblyError(f"{tool} failed: {e}")
+        if completed.returncode != 0:
+            stderr = completed.stderr.decode('utf-8', 'replace').strip().splitlines()
+            raise AssemblyError(f"{tool} exited with {completed.returncode}: {' | '.join(stderr[-3:])}")
+        return completed.stdout
+
+    def probe(self, path):
+        """Duration and first video/audio stream of a media file"""
+        output = self._run([
+            self.ffprobe, '-v', 'error', '-of', 'json',
+            '-show_entries', 'format=duration:stream=codec_type,codec_name,profile,level,width,height,pix_fmt,r_frame_rate,time_base',
+            path
+        ])
+        info = json.loads(output)
+        streams = info.get('streams', [])
+        return {
+            'duration': float(info.get('format', {}).get('duration') or 0),
+            'video': next((s for s in streams if s.get('codec_type') == 'video'), None),
+            'audio': next((s for s in streams if s.get('codec_type') == 'audio'), None)
+        }
+
+    @staticmethod
+    def _signature(video):
+        """Everything that must match for clips to be joined by stream copy.
+
+        The concat demuxer keeps only the first clip's codec parameters (SPS/PPS),
+        so clips from different models must also agree on profile, level and time base.
+        """
+        return (
+            video['codec_name'], video['width'], video['height'], video.get('pix_fmt'), video.get('r_frame_rate'),
+            video.get('profile'), video.get('level'), video.get('time_base')
+        )
+
+    def _reencode(self, path, settings, output_path):
+        """Re-encode a clip (without audio) to the given (codec, width, height, pixel format, frame rate)"""
+        codec, width, height, pix_fmt, rate = settings
+        self._run([
+            self.ffmpeg, '-y', '-v', 'error', '-i', path, '-an',
+            '-vf', f"scale={width}:{height}:force_original_aspect_ratio=decrease,pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,fps={rate}",
+            '-c:v', ENCODERS[codec], '-preset', 'veryfast', '-crf', '18', '-pix_fmt', pix_fmt or 'yuv420p',
+            output_path
+        ])
+
+    def assemble(self, clip_paths, audio_path, beats, output_path):
+        """Write the clips, in order and cut on beats, over the audio to output_path"""
+        with tracing.span('assembly.probe'):
+            clips = [self.probe(path) for path in clip_paths]
+            audio = self.probe(audio_path)
+        if audio['audio'] is None:
+            raise AssemblyError("The uploaded file has no audio stream")
+        clips = [(path, clip) for path, clip in zip(clip_paths, clips) if clip['video'] and clip['duration'] > 0]
+        if not clips:
+            raise AssemblyError("None of the clips has a video stream")
+
+        cuts = plan_cuts([clip['duration'] for _, clip in clips], beats, audio['duration'] or float('inf'))
+        signatures = [self._signature(clip['video']) for _, clip in clips]
+        target = Counter(signatures).most_common(1)[0][0][:5]
+        reencode_all = len(set(signatures)) > 1 or target[0] not in ENCODERS
+        if target[0] not in ENCODERS:
+            # No encoder to match the common codec with - everything becomes H.264
+            target = ('h264',) + target[1:3] + ('yuv420p', target[4])
+        # A clip re-encoded here never gets another encoder's parameter sets, so when the
+        # clips are not all alike every one of them is re-encoded with the same settings
+
+        with tempfile.TemporaryDirectory(prefix='assembly-') as work_dir:
+            entries = []
+            reencoded = 0
+            for i, ((path, _), cut) in enumerate(zip(clips, cuts)):
+                if cut <= 0:
+                    continue
+                if reencode_all:
+                    with tracing.span('assembly.reencode', clip=i):
+                        path = os.path.join(work_dir, f"clip{i}.mp4")
+                        self._reencode(clips[i][0], target, path)
+                    reencoded += 1
+                entries.append((path, cut))
+            if not entries:
+                raise AssemblyError("The audio is too short for any of the clips")
+
+            list_path = os.path.join(work_dir, 'clips.txt')
+            with open(list_path, 'w', encoding='utf-8') as f:
+                for path, cut in entries:
+                    escaped = os.path.abspath(path).replace("'", "'\\''")
+                    f.write(f"file '{escaped}'\noutpoint {cut:.3f}\n")
+
+            total = round(sum(cut for _, cut in entries), 3)
+            audio_codec = 'copy' if audio['audio']['codec_name'] in MP4_AUDIO_CODECS else 'aac'
+            with tracing.span('assembly.concat', clips=len(entries), reencoded=reencoded, audio=audio_codec):
+                self._run([
+                    self.ffmpeg, '-y', '-v', 'error',
+                    '-f', 'concat', '-safe', '0', '-i', list_path, '-i', audio_path,
+                    '-map', '0:v:0', '-map', '1:a:0', '-c:v', 'copy', '-c:a', audio_codec,
+                    '-t', f"{total:.3f}", '-movflags', '+faststart', '-f', 'mp4', output_path
+                ])
+
+        log.info("🎞️ Video assembled", clips=len(entries), seconds=total, reencoded=reencoded, audio=audio_codec)
+        return {
+            'duration': total,
+            'cuts': [round(cut, 3) for cut in cuts],
+            'reencoded_clips': reencoded,
+            'audio': audio_codec
+        }
@@ -1,356 +1,761 @@
 from music_analyzer import MusicAnalyzer
 from higgsfield_client import HiggsfieldClient
+from credential_pool import parse_credentials
+from job_journal import JobJournal
+from credit_manager import CreditManager, InsufficientBudget
+from timing_history import TimingHistory, RequestEta
+from route_planner import RoutePlanner, ROUTES
+from generation_cache import GenerationCache
+from hedging import Hedge, HedgeBudget
+from warm_pool import WarmPool
+from scene_catalog import SceneCatalog
+from degradation import DegradationPolicy
+from job_scheduler import JobScheduler
+from media_store import MediaStore
+from video_assembler import VideoAssembler, AssemblyError, beat_grid
+from fallback_renderer import FallbackRenderer
+from metrics import GENERATION_STAGE_SECONDS
+from logs import get_logger
+import tracing
 from config import Config
+import contextvars
 import os
+import time
+import random
+import tempfile
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait as futures_wait
+from contextlib import contextmanager
+
+# 'preview' publishes a quick still per scene before its final clip is ready
+QUALITY_TIERS = ('final', 'preview')
+# Scenes generated per request (limit to 2 for performance)
+MAX_SCENES = 2
+
+log = get_logger('video_generator')
 
 class VideoGenerator:
-    def __init__(self):
-        self.music_analyzer = MusicAnalyzer()
+    def __init__(self, music_analyzer=None, credit_manager=None):
+        self.music_analyzer = music_analyzer or MusicAnalyzer()
+        self.credit_manager = credit_manager or CreditManager(Config.TOTAL_BUDGET, Config.CREDIT_LEDGER_PATH)
         self.api_client = HiggsfieldClient(
             Config.HIGGSFIELD_API_KEY,
-            Config.HIGGSFIELD_API_SECRET
+            Config.HIGGSFIELD_API_SECRET,
+            parse_credentials(Config.HIGGSFIELD_CREDENTIALS)
         )
+        self.journal = JobJournal(Config.JOB_JOURNAL_PATH, Config.JOB_JOURNAL_RETENTION)
+        # Persisted model and stage durations - planning, hedging, ETAs and admission all read them
+        self.timing_history = TimingHistory(Config.TIMING_HISTORY_PATH, Config.DEFAULT_MODEL_LATENCY, Config.DEFAULT_STAGE_SECONDS)
+        self.latency_stats = self.timing_history.models
+        self.api_client.add_listener(self.timing_history.on_api_event)
+        self.active_etas = {}  # request_id -> RequestEta of running requests
+        self.active_etas_lock = threading.Lock()
+        self.route_planner = RoutePlanner(self.credit_manager, self.latency_stats)
+        self.generation_cache = GenerationCache(Config.GENERATION_CACHE_SIZE, Config.GENERATION_CACHE_TTL)
+        self.hedge_budget = HedgeBudget(Config.HEDGE_MAX_EXTRA_SHARE)
+        self.warm_pool = WarmPool(Config.WARM_POOL_PATH, Config.WARM_POOL_TTL, Config.WARM_POOL_FLUSH_INTERVAL)
+        self.scene_catalog = SceneCatalog()
+        self.degradation = DegradationPolicy(self.latency_stats)
+        # Every Higgsfield job of every request and batch item shares these slots
+        self.scheduler = JobScheduler(Config.MAX_CONCURRENT_JOBS or Config.MAX_JOBS_PER_KEY * len(self.api_client.credentials))
+        self.media_store = MediaStore(Config.MEDIA_STORE_PATH, Config.MEDIA_STORE_MAX_BYTES,
+                                      Config.MEDIA_DOWNLOAD_WORKERS, Config.MEDIA_DOWNLOAD_CHUNK_SIZE)
+        self.assembler = VideoAssembler(Config.FFMPEG_PATH, Config.FFPROBE_PATH, Config.ASSEMBLY_TIMEOUT)
+        if Config.ASSEMBLY_ENABLED and not self.assembler.available():
+            log.warning("⚠️ ffmpeg/ffprobe not found - results will not include an assembled video", ffmpeg=Config.FFMPEG_PATH)
+        width, height = Config.FALLBACK_VIDEO_SIZE
+        self.fallback_renderer = FallbackRenderer(Config.FFMPEG_PATH, width, height, Config.FALLBACK_FPS, timeout=Config.ASSEMBLY_TIMEOUT)
     
-    def create_video_from_music(self, audio_file_path, progress_callback=None):
+    def create_video_from_music(self, audio_file_path, progress_callback=None, request_id=None, content_hash=None, music_analysis=None, options=None):
         """
         Main function: Turn music into video with progress tracking
-        """
-        total_steps = 6  # Total number of major steps
-        current_step = 0
-        
-        def update_progress(step_name, progress_percent):
-            if progress_callback:
-                progress_callback({
-                    'step': step_name,
-                    'progress': progress_percent,
-                    'current_step': current_step,
-                    'total_steps': total_steps
-                })
-        
-        # Step 1: Analyzing music (0-15%)
-        print("🎵 Step 1: Analyzing music...")
-        update_progress("Analyzing music...", 5)
-        music_analysis = self.music_analyzer.analyze_music(audio_file_path)
-        print(f"   Analysis: {music_analysis['tempo']} BPM, {music_analysis['mood']}, energy: {music_analysis['energy']:.2f}")
-        current_step += 1
-        update_progress("Music analysis complete", 15)
-        
-        # Step 2: Planning video scenes (15-25%)
-        print("🎬 Step 2: Planning video scenes...")
-        update_progress("Planning video scenes...", 20)
-        scene_plan = self._plan_video_scenes(music_analysis)
-        current_step += 1
-        update_progress("Scene planning complete", 25)
-        
-        # Step 3: Generating video content (25-100%)
-        print("✨ Step 3: Generating video content...")
-        update_progress("Starting video generation...", 30)
-        video_urls = self._generate_video_content(scene_plan, music_analysis, progress_callback, current_step, total_steps)
-        current_step = total_steps
-        update_progress("Video generation complete", 100)
         
+        options: per-request knobs - latency_target (seconds), cost_target (dollars),
+                 quality_tier ('final' or 'preview')
+        """
+        request_id = request_id or str(uuid.uuid4())
+        options = options or {}
+        # Progress and ETA come from past stage timings; the generation steps are filled in once planned
+        eta = RequestEta(
+            self.timing_history.stages,
+            ([('analysis', 'analysis')] if music_analysis is None else []) + [('planning', 'planning'), ('generation', 'generation')]
+        )
+        # Joins the trace app_flask started for this request, if any
+        with tracing.trace(request_id, self._wants_profile(options), on_finish=self.save_trace), self._tracking_eta(request_id, eta):
+            total_steps = 6  # Total number of major steps
+            current_step = 0
+            
+            def update_progress(step_name, **extra):
+                if progress_callback:
+                    progress_callback({
+                        **eta.snapshot(),
+                        'step': step_name,
+                        'current_step': current_step,
+                        'total_steps': total_steps,
+                        **extra
+                    })
+            
+            # Step 1: Analyzing music - skipped when /analyze-music already did it
+            if music_analysis is None:
+                log.info("🎵 Step 1: Analyzing music", request_id=request_id)
+                eta.start('analysis')
+                update_progress("Analyzing music...")
+                with self._stage('analysis'):
+                    music_analysis = self.music_analyzer.analyze_music(audio_file_path, content_hash)
+                eta.finish('analysis')
+            else:
+                log.info("🎵 Step 1: Reusing analysis from /analyze-music", request_id=request_id)
+            log.info("🎵 Analysis ready", request_id=request_id, tempo=music_analysis['tempo'],
+                     mood=music_analysis['mood'], energy=round(music_analysis['energy'], 2))
+            current_step += 1
+            update_progress("Music analysis complete")
+            
+            # Step 2: Planning video scenes
+            log.info("🎬 Step 2: Planning video scenes", request_id=request_id)
+            eta.start('planning')
+            update_progress("Planning video scenes...")
+            with self._stage('planning'):
+                scene_plan = self._plan_video_scenes(music_analysis)
+                scene_plan['quality_tier'] = options.get('quality_tier') or Config.DEFAULT_QUALITY_TIER
+                self.route_planner.plan(scene_plan, options.get('latency_target'), options.get('cost_target'))
+                plan_adjustments = self.degradation.apply(scene_plan) if Config.DEGRADATION_ENABLED else []
+                try:
+                    plan_adjustments += self._reserve_budget(request_id, scene_plan, music_analysis)
+                except InsufficientBudget as e:
+                    if not self._wants_fallback():
+                        raise
+                    # Not even one scene is affordable - the local renderer costs nothing
+                    log.info("💰 Out of budget - rendering the video locally", request_id=request_id, reason=e)
+                    scene_plan['scenes'] = []
+                    scene_plan['special_moments'] = []
+                    plan_adjustments.append({'reason': 'budget', 'action': 'local_render'})
+                self.journal.start_request(request_id, music_analysis, scene_plan)
+            eta.finish('planning')
+            eta.replan(self._eta_steps(scene_plan, music_analysis))
+            current_step += 1
+            update_progress("Scene planning complete")
+            
+            # Step 3: Generating video content
+            log.info("✨ Step 3: Generating video content", request_id=request_id)
+            update_progress("Starting video generation...")
+            try:
+                with self._stage('generation'):
+                    video_urls = self._generate_video_content(scene_plan, music_analysis, progress_callback, current_step, total_steps, request_id, eta)
+            except Exception as e:
+                self.journal.finish_request(request_id, error=str(e))
+                raise
+            finally:
+                # Anything still held was never submitted (e.g. animation after a failed image)
+                self.credit_manager.release(request_id)
+            
+            # Nothing came back from Higgsfield (down, too slow or no budget) - render something locally
+            rendered_locally = False
+            if not video_urls and self._wants_fallback():
+                eta.replan([('fallback', 'fallback')])
+                eta.start('fallback')
+                update_progress("Rendering audio-reactive video locally...")
+                with self._stage('fallback'):
+                    fallback_video = self._render_fallback(request_id, audio_file_path, music_analysis)
+                eta.finish('fallback')
+                if fallback_video:
+                    video_urls.append(fallback_video)
+                    rendered_locally = True
+            
+            # Local copies, so viewers never depend on the remote URL
+            eta.start('media')
+            update_progress("Saving video clips...")
+            with self._stage('media'):
+                self._store_media(video_urls)
+            eta.finish('media')
+            
+            # One beat-synced file of all clips over the uploaded track
+            final_video = None
+            if self._wants_assembly() and not rendered_locally:
+                eta.start('assembly')
+                update_progress("Assembling final video...")
+                with self._stage('assembly'):
+                    final_video = self._assemble_video(request_id, video_urls, audio_file_path, music_analysis)
+                eta.finish('assembly')
+            current_step = total_steps
+            update_progress("Video generation complete", progress=100, eta_seconds=0.0)
+            self.timing_history.record_stage('request', time.time() - eta.started)
+            
+            result = {
+                'request_id': request_id,
+                'music_analysis': music_analysis,
+                'video_urls': video_urls,
+                'routes': [scene.get('route', 'image_to_video') for scene in scene_plan['scenes']],
+                'quality_tier': scene_plan['quality_tier'],
+                'plan_adjustments': plan_adjustments
+            }
+            if final_video:
+                result['final_video'] = final_video
+            self.journal.finish_request(request_id, result=result)
+            return result
+    
+    @contextmanager
+    def _stage(self, stage):
+        """Trace, meter and (when it succeeds) remember the duration of a request stage"""
+        started = time.time()
+        with tracing.span(stage), GENERATION_STAGE_SECONDS.time(stage=stage):
+            yield
+        self.timing_history.record_stage(stage, time.time() - started)
+    
+    @contextmanager
+    def _tracking_eta(self, request_id, eta):
+        """Make a running request's ETA visible to get_request_status"""
+        with self.active_etas_lock:
+            self.active_etas[request_id] = eta
+        try:
+            yield
+        finally:
+            with self.active_etas_lock:
+                self.active_etas.pop(request_id, None)
+    
+    def _eta_steps(self, scene_plan, music_analysis):
+        """Generation steps of a plan as (name, stage) pairs for RequestEta"""
+        if not scene_plan['scenes'] and self._wants_fallback():
+            return [('fallback', 'fallback')]
+        steps = [(f"scene{i}", f"scene:{scene.get('route', 'image_to_video')}") for i, scene in enumerate(scene_plan['scenes'][:MAX_SCENES])]
+        if self._wants_special_moment(scene_plan, music_analysis):
+            steps.append(('special', 'special'))
+        if Config.MEDIA_STORE_ENABLED:
+            steps.append(('media', 'media'))
+        if self._wants_assembly():
+            steps.append(('assembly', 'assembly'))
+        return steps
+    
+    def _wants_fallback(self):
+        return Config.FALLBACK_RENDER_ENABLED and self.fallback_renderer.available()
+    
+    def _render_fallback(self, request_id, audio_file_path, music_analysis):
+        """Render an audio-reactive video of the track and store it; returns its video_urls entry, or None"""
+        output_path = None
+        try:
+            features = self.music_analyzer.frame_features(
+                audio_file_path, self.fallback_renderer.fps, Config.FALLBACK_MAX_SECONDS,
+                music_analysis.get('beat_times'), music_analysis.get('tempo')
+            )
+            fd, output_path = tempfile.mkstemp(suffix='.mp4', dir=self.media_store.partial_dir)
+            os.close(fd)
+            rendered = self.fallback_renderer.render(features, audio_file_path, output_path, music_analysis.get('mood'))
+            digest = self.media_store.add_file(output_path, 'video/mp4')
+            output_path = None
+        except Exception:
+            log.exception("❌ Local fallback render failed", request_id=request_id)
+            return None
+        finally:
+            if output_path and os.path.exists(output_path):
+                os.remove(output_path)
+        media_url = f"/media/{digest}"
         return {
-            'music_analysis': music_analysis,
-            'video_urls': video_urls
+            'url': media_url,
+            'media_url': media_url,
+            'description': f"Audio-reactive {music_analysis.get('mood', 'dynamic')} visualization rendered locally",
+            'type': 'fallback',
+            'duration': rendered['duration']
         }
     
-    def _plan_video_scenes(self, music_analysis):
-        """Create sophisticated video plan based on music characteristics"""
-        tempo = music_analysis['tempo']
-        mood = music_analysis['mood']
-        genre = music_analysis.get('genre', 'alternative')
-        energy_level = music_analysis.get('energy_level', 'medium')
-        energy = music_analysis.get('energy', 0.1)
-        spectral_centroid = music_analysis.get('spectral_centroid', 2000)
-        
-        # Add randomization based on audio characteristics for diversity
-        import random
-        random.seed(int(tempo * energy * 1000))  # Deterministic but varied
-        
-        # Enhanced scene generation with more diversity
-        if genre == "electronic" and mood == "energetic":
-            return self._get_electronic_scenes(tempo, energy_level, energy, spectral_centroid)
-        elif genre == "rock" and mood == "energetic":
-            return self._get_rock_scenes(tempo, energy_level, energy, spectral_centroid)
-        elif genre == "ambient" and mood == "calm":
-            return self._get_ambient_scenes(tempo, energy_level, energy, spectral_centroid)
-        elif genre == "pop":
-            return self._get_pop_scenes(tempo, energy_level, energy, spectral_centroid)
-        else:
-            return self._get_alternative_scenes(tempo, mood, energy_level, energy, spectral_centroid)
+    def _wants_assembly(self):
+        return Config.ASSEMBLY_ENABLED and self.assembler.available()
     
-    def _get_electronic_scenes(self, tempo, energy_level, energy, spectral_centroid):
-        """Electronic music scenes - futuristic, neon, cyberpunk with diversity"""
-        import random
+    def _assemble_video(self, request_id, video_urls, audio_file_path, music_analysis):
+        """Cut the clips on beats, join them with the audio and store the file; None if that fails"""
+        clip_urls = [clip['url'] for clip in video_urls]
+        if not clip_urls:
+            return None
+        output_path = None
+        try:
+            # Usually already stored by the media stage; otherwise downloaded here in parallel
+            digests = self.media_store.fetch_all(clip_urls)
+            if not all(digests.values()):
+                raise AssemblyError("A clip could not be downloaded")
+            beats = beat_grid(music_analysis.get('beat_times', []), music_analysis['tempo'], music_analysis['duration'])
+            
+            fd, output_path = tempfile.mkstemp(suffix='.mp4', dir=self.media_store.partial_dir)
+            os.close(fd)
+            # ffmpeg opens the clips as it goes - none of them may be evicted before it is done
+            with self.media_store.pinned(digests.values()):
+                clip_paths = []
+                for url in clip_urls:
+                    stored = self.media_store.open(digests[url])
+                    if stored is None:
+                        raise AssemblyError("A clip was evicted from the media store")
+                    clip_paths.append(stored[0])
+                assembly = self.assembler.assemble(clip_paths, audio_file_path, beats, output_path)
+            digest = self.media_store.add_file(output_path, 'video/mp4')
+            output_path = None
+            return {'media_url': f"/media/{digest}", **assembly}
+        except AssemblyError as e:
+            log.warning("⚠️ Final video assembly failed - returning the separate clips", request_id=request_id, error=e)
+            return None
+        finally:
+            if output_path and os.path.exists(output_path):
+                os.remove(output_path)
+    
+    def _store_media(self, video_urls):
+        """Wait for the clips (and preview stills) to be stored and add their /media/<digest> URLs"""
+        if not Config.MEDIA_STORE_ENABLED:
+            return
+        pairs = (('url', 'media_url'), ('preview_url', 'preview_media_url'))
+        # Locally rendered videos are in the store already
+        urls = [clip[key] for clip in video_urls for key, media_key in pairs if clip.get(key) and not clip.get(media_key)]
+        digests = self.media_store.fetch_all(urls)
+        for clip in video_urls:
+            for key, media_key in pairs:
+                digest = digests.get(clip.get(key))
+                if digest:
+                    clip[media_key] = f"/media/{digest}"
+    
+    def _prefetch_media(self, url):
+        """Start storing a finished clip while the rest of the request still runs"""
+        if Config.MEDIA_STORE_ENABLED:
+            self.media_store.fetch(url)
+    
+    def _wants_profile(self, options):
+        """Profile this request - asked for with profile=1 (if allowed) or sampled"""
+        if options.get('profile') and Config.PROFILE_ON_REQUEST:
+            return True
+        return Config.PROFILE_SAMPLE_RATE > 0 and random.random() < Config.PROFILE_SAMPLE_RATE
+    
+    def save_trace(self, trace):
+        """Store a finished request trace (and profile report) with the request's journal record"""
+        self.journal.record_trace(trace.request_id, trace.to_dict(), trace.profile_report)
+    
+    def release_orphaned_reservations(self):
+        """Release holds of requests that never made it into the journal before the process stopped.
         
-        # Multiple scene variations based on audio characteristics
-        scene_variations = []
+        Must run before the server takes requests: new requests reserve budget
+        before they are journaled, so a later sweep would release their holds.
+        """
+        pending_ids = {record['request_id'] for record in self.journal.pending_requests()}
+        with self.credit_manager.lock:
+            orphaned = [request_id for request_id in self.credit_manager.reservations if request_id not in pending_ids]
+        for request_id in orphaned:
+            self.credit_manager.release(request_id)
+        if orphaned:
+            log.info("💰 Released orphaned budget reservations", requests=len(orphaned))
+        return orphaned
+    
+    def resume_interrupted(self):
+        """Finish requests that were in flight when the process last stopped"""
+        pending = self.journal.pending_requests()
+        if not pending:
+            return []
         
-        if energy_level == "high":
-            # High energy electronic scenes
-            scene_variations = [
-                {
-                    'image_prompt': 'massive futuristic cityscape at night, towering skyscrapers with neon lights, rain-soaked streets reflecting neon, cyberpunk atmosphere, cinematic wide shot, detailed architecture, dramatic lighting',
-                    'video_prompt': f'neon signs flickering and pulsing intensely to {tempo} BPM electronic beat, rain drops hitting the pavement creating ripples, cars driving by with light trails, city lights dancing'
-                },
-                {
-                    'image_prompt': 'underground rave club interior, laser lights cutting through thick smoke, crowd of people dancing silhouettes, vibrant neon colors, high energy atmosphere, strobe lighting effects',
-                    'video_prompt': f'laser lights sweeping rapidly across the dance floor to {tempo} BPM rhythm, smoke swirling in patterns, silhouettes moving intensely to the beat, strobe effects'
-                },
-                {
-                    'image_prompt': 'futuristic space station interior, holographic displays, advanced technology, metallic surfaces, blue and purple lighting, sci-fi atmosphere, high-tech environment',
-                    'video_prompt': f'holographic displays responding to {tempo} BPM electronic rhythm, data streams flowing across screens, futuristic technology pulsing with energy'
-                },
-                {
-                    'image_prompt': 'cyberpunk alleyway at night, neon graffiti on walls, steam rising from manholes, urban decay mixed with technology, dramatic shadows, gritty futuristic atmosphere',
-                    'video_prompt': f'neon graffiti glowing and pulsing to {tempo} BPM beat, steam swirling in the air, shadows dancing on the walls, urban energy flowing through the space'
-                }
-            ]
-        else:
-            # Lower energy electronic scenes
-            scene_variations = [
-                {
-                    'image_prompt': 'modern electronic music studio, synthesizers and equipment, soft neon glow, professional setup, intimate atmosphere, creative workspace',
-                    'video_prompt': f'equipment lights pulsing gently to {tempo} BPM electronic rhythm, subtle movements, creative energy flowing through the space'
-                },
-                {
-                    'image_prompt': 'futuristic lounge with ambient lighting, comfortable seating, holographic displays, modern design, relaxed electronic atmosphere',
-                    'video_prompt': f'ambient lights shifting colors to {tempo} BPM tempo, holographic displays responding to the music, peaceful electronic vibes'
-                },
-                {
-                    'image_prompt': 'minimalist futuristic apartment, clean lines, soft LED lighting, modern furniture, serene atmosphere, high-tech but comfortable',
-                    'video_prompt': f'LED lights gently pulsing to {tempo} BPM rhythm, subtle color changes, peaceful electronic ambiance, modern living space'
-                },
-                {
-                    'image_prompt': 'digital art gallery, abstract geometric patterns, soft neon colors, artistic atmosphere, creative space, modern art installation',
-                    'video_prompt': f'geometric patterns shifting and morphing to {tempo} BPM electronic rhythm, colors blending and changing, artistic digital expression'
+        log.info("♻️ Resuming interrupted requests from the job journal", requests=len(pending))
+        results = []
+        for record in pending:
+            request_id = record['request_id']
+            log.info("♻️ Resuming request", request_id=request_id, submitted_jobs=len(record['jobs']))
+            try:
+                video_urls = self._generate_video_content(record['scene_plan'], record['music_analysis'], request_id=request_id)
+                self._store_media(video_urls)
+                result = {
+                    'request_id': request_id,
+                    'music_analysis': record['music_analysis'],
+                    'video_urls': video_urls
                 }
-            ]
-        
-        # Select 2 scenes based on audio characteristics for diversity
-        random.seed(int(tempo * energy * spectral_centroid))
-        selected_scenes = random.sample(scene_variations, min(2, len(scene_variations)))
-        
-        return {'style': 'cyberpunk', 'scenes': selected_scenes, 'special_moments': ['massive bass drop with strobe lights, crowd going wild, intense energy burst']}
+                self.journal.finish_request(request_id, result=result)
+                results.append(result)
+            except Exception as e:
+                log.error("❌ Failed to resume request", request_id=request_id, error=e)
+                self.journal.finish_request(request_id, error=str(e))
+            finally:
+                self.credit_manager.release(request_id)
+        return results
     
-    def _get_rock_scenes(self, tempo, energy_level, energy, spectral_centroid):
-        """Rock music scenes - gritty, urban, powerful with diversity"""
-        import random
-        
-        scene_variations = [
-            {
-                'image_prompt': 'abandoned warehouse with graffiti walls, dramatic shadows, urban decay, gritty atmosphere, cinematic composition',
-                'video_prompt': f'graffiti art coming to life, paint splashing to {tempo} BPM rock rhythm, shadows dancing on the walls'
-            },
-            {
-                'image_prompt': 'concert stage with spotlights, smoke machines, crowd silhouettes, rock concert atmosphere, dramatic lighting',
-                'video_prompt': f'guitar strings vibrating to {tempo} BPM beat, spotlights sweeping the stage, crowd headbanging in slow motion'
-            },
-            {
-                'image_prompt': 'underground music venue, dim red lighting, exposed brick walls, intimate setting, raw atmosphere, indie rock vibe',
-                'video_prompt': f'red lights pulsing to {tempo} BPM rock rhythm, shadows moving on brick walls, intimate concert energy'
-            },
-            {
-                'image_prompt': 'desert highway at sunset, vintage car, dust clouds, road trip atmosphere, golden hour lighting, freedom and adventure',
-                'video_prompt': f'dust clouds swirling to {tempo} BPM rock beat, car headlights cutting through the dust, desert wind moving'
-            },
-            {
-                'image_prompt': 'urban rooftop at night, city skyline, industrial pipes, gritty urban landscape, dramatic city lighting',
-                'video_prompt': f'city lights twinkling to {tempo} BPM rhythm, industrial pipes vibrating, urban energy flowing through the night'
-            }
-        ]
-        
-        # Select 2 scenes based on audio characteristics
-        random.seed(int(tempo * energy * spectral_centroid))
-        selected_scenes = random.sample(scene_variations, min(2, len(scene_variations)))
-        
-        return {'style': 'urban', 'scenes': selected_scenes, 'special_moments': ['guitar solo with sparks flying, crowd erupting, pure rock energy']}
+    def get_request_status(self, request_id):
+        """Get the journaled status of a request, with its trace so far and ETA while it runs"""
+        record = self.journal.get_request(request_id)
+        live_trace = tracing.active(request_id)
+        if record is not None and live_trace is not None:
+            record['trace'] = live_trace.to_dict()
+        with self.active_etas_lock:
+            eta = self.active_etas.get(request_id)
+        if record is not None and eta is not None:
+            record['eta'] = eta.snapshot()
+        return record
     
-    def _get_ambient_scenes(self, tempo, energy_level, energy, spectral_centroid):
-        """Ambient music scenes - peaceful, natural, ethereal with diversity"""
-        import random
+    def _run_step(self, request_id, step, model, submit, cache_params=None):
+        """Run one Higgsfield job, reusing a journaled job_set_id, result or cached generation if there is one"""
+        with tracing.span('step', step=step, model=model) as span:
+            record = self.journal.get_request(request_id) if request_id else None
+            if record and step in record['results']:
+                log.info("♻️ Reusing journaled result", request_id=request_id, step=step)
+                span['source'] = 'journal'
+                self.credit_manager.commit(request_id, step)
+                return record['results'][step]
+            
+            job_set_id = record['jobs'].get(step) if record else None
+            credential = record.get('job_credentials', {}).get(step) if record else None
+            cache_key = GenerationCache.key(model, cache_params) if cache_params is not None else None
+            if cache_key and not job_set_id and Config.GENERATION_CACHE_ENABLED:
+                cached_url = self.generation_cache.get(cache_key)
+                if cached_url:
+                    log.info("⚡ Generation cache hit", request_id=request_id, step=step)
+                    span['source'] = 'cache'
+                    self.credit_manager.release(request_id, step)
+                    if request_id:
+                        self.journal.record_result(request_id, step, cached_url)
+                    return cached_url
+            
+            submitted = []  # Set once Higgsfield has accepted (and will bill) the job
+            
+            def work():
+                current_id = job_set_id
+                if current_id:
+                    log.info("♻️ Resuming polling", request_id=request_id, step=step, job_set_id=current_id)
+                else:
+                    current_id = submit()
+                    submitted.append(current_id)
+                    if request_id:
+                        self.journal.record_job(request_id, step, current_id, self.api_client.job_credential(current_id))
+            
+                url = self.api_client.poll_job(current_id, model, self._make_hedge(model, submit, cache_key), credential)
+                if cache_key:
+                    # Cached before the job leaves the scheduler, so no identical job slips in between
+                    self.generation_cache.put(cache_key, url)
+                return url
+            
+            # Identical jobs from other requests or batch items that are in flight right now run once
+            dedupe_key = cache_key if cache_key and not job_set_id and Config.GENERATION_CACHE_ENABLED else None
+            try:
+                url, shared = self.scheduler.run(dedupe_key, work)
+            except Exception:
+                if job_set_id or submitted:
+                    # Polling failed, but the job was accepted and is billed all the same
+                    self.credit_manager.commit(request_id, step)
+                else:
+                    self.credit_manager.release(request_id, step)
+                raise
+            
+            if shared:
+                log.info("🔗 Shared the result of an identical in-flight job", request_id=request_id, step=step)
+                span['source'] = 'shared'
+                self.credit_manager.release(request_id, step)
+            else:
+                span['source'] = 'resumed' if job_set_id else 'job'
+                self.credit_manager.commit(request_id, step)
+                self.hedge_budget.record_primary(self.credit_manager.estimate_cost(model))
+            if request_id:
+                self.journal.record_result(request_id, step, url)
+            return url
+    
+    def _make_hedge(self, model, submit, cache_key):
+        """Hedge a job that runs past its model's p95, or None when hedging is off"""
+        if not Config.HEDGING_ENABLED or self.latency_stats.count(model) < Config.HEDGE_MIN_SAMPLES:
+            return None
+        cost = self.credit_manager.estimate_cost(model)
         
-        scene_variations = [
-            {
-                'image_prompt': 'misty forest at dawn, sunlight filtering through trees, peaceful nature scene, soft natural lighting, serene atmosphere',
-                'video_prompt': f'gentle mist flowing through the trees to {tempo} BPM ambient rhythm, leaves falling slowly, birds flying in the distance'
-            },
-            {
-                'image_prompt': 'mountain lake at sunset, reflection of clouds in water, peaceful landscape, golden hour lighting, tranquil scene',
-                'video_prompt': f'water ripples spreading across the lake to {tempo} BPM tempo, clouds moving slowly across the sky, peaceful meditation'
-            },
-            {
-                'image_prompt': 'northern lights dancing in arctic sky, snow-covered landscape, aurora borealis, magical atmosphere, cold but beautiful',
-                'video_prompt': f'aurora lights dancing to {tempo} BPM ambient rhythm, snow gently falling, magical northern lights flowing across the sky'
-            },
-            {
-                'image_prompt': 'zen garden with raked sand, stone arrangements, bamboo, peaceful meditation space, minimalist beauty, tranquil atmosphere',
-                'video_prompt': f'sand patterns shifting to {tempo} BPM ambient rhythm, bamboo swaying gently, peaceful zen meditation energy'
-            },
-            {
-                'image_prompt': 'ocean waves at night, moonlight reflecting on water, peaceful seascape, serene ocean atmosphere, calming blue tones',
-                'video_prompt': f'waves gently rolling to {tempo} BPM ambient rhythm, moonlight dancing on the water, peaceful ocean meditation'
-            }
-        ]
+        def submit_hedge():
+            if not self.credit_manager.can_afford(model) or not self.hedge_budget.try_spend(cost):
+                log.info("🏁 Hedge budget exhausted - not hedging", model=model)
+                return None
+            try:
+                job_set_id = submit()
+            except Exception as e:
+                log.warning("⚠️ Hedge submission failed", model=model, error=e)
+                self.hedge_budget.refund(cost)
+                return None
+            self.credit_manager.add_usage(model)
+            return job_set_id
         
-        # Select 2 scenes based on audio characteristics
-        random.seed(int(tempo * energy * spectral_centroid))
-        selected_scenes = random.sample(scene_variations, min(2, len(scene_variations)))
+        def keep_loser(job_set_id, credential):
+            # The losing job is paid for too - let it finish and keep its result in the cache.
+            # It is polled through the key that submitted it, which is charged until it ends.
+            def finish():
+                try:
+                    url = self.api_client.poll_job(job_set_id, model, credential=credential)
+                except Exception as e:
+                    log.warning("⚠️ Hedge loser failed", job_set_id=job_set_id, error=e)
+                    return
+                if cache_key:
+                    self.generation_cache.put(cache_key, url)
+            threading.Thread(target=finish, daemon=True).start()
         
-        return {'style': 'serene', 'scenes': selected_scenes, 'special_moments': ['sunrise breaking through clouds, gentle transformation, peaceful awakening']}
+        return Hedge(self.latency_stats.percentile(model, 95), submit_hedge, keep_loser)
     
-    def _get_pop_scenes(self, tempo, energy_level, energy, spectral_centroid):
-        """Pop music scenes - vibrant, colorful, mainstream with diversity"""
-        import random
-        
-        scene_variations = [
-            {
-                'image_prompt': 'colorful city street during golden hour, people walking, vibrant storefronts, upbeat urban atmosphere, warm lighting',
-                'video_prompt': f'people walking in rhythm to {tempo} BPM pop beat, street performers dancing, colorful balloons floating by'
-            },
-            {
-                'image_prompt': 'modern apartment with large windows, city view, contemporary interior, bright and clean, stylish atmosphere',
-                'video_prompt': f'curtains swaying to {tempo} BPM rhythm, city lights twinkling outside, person dancing in the living room'
-            },
-            {
-                'image_prompt': 'beach party at sunset, colorful umbrellas, people dancing, tropical atmosphere, warm golden lighting, summer vibes',
-                'video_prompt': f'people dancing on the beach to {tempo} BPM pop rhythm, colorful umbrellas swaying, sunset creating golden reflections'
-            },
-            {
-                'image_prompt': 'shopping mall with bright lights, people walking, modern architecture, vibrant atmosphere, commercial but energetic',
-                'video_prompt': f'people walking in rhythm to {tempo} BPM pop beat, bright lights pulsing, shopping energy flowing through the space'
-            },
-            {
-                'image_prompt': 'rooftop party with city skyline, colorful decorations, people celebrating, urban nightlife, vibrant party atmosphere',
-                'video_prompt': f'party decorations swaying to {tempo} BPM pop rhythm, city lights twinkling, people celebrating with energy'
-            }
-        ]
+    def _wants_special_moment(self, scene_plan, music_analysis):
+        """Special moments are only added for energetic music"""
+        return music_analysis['energy'] > 0.7 and len(scene_plan['special_moments']) > 0
+    
+    def _plan_steps(self, scene_plan, music_analysis):
+        """List the Higgsfield jobs a scene plan will submit as (step, model)"""
+        steps = []
+        for i, scene in enumerate(scene_plan['scenes'][:MAX_SCENES]):
+            if scene.get('route', 'image_to_video') == 'text_to_video':
+                steps.append((f"scene{i}:video", Config.MODELS['text_to_video']))
+                if scene_plan.get('quality_tier') == 'preview':
+                    # Direct clips have no still of their own to show early
+                    steps.append((f"scene{i}:preview", Config.MODELS['text_to_image']))
+            else:
+                steps.append((f"scene{i}:image", Config.MODELS['text_to_image']))
+                steps.append((f"scene{i}:video", Config.MODELS['image_to_video']))
+        if self._wants_special_moment(scene_plan, music_analysis):
+            steps.append(("special:0", Config.MODELS['text_to_video']))
+        return steps
+    
+    def _reserve_budget(self, request_id, scene_plan, music_analysis):
+        """Reserve budget for the whole plan up front, shrinking the plan until it fits"""
+        adjustments = []
+        while True:
+            steps = self._plan_steps(scene_plan, music_analysis)
+            if not steps:
+                raise InsufficientBudget(
+                    f"Remaining budget (${self.credit_manager.get_available_budget():.2f}) does not cover a single scene"
+                )
+            try:
+                self.credit_manager.reserve(request_id, steps)
+                return adjustments
+            except InsufficientBudget as e:
+                log.info("💰 Over budget - shrinking plan", request_id=request_id, reason=e)
+            
+            cheapest_route = min(ROUTES, key=lambda route: self.route_planner.estimate(route)['cost'])
+            expensive_scenes = [scene for scene in scene_plan['scenes'][:MAX_SCENES] if scene.get('route', 'image_to_video') != cheapest_route]
+            if any(step.endswith(':preview') for step, _ in steps):
+                scene_plan['quality_tier'] = 'final'
+                adjustments.append({'reason': 'budget', 'action': 'dropped_previews'})
+            elif self._wants_special_moment(scene_plan, music_analysis):
+                scene_plan['special_moments'] = []
+                adjustments.append({'reason': 'budget', 'action': 'dropped_special_moment'})
+            elif expensive_scenes:
+                expensive_scenes[-1]['route'] = cheapest_route
+                adjustments.append({'reason': 'budget', 'action': 'cheaper_route', 'route': cheapest_route})
+            else:
+                scene_plan['scenes'] = scene_plan['scenes'][:min(MAX_SCENES, len(scene_plan['scenes'])) - 1]
+                adjustments.append({'reason': 'budget', 'action': 'reduced_scenes', 'scenes': len(scene_plan['scenes'])})
+    
+    def _plan_video_scenes(self, music_analysis):
+        """Create sophisticated video plan based on music characteristics"""
+        return self.scene_catalog.plan(music_analysis)
+    
+    def _take_from_warm_pool(self, request_id, i, scene):
+        """Pre-generated assets for a catalog scene, or None"""
+        if not Config.WARM_POOL_ENABLED or not scene.get('catalog_id'):
+            return None
+        record = self.journal.get_request(request_id) if request_id else None
+        if record and any(step in record['jobs'] or step in record['results'] for step in (f"scene{i}:image", f"scene{i}:video")):
+            # Resumed scene - the journal already knows what it used
+            return None
+        try:
+            return self.warm_pool.take(scene['catalog_id'], scene['bpm'])
+        except Exception as e:
+            log.warning("⚠️ Warm pool unavailable", error=e)
+            return None
+    
+    def _use_pooled(self, request_id, step, url):
+        """Use a pre-generated asset for a step - its hold is released, the pool already paid"""
+        self.credit_manager.release(request_id, step)
+        if request_id:
+            self.journal.record_result(request_id, step, url)
+        return url
+    
+    def _generate_preview(self, request_id, i, scene, publish_preview):
+        """Quick Nano Banana still for a direct text-to-video scene - a failure only costs the preview"""
+        try:
+            url = self._run_step(
+                request_id, f"scene{i}:preview", Config.MODELS['text_to_image'],
+                lambda: self.api_client.submit_text_to_image(scene['image_prompt']),
+                {'prompt': scene['image_prompt'], 'aspect_ratio': '16:9'}
+            )
+        except Exception as e:
+            log.warning("⚠️ Preview failed", request_id=request_id, scene=i + 1, error=e)
+            return
+        publish_preview(i, url)
+    
+    def _scene_still(self, request_id, i, scene, update_progress, publish_preview=None):
+        """Image of an image-to-video scene as (image_url, video_url or None if the clip still has to be made)"""
+        pooled = self._take_from_warm_pool(request_id, i, scene)
+        if pooled and pooled.get('video_url'):
+            log.info("🔥 Using pre-generated clip from the warm pool", request_id=request_id, scene=i + 1)
+            image_url = self._use_pooled(request_id, f"scene{i}:image", pooled['image_url'])
+            return image_url, self._use_pooled(request_id, f"scene{i}:video", pooled['video_url'])
         
-        # Select 2 scenes based on audio characteristics
-        random.seed(int(tempo * energy * spectral_centroid))
-        selected_scenes = random.sample(scene_variations, min(2, len(scene_variations)))
+        # Generate image
+        update_progress(f"Creating image for scene {i+1}...")
+        if pooled:
+            log.info("🔥 Using pre-generated image from the warm pool", request_id=request_id, scene=i + 1)
+            image_url = self._use_pooled(request_id, f"scene{i}:image", pooled['image_url'])
+        else:
+            log.info("🖼️ Creating image with Nano Banana", request_id=request_id, scene=i + 1)
+            image_url = self._run_step(
+                request_id, f"scene{i}:image", Config.MODELS['text_to_image'],
+                lambda: self.api_client.submit_text_to_image(scene['image_prompt']),
+                {'prompt': scene['image_prompt'], 'aspect_ratio': '16:9'}
+            )
+        log.debug("✅ Image created", request_id=request_id, scene=i + 1, url=image_url)
+        if publish_preview:
+            publish_preview(i, image_url)
+        return image_url, None
+    
+    def _start_stills(self, request_id, scenes, update_progress, publish_preview):
+        """Preview tier: start the still of every scene at once, so each preview is out before any clip is done.
         
-        return {'style': 'contemporary', 'scenes': selected_scenes, 'special_moments': ['confetti explosion, crowd cheering, pure joy and celebration']}
+        Returns {scene index: Future}: (image_url, video_url or None) for
+        image-to-video scenes, whose clip is animated from that image; None for
+        direct text-to-video scenes, which get a separate preview image.
+        """
+        if not scenes:
+            return {}
+        executor = ThreadPoolExecutor(max_workers=len(scenes), thread_name_prefix='stills')
+        stills = {}
+        for i, scene in enumerate(scenes):
+            # Each in a copy of this context, so the stills' spans land in the request's trace
+            if scene.get('route') == 'text_to_video':
+                stills[i] = executor.submit(contextvars.copy_context().run, self._generate_preview, request_id, i, scene, publish_preview)
+            else:
+                stills[i] = executor.submit(contextvars.copy_context().run, self._scene_still, request_id, i, scene, update_progress, publish_preview)
+        executor.shutdown(wait=False)
+        return stills
     
-    def _get_alternative_scenes(self, tempo, mood, energy_level, energy, spectral_centroid):
-        """Alternative music scenes - artistic, unique, creative with diversity"""
-        import random
+    def _generate_scene(self, request_id, i, scene, update_progress, still=None):
+        """Generate one scene along its planned route and return the clip URL
         
-        scene_variations = [
-            {
-                'image_prompt': 'art gallery with abstract paintings, dramatic shadows, artistic atmosphere, creative lighting, modern art space',
-                'video_prompt': f'paint strokes moving across canvas to {tempo} BPM alternative rhythm, shadows dancing on the walls, artistic expression'
-            },
-            {
-                'image_prompt': 'underground music venue, intimate setting, dim lighting, artistic crowd, creative atmosphere, indie vibe',
-                'video_prompt': f'musicians performing passionately to {tempo} BPM beat, audience swaying, intimate connection between artist and crowd'
-            },
-            {
-                'image_prompt': 'vintage record store, vinyl records on shelves, warm lighting, nostalgic atmosphere, music lover sanctuary',
-                'video_prompt': f'record sleeves gently moving to {tempo} BPM alternative rhythm, warm light dancing on vinyl, musical nostalgia flowing'
-            },
-            {
-                'image_prompt': 'coffee shop with exposed brick, indie atmosphere, people working on laptops, creative workspace, hipster vibe',
-                'video_prompt': f'coffee steam rising to {tempo} BPM alternative rhythm, people typing in rhythm, creative energy flowing through the space'
-            },
-            {
-                'image_prompt': 'abandoned theater with vintage seats, dramatic lighting, artistic decay, creative space, theatrical atmosphere',
-                'video_prompt': f'stage lights flickering to {tempo} BPM alternative rhythm, dust particles dancing in the light, theatrical energy flowing'
-            }
-        ]
+        still: this scene's Future from _start_stills, when the preview tier already started its image
+        """
+        if scene.get('route') == 'text_to_video':
+            # Direct route: one minimax job from the combined prompts
+            log.info("✨ Generating scene directly with Minimax T2V", request_id=request_id, scene=i + 1)
+            update_progress(f"Generating scene {i+1} video...")
+            prompt = f"{scene['image_prompt']}, {scene['video_prompt']}"
+            duration = scene.get('duration', Config.VIDEO_DURATIONS['text_to_video'])
+            return self._run_step(
+                request_id, f"scene{i}:video", Config.MODELS['text_to_video'],
+                lambda: self.api_client.submit_text_to_video(prompt, duration),
+                {'prompt': prompt, 'duration': duration}
+            )
         
-        # Select 2 scenes based on audio characteristics
-        random.seed(int(tempo * energy * spectral_centroid))
-        selected_scenes = random.sample(scene_variations, min(2, len(scene_variations)))
+        image_url, pooled_video_url = still.result() if still else self._scene_still(request_id, i, scene, update_progress)
+        if pooled_video_url:
+            return pooled_video_url
         
-        return {'style': 'artistic', 'scenes': selected_scenes, 'special_moments': ['artistic breakthrough, creative explosion, pure artistic expression']}
+        # Animate image to video
+        log.info("🎥 Animating to video with Kling 2.5 Turbo", request_id=request_id, scene=i + 1)
+        update_progress(f"Animating scene {i+1} to video...")
+        duration = scene.get('duration', Config.VIDEO_DURATIONS['image_to_video'])
+        return self._run_step(
+            request_id, f"scene{i}:video", Config.MODELS['image_to_video'],
+            lambda: self.api_client.submit_image_to_video(image_url, scene['video_prompt'], duration),
+            {'image_url': image_url, 'prompt': scene['video_prompt'], 'duration': duration}
+        )
     
-    def _generate_video_content(self, scene_plan, music_analysis, progress_callback=None, current_step=0, total_steps=6):
+    def _generate_video_content(self, scene_plan, music_analysis, progress_callback=None, current_step=0, total_steps=6, request_id=None, eta=None):
         """Generate actual video content using Higgsfield APIs with progress tracking"""
         video_urls = []
         
-        print(f"🎬 Starting video generation with {len(scene_plan['scenes'])} scenes...")
+        log.info("🎬 Starting video generation", request_id=request_id, scenes=len(scene_plan['scenes']))
         
         # Generate regular scenes (limit to 2 for performance)
-        max_scenes = min(2, len(scene_plan['scenes']))
+        max_scenes = min(MAX_SCENES, len(scene_plan['scenes']))
         successful_scenes = 0
+        if eta is None:
+            eta = RequestEta(self.timing_history.stages, self._eta_steps(scene_plan, music_analysis))
         
-        def update_progress(step_name, progress_percent):
+        def update_progress(step_name, **extra):
             if progress_callback:
                 progress_callback({
+                    **eta.snapshot(),
                     'step': step_name,
-                    'progress': progress_percent,
                     'current_step': current_step,
-                    'total_steps': total_steps
+                    'total_steps': total_steps,
+                    **extra
                 })
         
+        previews = {}
+        previews_lock = threading.Lock()  # Stills of all scenes publish from their own threads
+        scene_clips = {}  # scene index -> its video_urls entry
+        
+        def publish_preview(i, url):
+            with previews_lock:
+                previews[i] = url
+                published = [{'scene': j, 'url': previews[j]} for j in sorted(previews)]
+            log.info("👀 Preview published", request_id=request_id, scene=i + 1)
+            if request_id:
+                self.journal.record_preview(request_id, i, url)
+            update_progress(f"Preview for scene {i+1} ready", previews=published)
+        
+        # Preview tier: every scene's still first, then the clips one after another
+        stills = {}
+        if scene_plan.get('quality_tier') == 'preview':
+            stills = self._start_stills(request_id, scene_plan['scenes'][:max_scenes], update_progress, publish_preview)
+        
         for i, scene in enumerate(scene_plan['scenes'][:max_scenes]):
-            print(f"   🎨 Generating scene {i+1}/{max_scenes}...")
-            print(f"     Image prompt: {scene['image_prompt'][:50]}...")
-            print(f"     Video prompt: {scene['video_prompt'][:50]}...")
+            log.info("🎨 Generating scene", request_id=request_id, scene=i + 1, of=max_scenes)
+            log.debug("🎨 Scene prompts", request_id=request_id, scene=i + 1,
+                      image_prompt=scene['image_prompt'], video_prompt=scene['video_prompt'])
             
             # Update progress for scene start
-            scene_progress = 30 + (i * 30)  # 30% + 30% per scene
-            update_progress(f"Generating scene {i+1}/{max_scenes}...", scene_progress)
-            
+            eta.start(f"scene{i}")
+            update_progress(f"Generating scene {i+1}/{max_scenes}...")
             
             try:
-                # Generate image
-                print("     🖼️ Creating image with Nano Banana...")
-                update_progress(f"Creating image for scene {i+1}...", scene_progress + 5)
-                image_url = self.api_client.text_to_image(scene['image_prompt'])
-                print(f"     ✅ Image created: {image_url[:50]}...")
-                
-                # Animate image to video
-                print("     🎥 Animating to video with Kling 2.5 Turbo...")
-                update_progress(f"Animating scene {i+1} to video...", scene_progress + 10)
-                video_url = self.api_client.image_to_video(image_url, scene['video_prompt'])
-                print(f"     ✅ Video created: {video_url[:50]}...")
+                scene_started = time.time()
+                with tracing.span('scene', scene=i + 1, route=scene.get('route', 'image_to_video')):
+                    video_url = self._generate_scene(request_id, i, scene, update_progress, stills.get(i))
+                self.timing_history.record_stage(f"scene:{scene.get('route', 'image_to_video')}", time.time() - scene_started)
+                log.debug("✅ Video created", request_id=request_id, scene=i + 1, url=video_url)
                 
                 video_urls.append({
                     'url': video_url,
                     'description': scene['video_prompt'],
                     'type': 'scene'
                 })
-                print(f"     ✅ Scene {i+1} completed successfully!")
+                scene_clips[i] = video_urls[-1]
+                self._prefetch_media(video_url)
+                log.info("✅ Scene completed", request_id=request_id, scene=i + 1)
                 successful_scenes += 1
-                update_progress(f"Scene {i+1} completed!", scene_progress + 15)
+                eta.finish(f"scene{i}")
+                update_progress(f"Scene {i+1} completed!")
                 
             except Exception as e:
-                print(f"     ❌ Failed to generate scene {i+1}: {e}")
-                print(f"     Error type: {type(e).__name__}")
-                
+                eta.finish(f"scene{i}")
                 # If it's a timeout, try to continue with what we have
                 if "timed out" in str(e).lower():
-                    print(f"     ⏰ Scene {i+1} timed out - continuing with available results...")
+                    log.warning("⏰ Scene timed out - continuing with available results", request_id=request_id, scene=i + 1)
                 else:
-                    import traceback
-                    print(f"     Traceback: {traceback.format_exc()}")
+                    log.exception("❌ Failed to generate scene", request_id=request_id, scene=i + 1, error_type=type(e).__name__)
                 
                 # Continue to next scene instead of breaking
                 continue
         
         # Add special moment if music is energetic
-        if (music_analysis['energy'] > 0.7 and 
-            len(scene_plan['special_moments']) > 0):
+        if self._wants_special_moment(scene_plan, music_analysis):
             
-            print("   💫 Adding special moment...")
+            log.info("💫 Adding special moment", request_id=request_id)
+            eta.start('special')
+            update_progress("Adding special moment...")
             try:
-                special_video = self.api_client.text_to_video(
-                    scene_plan['special_moments'][0]
+                # Shortened by degradation like the scenes, if it ran
+                duration = scene_plan.get('clip_durations', {}).get('text_to_video', Config.VIDEO_DURATIONS['text_to_video'])
+                special_started = time.time()
+                special_video = self._run_step(
+                    request_id, "special:0", Config.MODELS['text_to_video'],
+                    lambda: self.api_client.submit_text_to_video(scene_plan['special_moments'][0], duration),
+                    {'prompt': scene_plan['special_moments'][0], 'duration': duration}
                 )
+                self.timing_history.record_stage('special', time.time() - special_started)
                 video_urls.append({
                     'url': special_video,
                     'description': scene_plan['special_moments'][0],
                     'type': 'special'
                 })
-                print("     ✅ Special moment added!")
+                self._prefetch_media(special_video)
+                log.info("✅ Special moment added", request_id=request_id)
             except Exception as e:
-                print(f"     ❌ Special moment failed: {e}")
+                log.warning("❌ Special moment failed", request_id=request_id, error=e)
+            eta.finish('special')
+        
+        # Previews of direct scenes may still be on their way
+        futures_wait(stills.values())
+        for i, clip in scene_clips.items():
+            if i in previews:
+                clip['preview_url'] = previews[i]
         
         # Summary
-        print(f"🎬 Generation complete: {successful_scenes} scenes generated successfully")
+        log.info("🎬 Generation complete", request_id=request_id, scenes=successful_scenes)
         if successful_scenes == 0:
-            print("   ⚠️ No scenes were generated - check API status and try again")
+            log.warning("⚠️ No scenes were generated - check API status and try again", request_id=request_id)
         
         return video_urls
\ No newline at end of file
@@ -0,0 +1,288 @@
+# warm_pool.py - Pre-generated images and clips for the fixed scene catalog
+import argparse
+import atexit
+import copy
+import fcntl
+import json
+import math
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from credit_manager import InsufficientBudget
+from logs import get_logger
+
+log = get_logger('warm_pool')
+
+
+class WarmPool:
+    """Stock of ready-made assets per catalog entry, kept in a JSON file.
+
+    Images only depend on the catalog entry; clips also depend on the tempo in
+    their prompt, so they are stocked for the tempos requests actually use.
+    Every asset is handed out once. Requests take assets from an in-memory view;
+    the URLs handed out and the usage counts are merged into the file at most
+    every flush_interval seconds (and at exit). The file is shared with the
+    offline builder, so each merge re-reads and rewrites it under an exclusive
+    file lock.
+    """
+
+    def __init__(self, path, ttl=24 * 3600, flush_interval=30):
+        self.path = path
+        self.ttl = ttl  # Higgsfield result URLs expire
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        self.state = None  # In-memory view of the file, loaded on first use
+        self.taken = set()  # URLs handed out since the last flush
+        self.usage = {}  # Usage recorded since the last flush, as in state['usage']
+        self.flushed_at = 0.0
+        atexit.register(self.flush)
+
+    def _locked(self, update):
+        """Run update(state) on the current file contents and write the result back"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self.lock, open(f"{self.path}.lock", 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            state = self._read()
+            self._merge_pending(state)
+            result = update(state)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(state, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            self.taken = set()
+            self.usage = {}
+            self.state = state
+            self.flushed_at = time.time()
+            return result
+
+    def _merge_pending(self, state):
+        """Apply takes and usage recorded in memory to state read from the file (caller holds the lock)"""
+        for catalog_id, delta in self.usage.items():
+            usage = state['usage'].setdefault(catalog_id, {'count': 0, 'tempos': {}})
+            usage['count'] += delta['count']
+            for bpm, count in delta['tempos'].items():
+                usage['tempos'][bpm] = usage['tempos'].get(bpm, 0) + count
+        if self.taken:
+            for bucket in ('images', 'clips'):
+                for key in list(state[bucket]):
+                    left = [asset for asset in state[bucket][key] if asset['url'] not in self.taken]
+                    if left:
+                        state[bucket][key] = left
+                    else:
+                        del state[bucket][key]
+
+    def _read(self):
+        state = {'images': {}, 'clips': {}, 'usage': {}}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    state.update(json.load(f))
+            except ValueError:
+                log.warning("⚠️ Warm pool file is corrupt - starting empty", path=self.path)
+        # Drop assets whose URLs may have expired
+        cutoff = time.time() - self.ttl
+        for bucket in ('images', 'clips'):
+            for key in list(state[bucket]):
+                fresh = [asset for asset in state[bucket][key] if asset['created_at'] >= cutoff]
+                if fresh:
+                    state[bucket][key] = fresh
+                else:
+                    del state[bucket][key]
+        return state
+
+    def _view(self):
+        """The in-memory state, read from the file the first time (caller holds the lock)"""
+        if self.state is None:
+            self.state = self._read()
+            self.flushed_at = time.time()
+        return self.state
+
+    def flush(self):
+        """Write takes and usage recorded in memory to the file, and pick up the builder's additions"""
+        with self.lock:
+            if not self.taken and not self.usage:
+                return
+        self._locked(lambda state: None)
+
+    @staticmethod
+    def clip_key(catalog_id, bpm):
+        return f"{catalog_id}@{bpm}"
+
+    def _pop_fresh(self, bucket, key):
+        """Hand out the oldest unexpired asset under key, or None (caller holds the lock)"""
+        assets = bucket.get(key, [])
+        cutoff = time.time() - self.ttl
+        while assets:
+            asset = assets.pop(0)
+            self.taken.add(asset['url'])
+            if asset['created_at'] >= cutoff:
+                return asset
+        return None
+
+    def take(self, catalog_id, bpm):
+        """Record a use of the entry and hand out a clip ({'image_url', 'video_url'}) or image ({'image_url'}), or None"""
+        with self.lock:
+            state = self._view()
+            for usage in (state['usage'], self.usage):
+                entry = usage.setdefault(catalog_id, {'count': 0, 'tempos': {}})
+                entry['count'] += 1
+                entry['tempos'][str(bpm)] = entry['tempos'].get(str(bpm), 0) + 1
+
+            clip = self._pop_fresh(state['clips'], self.clip_key(catalog_id, bpm))
+            if clip:
+                asset = {'image_url': clip['image_url'], 'video_url': clip['url']}
+            else:
+                image = self._pop_fresh(state['images'], catalog_id)
+                asset = {'image_url': image['url']} if image else None
+            due = time.time() - self.flushed_at >= self.flush_interval
+        if due:
+            try:
+                self.flush()
+            except OSError as e:
+                # Kept in memory - the next flush tries again
+                log.warning("⚠️ Warm pool flush failed", error=e)
+        return asset
+
+    def add_image(self, catalog_id, url):
+        def update(state):
+            state['images'].setdefault(catalog_id, []).append({'url': url, 'created_at': time.time()})
+        self._locked(update)
+
+    def add_clip(self, catalog_id, bpm, image_url, url):
+        def update(state):
+            state['clips'].setdefault(self.clip_key(catalog_id, bpm), []).append(
+                {'url': url, 'image_url': image_url, 'created_at': time.time()}
+            )
+        self._locked(update)
+
+    def refill_plan(self, catalog_ids, min_images=1, max_images=6, max_clips=0):
+        """Assets missing per entry, scaled by how often each entry (and tempo) is used.
+
+        Returns (image_needs, clip_needs): {catalog_id: n} and {(catalog_id, bpm): n}.
+        """
+        with self.lock:
+            state = copy.deepcopy(self._view())
+        usage = state['usage']
+        top_count = max([entry['count'] for entry in usage.values()] or [0])
+        top_tempo = max([n for entry in usage.values() for n in entry['tempos'].values()] or [0])
+
+        image_needs = {}
+        for catalog_id in catalog_ids:
+            count = usage.get(catalog_id, {}).get('count', 0)
+            target = min_images + (math.ceil((max_images - min_images) * count / top_count) if top_count else 0)
+            missing = target - len(state['images'].get(catalog_id, []))
+            if missing > 0:
+                image_needs[catalog_id] = missing
+
+        clip_needs = {}
+        if max_clips and top_tempo:
+            for catalog_id in catalog_ids:
+                for bpm, count in usage.get(catalog_id, {}).get('tempos', {}).items():
+                    target = math.ceil(max_clips * count / top_tempo)
+                    missing = target - len(state['clips'].get(self.clip_key(catalog_id, bpm), []))
+                    if missing > 0:
+                        clip_needs[(catalog_id, int(bpm))] = missing
+        return image_needs, clip_needs
+
+    def stats(self):
+        with self.lock:
+            state = self._view()
+            return {
+                'images': sum(len(assets) for assets in state['images'].values()),
+                'clips': sum(len(assets) for assets in state['clips'].values()),
+                'entries_used': len(state['usage'])
+            }
+
+
+def refill(pool, catalog, api_client, credit_manager, models, min_images=1, max_images=6, max_clips=0, workers=4):
+    """Generate whatever the refill plan asks for, stopping when the budget runs out.
+
+    catalog: {catalog_id: {'image_prompt': ..., 'video_prompt': template with {tempo}}}
+    """
+    image_needs, clip_needs = pool.refill_plan(list(catalog), min_images, max_images, max_clips)
+    log.info("🔥 Warm pool refill", images=sum(image_needs.values()), clips=sum(clip_needs.values()))
+
+    def submit(model, submit_job):
+        """Submit a job under a budget hold, committed once Higgsfield accepted it; None if unaffordable"""
+        hold_id = f"warm-pool:{uuid.uuid4()}"
+        try:
+            credit_manager.reserve(hold_id, [('job', model)])
+        except InsufficientBudget:
+            return None
+        try:
+            job_set_id = submit_job()
+        except Exception:
+            credit_manager.release(hold_id)
+            raise
+        credit_manager.commit(hold_id, 'job')
+        return job_set_id
+
+    def make_image(catalog_id):
+        job_set_id = submit(models['text_to_image'], lambda: api_client.submit_text_to_image(catalog[catalog_id]['image_prompt']))
+        if job_set_id is None:
+            return None
+        return api_client.poll_job(job_set_id, models['text_to_image'])
+
+    def build_image(catalog_id):
+        url = make_image(catalog_id)
+        if url:
+            pool.add_image(catalog_id, url)
+
+    def build_clip(catalog_id, bpm):
+        if not credit_manager.can_afford(models['image_to_video']):
+            return
+        image_url = make_image(catalog_id)
+        if not image_url:
+            return
+        prompt = catalog[catalog_id]['video_prompt'].format(tempo=bpm)
+        job_set_id = submit(models['image_to_video'], lambda: api_client.submit_image_to_video(image_url, prompt))
+        if job_set_id is None:
+            return
+        pool.add_clip(catalog_id, bpm, image_url, api_client.poll_job(job_set_id, models['image_to_video']))
+
+    jobs = [(build_image, (catalog_id,)) for catalog_id, n in image_needs.items() for _ in range(n)]
+    jobs += [(build_clip, key) for key, n in clip_needs.items() for _ in range(n)]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(job, *args) for job, args in jobs]
+        for future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                log.warning("⚠️ Warm pool asset failed", error=e)
+    log.info("✅ Warm pool refilled", **pool.stats())
+
+
+if __name__ == "__main__":
+    # Offline builder - charges the shared credit ledger, so run it while the API server is stopped
+    from config import Config
+    from credential_pool import parse_credentials
+    from credit_manager import CreditManager
+    from higgsfield_client import HiggsfieldClient
+    from scene_catalog import SceneCatalog
+
+    parser = argparse.ArgumentParser(description="Pre-generate assets for the scene catalog")
+    parser.add_argument('--min-images', type=int, default=Config.WARM_POOL_MIN_IMAGES)
+    parser.add_argument('--max-images', type=int, default=Config.WARM_POOL_MAX_IMAGES)
+    parser.add_argument('--clips', type=int, default=0, help="clips per popular tempo (0 = images only)")
+    args = parser.parse_args()
+
+    client = HiggsfieldClient(
+        Config.HIGGSFIELD_API_KEY,
+        Config.HIGGSFIELD_API_SECRET,
+        parse_credentials(Config.HIGGSFIELD_CREDENTIALS)
+    )
+    refill(
+        WarmPool(Config.WARM_POOL_PATH, Config.WARM_POOL_TTL),
+        dict(SceneCatalog().entries()),
+        client,
+        CreditManager(Config.TOTAL_BUDGET, Config.CREDIT_LEDGER_PATH),
+        Config.MODELS,
+        args.min_images, args.max_images, args.clips,
+        workers=Config.MAX_JOBS_PER_KEY * len(client.credentials)
+    )
@@ -36,7 +36,7 @@ export default function Home() {
       console.log('Music analysis:', analysisResponse.data?.analysis)
       
       // Then generate the video
-      const videoResponse = await apiService.generateVideo(file)
+      const videoResponse = await apiService.generateVideo(file, analysisResponse.data?.analysis_token)
       console.log('Full video response:', videoResponse)
       console.log('Video generation result:', videoResponse.data)
       
@@ -4,6 +4,7 @@
 import React,{ useState, useRef, useEffect } from 'react'
 import { Play, Circle, Star } from 'lucide-react'
 import { config } from '../lib/config'
+import { ScenePreview } from '../types'
 
 interface ProcessingSectionProps {
   audioFile: File
@@ -17,6 +18,7 @@ export default function ProcessingSection({ audioFile, isProcessing, onCancel }:
   const [duration, setDuration] = useState(0)
   const [processingProgress, setProcessingProgress] = useState(0)
   const [currentStep, setCurrentStep] = useState('Analyzing music...')
+  const [previews, setPreviews] = useState<ScenePreview[]>([])
   const audioRef = useRef<HTMLAudioElement | null>(null)
 
   useEffect(() => {
@@ -54,15 +56,21 @@ export default function ProcessingSection({ audioFile, isProcessing, onCancel }:
         const progressData = await response.json()
         
         setProcessingProgress(progressData.progress)
-        setCurrentStep(progressData.step)
+        if (progressData.previews?.length) {
+          setPreviews(progressData.previews)
+        }
+        const eta = progressData.eta_seconds
+        setCurrentStep(eta && !progressData.is_complete
+          ? `${progressData.step} (about ${Math.max(1, Math.round(eta / 60))} min left)`
+          : progressData.step)
         
         // Stop polling when complete
         if (progressData.is_complete) {
           return
         }
         
-        // Continue polling every 2 seconds
-        setTimeout(pollProgress, 2000)
+        // Continue polling when the backend expects the next change (every 2 seconds by default)
+        setTimeout(pollProgress, (progressData.poll_after_seconds || 2) * 1000)
       } catch (error) {
         console.error('Error polling progress:', error)
         // Fallback to simulated progress if polling fails
@@ -175,6 +183,20 @@ export default function ProcessingSection({ audioFile, isProcessing, onCancel }:
                 <span>{Math.round(processingProgress)}%</span>
               </div>
             </div>
+
+            {/* Scene stills published while the clips are still rendering */}
+            {previews.length > 0 && (
+              <div className="w-full grid grid-cols-1 md:grid-cols-2 gap-4">
+                {previews.map(preview => (
+                  <div key={preview.scene} className="relative rounded-lg overflow-hidden border border-border">
+                    <img src={preview.url} alt={`Scene ${preview.scene + 1} preview`} className="w-full h-48 object-cover" />
+                    <div className="absolute top-2 left-2 bg-background/90 px-3 py-1 rounded-lg text-xs font-medium border border-border">
+                      👀 Scene {preview.scene + 1} preview
+                    </div>
+                  </div>
+                ))}
+              </div>
+            )}
           </div>
         ) : (
           <button className="btn-primary text-lg px-8 py-4 flex items-center mx-auto space-x-3">
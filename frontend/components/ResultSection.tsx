@@ -3,6 +3,8 @@
 import React, { useState } from 'react'
 import { Download, Plus, Music, Star } from 'lucide-react'
 import { GenerationResult } from '../lib/api'
+import { VideoUrl } from '../types'
+import { config } from '../lib/config'
 
 interface ResultSectionProps {
   generationResult: GenerationResult
@@ -12,15 +14,23 @@ interface ResultSectionProps {
 export default function ResultSection({ generationResult, onNewUpload }: ResultSectionProps) {
   const [showDownloadOverlay, setShowDownloadOverlay] = useState(false)
 
-  const handleDownload = (videoUrl: string, index: number) => {
+  const handleDownload = (videoUrl: string, filename: string) => {
     // Create temporary link for download
     const link = document.createElement('a')
     link.href = videoUrl
-    link.download = `sonic-canvas-video-${index + 1}.mp4`
+    link.download = filename
     link.click()
   }
 
-  const { music_analysis, video_urls } = generationResult
+  // Prefer the backend's stored copy over the remote Higgsfield URL
+  const videoSource = (video: VideoUrl) =>
+    video.media_url ? `${config.apiUrl}${video.media_url}` : video.url
+
+  // The scene's preview still, shown until its clip starts playing
+  const posterSource = (video: VideoUrl) =>
+    video.preview_media_url ? `${config.apiUrl}${video.preview_media_url}` : video.preview_url
+
+  const { music_analysis, video_urls, final_video } = generationResult
 
   // DEBUG: Log the received data
   console.log('ResultSection received:', generationResult)
@@ -55,6 +65,31 @@ export default function ResultSection({ generationResult, onNewUpload }: ResultS
         </div>
       </div>
 
+      {/* Assembled Music Video */}
+      {final_video && (
+        <div className="card mb-8">
+          <h3 className="text-2xl font-semibold mb-6 flex items-center gap-3">
+            <Star className="w-6 h-6 text-accent" />
+            Full Music Video ({Math.round(final_video.duration)}s)
+          </h3>
+          <div className="visualizer h-96 relative">
+            <video 
+              src={`${config.apiUrl}${final_video.media_url}`} 
+              controls 
+              className="w-full h-full object-cover"
+            />
+          </div>
+          <div className="mt-4 text-center">
+            <button 
+              onClick={() => handleDownload(`${config.apiUrl}${final_video.media_url}`, 'sonic-canvas-music-video.mp4')}
+              className="btn-primary px-6 py-3 inline-flex items-center space-x-3"
+            >
+              <Download size={20} />
+              <span>Download Music Video</span>
+            </button>
+          </div>
+        </div>
+      )}
 
       {/* Generated Videos */}
       <div className="space-y-8">
@@ -72,7 +107,8 @@ export default function ResultSection({ generationResult, onNewUpload }: ResultS
               onMouseLeave={() => setShowDownloadOverlay(false)}
             >
               <video 
-                src={video.url} 
+                src={videoSource(video)} 
+                poster={posterSource(video)}
                 controls 
                 className="w-full h-full object-cover"
               />
@@ -82,7 +118,7 @@ export default function ResultSection({ generationResult, onNewUpload }: ResultS
                 }`}
               >
                 <button 
-                  onClick={() => handleDownload(video.url, index)}
+                  onClick={() => handleDownload(videoSource(video), `sonic-canvas-video-${index + 1}.mp4`)}
                   className="btn-primary text-lg px-6 py-3 flex items-center space-x-3"
                 >
                   <Download size={20} />
@@ -90,7 +126,9 @@ export default function ResultSection({ generationResult, onNewUpload }: ResultS
                 </button>
               </div>
               <div className="absolute top-4 left-4 bg-background/90 px-4 py-2 rounded-lg text-sm font-medium border border-border">
-                {video.type === 'special' ? '✨ Special Moment' : `🎬 Scene ${index + 1}`}
+                {video.type === 'special' ? '✨ Special Moment'
+                  : video.type === 'fallback' ? '🌀 Audio-Reactive Visualization'
+                  : `🎬 Scene ${index + 1}`}
               </div>
             </div>
           ))}
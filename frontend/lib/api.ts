@@ -80,7 +80,7 @@ class ApiService {
   }
 
 
-  async analyzeMusic(file: File): Promise<ApiResponse<{ analysis: MusicAnalysis }>> {
+  async analyzeMusic(file: File): Promise<ApiResponse<{ analysis: MusicAnalysis, analysis_token?: string }>> {
     const formData = new FormData()
     formData.append('file', file)
     
@@ -105,7 +105,7 @@ class ApiService {
       return {
         status: 'success',
         message: data.message || 'Analysis completed',
-        data: { analysis: data.analysis }
+        data: { analysis: data.analysis, analysis_token: data.analysis_token }
       }
     } catch (error) {
       console.error('Analysis error:', error)
@@ -117,9 +117,15 @@ class ApiService {
     }
   }
 
-  async generateVideo(file: File): Promise<ApiResponse<VideoResult>> {
+  async generateVideo(file: File, analysisToken?: string, qualityTier: string = config.qualityTier): Promise<ApiResponse<VideoResult>> {
+    // With a token from /analyze-music the backend reuses the uploaded audio and its analysis
     const formData = new FormData()
-    formData.append('file', file)
+    if (analysisToken) {
+      formData.append('analysis_token', analysisToken)
+    } else {
+      formData.append('file', file)
+    }
+    formData.append('quality_tier', qualityTier)
     
     try {
       console.log('Sending video generation request to:', `${API_BASE_URL}/generate-video`)
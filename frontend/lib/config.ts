@@ -7,6 +7,9 @@ export const config = {
   maxFileSize: 50 * 1024 * 1024, // 50MB
   allowedAudioTypes: ['audio/mpeg', 'audio/wav', 'audio/mp4', 'audio/ogg'],
   
+  // 'preview' shows a still per scene while its clip is still rendering; 'final' waits for the clips
+  qualityTier: process.env.NEXT_PUBLIC_QUALITY_TIER || 'preview',
+  
   // UI settings
   defaultTimeout: 30000, // 30 seconds
   pollingInterval: 1000, // 1 second
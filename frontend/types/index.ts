@@ -10,12 +10,27 @@ export interface MusicAnalysis {
 
 export interface VideoUrl {
   url: string
-  type: 'scene' | 'special'
+  type: 'scene' | 'special' | 'fallback'  // fallback: rendered locally when Higgsfield returned nothing
+  media_url?: string  // Local copy on the backend, e.g. /media/<digest>
+  preview_url?: string  // Still shown for the scene before its clip was ready (preview tier)
+  preview_media_url?: string
+}
+
+export interface ScenePreview {
+  scene: number  // 0-based scene index
+  url: string
+}
+
+export interface FinalVideo {
+  media_url: string  // All clips cut on beats over the uploaded track
+  duration: number
 }
 
 export interface VideoResult {
   music_analysis: MusicAnalysis
   video_urls: VideoUrl[]
+  final_video?: FinalVideo
+  quality_tier?: 'final' | 'preview'
 }
 
 